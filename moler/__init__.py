@@ -2,3 +2,8 @@
 __author__ = 'Grzegorz Latuszek'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'grzegorz.latuszek@nokia.com'
+
+from moler.event_awaiter import EventAwaiter
+
+gather = EventAwaiter.gather
+as_completed = EventAwaiter.as_completed
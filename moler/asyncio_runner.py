@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 Nokia
+"""
+Runner running connection-observers inside asyncio event loop. Requires Python 3.5+.
+
+submit() returns asyncio.Future and connection-observer can be awaited:
+
+    result = await Ping(connection=conn, destination='localhost', runner=AsyncioRunner())
+
+Timeouts of connection-observers are handled by loop.call_later() - there is no thread per observer.
+"""
+
+__author__ = 'Grzegorz Latuszek, Marcin Usielski, Michal Ernst'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com, marcin.usielski@nokia.com, michal.ernst@nokia.com'
+
+import asyncio
+import atexit
+import logging
+import threading
+import time
+
+from moler.exceptions import WrongUsage
+from moler.io.asyncio import get_event_loop
+from moler.io.asyncio import get_running_loop
+from moler.runner import ConnectionObserverRunner
+from moler.runner import subscribe_for_data
+from moler.runner import time_out_observer
+
+
+class AsyncioRunner(ConnectionObserverRunner):
+    def __init__(self, loop=None):
+        """
+        Create instance of AsyncioRunner class
+
+        :param loop: event loop to run connection-observers in; if not given - moler.io.asyncio.get_event_loop() is used
+        """
+        self._in_shutdown = False
+        self._loop = loop
+        self._active_observers = dict()  # observer -> (its future, its data-receiver, its timeout handle)
+        self._active_observers_lock = threading.Lock()  # observers may be submitted from outside of loop thread
+        self.logger = logging.getLogger('moler.runner.asyncio')
+        self.logger.debug("created")
+        atexit.register(self.shutdown)
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = get_event_loop()
+        return self._loop
+
+    def shutdown(self):
+        if self._in_shutdown:
+            return
+        self.logger.debug("shutting down")
+        self._in_shutdown = True
+        if hasattr(atexit, 'unregister'):
+            atexit.unregister(self.shutdown)
+        with self._active_observers_lock:
+            running_observers = list(self._active_observers)
+        for connection_observer in running_observers:
+            self.logger.debug("shutdown so cancelling {!r}".format(connection_observer))
+            connection_observer.cancel()
+            self._finish(connection_observer)
+
+    def submit(self, connection_observer):
+        """
+        Submit connection observer to background execution.
+        Returns asyncio.Future that could be used to await for connection_observer done.
+        """
+        self.logger.debug("go background: {!r}".format(connection_observer))
+        connection_observer_future = self.loop.create_future()
+        self.feed(connection_observer, connection_observer_future)
+        connection_observer_future.add_done_callback(lambda future: self._finish(connection_observer))
+        return connection_observer_future
+
+    def wait_for(self, connection_observer, connection_observer_future, timeout=None):
+        """
+        Await for connection_observer running in background or timeout.
+
+        It is blocking call so it can't be used from inside of running event loop (use 'await observer' there).
+
+        :param connection_observer: The one we are awaiting for.
+        :param connection_observer_future: Future of connection-observer returned from submit().
+        :param timeout: Max time (in float seconds) you want to await before you give up.
+                        If None then observer's own timeout (enforced by runner) is awaited.
+        :return:
+        """
+        self.logger.debug("go foreground: {!r} - await max. {} [sec]".format(connection_observer, timeout))
+        if get_running_loop() is not None:
+            err_msg = "Can't call await_done() of {} from inside running event loop - use 'await'".format(
+                connection_observer)
+            raise WrongUsage(err_msg)
+        start_time = time.time()
+        observer_done = threading.Event()
+
+        def wake_up(observer):
+            observer_done.set()
+
+        connection_observer.add_done_callback(wake_up)
+        loop_runs_in_other_thread = self.loop.is_running()
+        try:
+            if loop_runs_in_other_thread:
+                is_done = observer_done.wait(timeout=timeout)
+            else:
+                done_futures, _ = self.loop.run_until_complete(asyncio.wait([connection_observer_future],
+                                                                            timeout=timeout))
+                is_done = observer_done.is_set()
+        finally:
+            connection_observer.remove_done_callback(wake_up)
+        if is_done:
+            self.logger.debug("{} done".format(connection_observer))
+            return None
+
+        # code below is for timed out observer
+        passed = time.time() - start_time
+        time_out_observer(connection_observer, timeout=timeout, passed_time=passed, runner_logger=self.logger)
+        if not loop_runs_in_other_thread:  # stopped loop won't run callbacks finishing observer - don't leak it
+            self._set_future(connection_observer, connection_observer_future)
+            self._finish(connection_observer)
+        return None
+
+    def wait_for_iterator(self, connection_observer, connection_observer_future):
+        """
+        Version of wait_for() intended to be used by Python3 to implement awaitable object.
+
+        :param connection_observer: The one we are awaiting for.
+        :param connection_observer_future: Future of connection-observer returned from submit().
+        :return: iterator
+        """
+        return connection_observer_future.__await__()
+
+    def feed(self, connection_observer, connection_observer_future):
+        """
+        Feeds connection_observer by subscribing it to its connection.
+        From that moment connection itself passes data to connection_observer.
+        """
+        connection_observer._log(logging.INFO, "{} started.".format(connection_observer.get_long_desc()))
+
+        def activate(secure_data_received):
+            with self._active_observers_lock:
+                self._active_observers[connection_observer] = (connection_observer_future, secure_data_received, None)
+
+        self.logger.debug("subscribing for data {!r}".format(connection_observer))
+        subscribe_for_data(connection_observer, activate)
+        self._call_in_loop(self._start_timeout, connection_observer, time.time())
+        connection_observer.add_done_callback(self._on_observer_done)
+
+    def timeout_change(self, timedelta):
+        """
+        Nothing to do here - runner rereads connection_observer.timeout when its timeout handle fires
+        """
+        pass
+
+    def _call_in_loop(self, callback, *args):
+        if get_running_loop() is self.loop:
+            self.loop.call_soon(callback, *args)
+        else:  # data may come from connection running in other thread
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def _on_observer_done(self, connection_observer):
+        with self._active_observers_lock:
+            if connection_observer not in self._active_observers:
+                return
+            connection_observer_future, _, _ = self._active_observers[connection_observer]
+        self._call_in_loop(self._set_future, connection_observer, connection_observer_future)
+
+    def _start_timeout(self, connection_observer, start_time):
+        deadline = start_time + connection_observer.timeout
+        with self._active_observers_lock:
+            if connection_observer not in self._active_observers:
+                return
+            connection_observer_future, secure_data_received, _ = self._active_observers[connection_observer]
+            # time is taken from time.time() since observer could be submitted before loop started
+            timeout_handle = self.loop.call_later(deadline - time.time(), self._on_timeout,
+                                                  connection_observer, start_time)
+            self._active_observers[connection_observer] = (connection_observer_future, secure_data_received,
+                                                           timeout_handle)
+
+    def _on_timeout(self, connection_observer, start_time):
+        if connection_observer.done():
+            return
+        passed = time.time() - start_time
+        if connection_observer.timeout > passed:  # timeout extended after submit()
+            self._start_timeout(connection_observer, start_time)
+            return
+        time_out_observer(connection_observer, timeout=connection_observer.timeout, passed_time=passed,
+                          runner_logger=self.logger, kind="run")
+
+    @staticmethod
+    def _set_future(connection_observer, connection_observer_future):
+        if connection_observer_future.done():
+            return
+        try:
+            result = connection_observer.result()
+        except Exception as exc:
+            connection_observer_future.set_exception(exc)
+        else:
+            connection_observer_future.set_result(result)
+
+    def _finish(self, connection_observer):
+        with self._active_observers_lock:
+            if connection_observer not in self._active_observers:
+                return
+            _, secure_data_received, timeout_handle = self._active_observers.pop(connection_observer)
+        if timeout_handle is not None:
+            timeout_handle.cancel()
+        self.logger.debug("unsubscribing {!r}".format(connection_observer))
+        connection_observer.connection.unsubscribe(secure_data_received)
+        connection_observer.remove_done_callback(self._on_observer_done)
+        connection_observer._log(logging.INFO, "{} finished.".format(connection_observer.get_short_desc()))
@@ -14,12 +14,15 @@ import re
 import six
 
 from moler.cmd import RegexHelper
+from moler import offloaded_parsing
+from moler.connection import split_into_lines
 from moler.command import Command
 
 
 class CommandTextualGeneric(Command):
     _re_default_prompt = re.compile(r'^[^<]*[\$|%|#|>|~]\s*$')  # When user provides no prompt
     _default_newline_chars = ("\n", "\r")  # New line chars on device, not system with script!
+    _offloadable_parsing = False  # True if on_new_line() may run in other process (see moler.offloaded_parsing)
 
     def __init__(self, connection, prompt=None, newline_chars=None, runner=None):
         """
@@ -36,6 +39,8 @@ class CommandTextualGeneric(Command):
         self.ret_required = True  # # Set False for commands not returning parsed result
         self.break_on_timeout = True  # If True then Ctrl+c on timeout
         self._last_not_full_line = None  # Part of line
+        self._offloaded_lines = list()  # Lines awaiting offloaded parsing
+        self._offloaded_batches = offloaded_parsing.ParsingQueue()  # Batches of lines under offloaded parsing
         self._re_prompt = CommandTextualGeneric._calculate_prompt(prompt)  # Expected prompt on device
         self._newline_chars = newline_chars  # New line characters on device
         if not self._newline_chars:
@@ -77,20 +82,36 @@ class CommandTextualGeneric(Command):
         :param data: List of strings sent by device
         :return: Nothing
         """
-        lines = data.splitlines(True)
-        for line in lines:
+        self.lines_received(split_into_lines(data, self._newline_chars))
+
+    def lines_received(self, lines):
+        """
+        Called by framework with data already split into lines
+        :param lines: Tuple of (line, is_full_line) pairs, full lines have new line chars stripped
+        :return: Nothing
+        """
+        for line, is_full_line in lines:
             if self._last_not_full_line is not None:
                 line = self._last_not_full_line + line
                 self._last_not_full_line = None
-            is_full_line = self.has_endline_char(line)
             if is_full_line:
                 line = self._strip_new_lines_chars(line)
             else:
                 self._last_not_full_line = line
             if self._cmd_output_started:
-                self.on_new_line(line, is_full_line)
+                if self._is_parsing_offloaded():
+                    self._offload_new_line(line, is_full_line)
+                else:
+                    self.on_new_line(line, is_full_line)
             elif is_full_line:
                 self._detect_start_of_cmd_output(line)
+        if self._offloaded_lines:
+            self._parse_offloaded_lines()
+
+    def accepts_lines(self, newline_chars):
+        data_received = six.get_unbound_function(type(self).data_received)
+        return (tuple(newline_chars) == tuple(self._newline_chars)) and \
+            (data_received is six.get_unbound_function(CommandTextualGeneric.data_received))
 
     @abc.abstractmethod
     def build_command_string(self):
@@ -115,6 +136,29 @@ class CommandTextualGeneric(Command):
                 self._log(lvl=logging.DEBUG,
                           msg="Found candidate for final prompt but current ret is None or empty, required not None nor empty.")
 
+    def _is_parsing_offloaded(self):
+        if self._offloaded_batches.in_use:
+            return True  # further lines must be queued after already offloaded ones
+        return self._offloadable_parsing and offloaded_parsing.is_offloaded_parsing_enabled()
+
+    def _offload_new_line(self, line, is_full_line):
+        """
+        Collect line for parsing in batch by process pool.
+        Batch is parsed when whole chunk of data is split into lines or when batch is full.
+        :param line: Line to parse, new lines are trimmed
+        :param is_full_line: True if new line character was removed from line, False otherwise
+        :return: Nothing
+        """
+        self._offloaded_lines.append((line, is_full_line))
+        if len(self._offloaded_lines) >= offloaded_parsing.batch_max_lines:
+            self._parse_offloaded_lines()
+
+    def _parse_offloaded_lines(self):
+        lines = self._offloaded_lines
+        self._offloaded_lines = list()
+        if not self.done():
+            offloaded_parsing.parse_lines(self, lines)
+
     def is_end_of_cmd_output(self, line):
         if self._regex_helper.search_compiled(self._re_prompt, line):
             return True
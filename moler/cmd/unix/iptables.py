@@ -14,6 +14,8 @@ from moler.exceptions import ParsingDone
 
 
 class Iptables(GenericUnixCommand):
+    _offloadable_parsing = True
+
     def __init__(self, connection, options=None, v6=None, prompt=None, newline_chars=None, runner=None):
         super(Iptables, self).__init__(connection=connection, prompt=prompt, newline_chars=newline_chars,
                                        runner=runner)
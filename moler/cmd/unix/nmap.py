@@ -14,6 +14,7 @@ from moler.exceptions import ParsingDone
 
 
 class Nmap(GenericUnixCommand):
+    _offloadable_parsing = True
 
     def __init__(self, connection, ip, is_ping=False, option=None, prompt=None, newline_chars=None, runner=None):
         super(Nmap, self).__init__(connection=connection, prompt=prompt, newline_chars=newline_chars, runner=runner)
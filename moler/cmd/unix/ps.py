@@ -21,6 +21,7 @@ from moler.parser.table_text import TableText
 
 
 class Ps(GenericUnixCommand):
+    _offloadable_parsing = True
 
     def __init__(self, connection=None, options='', prompt=None, newline_chars=None, runner=None):
         self.parser = None
@@ -14,6 +14,7 @@ from moler.exceptions import ParsingDone
 
 
 class Tcpdump(GenericUnixCommand):
+    _offloadable_parsing = True
 
     def __init__(self, connection, options=None, prompt=None, newline_chars=None, runner=None):
         super(Tcpdump, self).__init__(connection, prompt, newline_chars, runner)
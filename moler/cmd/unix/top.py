@@ -14,6 +14,8 @@ import re
 
 
 class Top(GenericUnixCommand):
+    _offloadable_parsing = True
+
     def __init__(self, connection, options=None, prompt=None, newline_chars=None, runner=None):
         super(Top, self).__init__(connection=connection, prompt=prompt, newline_chars=newline_chars, runner=runner)
         self.options = options
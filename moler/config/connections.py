@@ -33,6 +33,10 @@ def define_connection(name, io_type, **constructor_kwargs):
 
         svr1_conn = get_connection(name="www_svr_1")
         svr1_conn.open()
+
+    or take already opened one out of moler.connection_pool.ConnectionPool::
+
+        with pool.connection(name="www_svr_1") as svr1_conn:
     """
     named_connections[name] = (io_type, constructor_kwargs)
 
@@ -25,6 +25,20 @@ TEST_CASE = 45
 debug_level = None  # means: inactive
 raw_logs_active = False
 
+# incremented whenever Moler changes levels of loggers - allows caching of logger.isEnabledFor() decisions
+logging_config_generation = 0
+
+
+def logging_config_changed():
+    """
+    Invalidate all cached logger.isEnabledFor() decisions of Moler's connections.
+
+    Moler calls it when it configures its loggers. Call it after changing level of some parent logger
+    (level of connection's own logger and logging.disable() are tracked without it).
+    """
+    global logging_config_generation
+    logging_config_generation += 1
+
 
 def set_logging_path(path):
     global logging_path
@@ -170,6 +184,7 @@ def create_logger(name,
     logger = logging.getLogger(name)
     if name not in active_loggers:
         logger.setLevel(log_level)
+        logging_config_changed()
         if log_file:  # if present means: "please add this file as logs storage for my logger"
             _add_new_file_handler(logger_name=name,
                                   log_file=log_file,
@@ -233,6 +248,7 @@ def configure_device_logger(connection_name, propagate=False):
         # RAW_LOGS is lowest log-level so we need to change log-level of logger
         # to make it pass data into raw-log-handler
         logger.setLevel(min(RAW_DATA, TRACE))
+        logging_config_changed()
         _add_raw_file_handler(logger_name=logger_name, log_file='{}.raw.log'.format(logger_name))
         if debug_level == TRACE:
             _add_raw_trace_file_handler(logger_name=logger_name, log_file='{}.raw.trace.log'.format(logger_name))
@@ -292,6 +308,8 @@ class RawDataFormatter(object):
     def format(self, record):
         """We want to take data from log_record.msg as bytes"""
         raw_bytes = record.msg
+        if isinstance(raw_bytes, memoryview):
+            return raw_bytes.tobytes()
         if not isinstance(raw_bytes, (bytes, bytearray)):
             err_msg = "Log record directed for raw-logs must have encoder if record.msg is not bytes (it is {})".format(
                 type(record.msg))
@@ -15,14 +15,21 @@ __author__ = 'Grzegorz Latuszek, Marcin Usielski, Michal Ernst'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'grzegorz.latuszek@nokia.com, marcin.usielski@nokia.com, michal.ernst@nokia.com'
 
+import codecs
+import collections
+import contextlib
+import functools
 import logging
 import platform
+import sys
 import weakref
-from threading import Lock
+from threading import Condition, Lock, RLock, Timer
+from timeit import default_timer
 
 import six
 
 import moler.config.connections as connection_cfg
+import moler.config.loggers as loggers_cfg
 from moler.config.loggers import RAW_DATA, TRACE
 from moler.exceptions import WrongUsage
 from moler.helpers import instance_id
@@ -33,11 +40,260 @@ def identity_transformation(data):
     return data
 
 
+class IncrementalDecoder(object):
+    """
+    Decoder of stream of bytes (to be used as decoder of connection).
+
+    Bytes of multibyte character split between two chunks of data are not decoded
+    but kept till remaining bytes of that character come with next chunk.
+    So, chunk boundaries (like size of socket.recv() buffer) don't cause decoding errors.
+    """
+
+    def __init__(self, encoding="utf-8", errors="strict"):
+        self.encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+
+    def __call__(self, data):
+        return self._decoder.decode(data, final=False)
+
+    def reset(self):
+        """Forget bytes of not completed character"""
+        self._decoder.reset()
+
+
+class ObserverStats(object):
+    """Statistics of passing data from connection to observer (observers of same name share it)"""
+    __slots__ = ('name', 'calls', 'processing_time', 'max_processing_time', 'data_size',
+                 'max_queue_depth', 'dropped_chunks', 'coalesced_chunks', '_calls_lock')
+
+    def __init__(self, name):
+        self.name = name
+        self._calls_lock = Lock()  # calls are recorded by connection and by runners feeding queued observers
+        self.calls = 0
+        self.processing_time = 0.0
+        self.max_processing_time = 0.0
+        self.data_size = 0  # len() of data delivered to observer
+        # below ones are used by queued delivery only
+        self.max_queue_depth = 0
+        self.dropped_chunks = 0
+        self.coalesced_chunks = 0
+
+    def record_call(self, processing_time, data_size):
+        with self._calls_lock:
+            self.calls += 1
+            self.processing_time += processing_time
+            self.data_size += data_size
+            if processing_time > self.max_processing_time:
+                self.max_processing_time = processing_time
+
+    def as_dict(self):
+        return {'calls': self.calls,
+                'processing_time': self.processing_time,
+                'max_processing_time': self.max_processing_time,
+                'data_size': self.data_size,
+                'max_queue_depth': self.max_queue_depth,
+                'dropped_chunks': self.dropped_chunks,
+                'coalesced_chunks': self.coalesced_chunks}
+
+
+class DeliveryQueue(object):
+    """
+    Bounded queue of chunks of data awaiting delivery to single observer.
+
+    Connection puts data into it (instead of calling observer), runner takes data out of it
+    and calls observer from its own thread. Data given as memoryview (like reused buffer of external-IO)
+    is copied - queued chunk must not change. When queue is full, overflow policy decides:
+    - BLOCK        - putting thread (external-IO one) waits till observer takes data
+    - DROP_OLDEST  - oldest chunk is dropped
+    - COALESCE     - new chunk is appended to last one (nothing lost, observer gets bigger chunk)
+    Runner passes chunks to observer via deliver() - to have observer calls accounted in statistics.
+    """
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+
+    def __init__(self, max_size=1000, overflow=BLOCK, stats=None, on_delivered=None):
+        if overflow not in (DeliveryQueue.BLOCK, DeliveryQueue.DROP_OLDEST, DeliveryQueue.COALESCE):
+            raise WrongUsage("Unknown overflow policy '{}' of DeliveryQueue".format(overflow))
+        self.max_size = max_size
+        self.overflow = overflow
+        self.stats = stats or ObserverStats(name="DeliveryQueue")
+        self._on_delivered = on_delivered or self.stats.record_call  # on_delivered(processing_time, data_size)
+        self._chunks = collections.deque()
+        self._condition = Condition()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def put(self, data, block=True):
+        """
+        Put chunk of data into queue (ignored when queue is closed)
+
+        :param data: chunk of data
+        :param block: if False, full queue of BLOCK policy doesn't wait for space - data is not put
+        :return: False if data was not put since it would block; True otherwise
+        """
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        with self._condition:
+            if len(self._chunks) >= self.max_size:
+                if self.overflow == DeliveryQueue.BLOCK:
+                    if not block:
+                        return False
+                    while (len(self._chunks) >= self.max_size) and not self._closed:
+                        self._condition.wait()
+                elif self.overflow == DeliveryQueue.DROP_OLDEST:
+                    self._chunks.popleft()
+                    self.stats.dropped_chunks += 1
+                else:
+                    self._chunks[-1] = self._chunks[-1] + data
+                    self.stats.coalesced_chunks += 1
+                    return True
+            if self._closed:
+                return True
+            self._chunks.append(data)
+            if len(self._chunks) > self.stats.max_queue_depth:
+                self.stats.max_queue_depth = len(self._chunks)
+            self._condition.notify_all()
+        return True
+
+    def get_all(self, timeout=None):
+        """
+        Take all chunks out of queue; awaits (max timeout, None means: till data comes) if queue is empty.
+
+        :return: list of chunks - empty one on timeout or when queue is closed
+        """
+        with self._condition:
+            if timeout is None:
+                while not self._chunks and not self._closed:
+                    self._condition.wait()
+            elif not self._chunks and not self._closed:
+                self._condition.wait(timeout)
+            chunks = list(self._chunks)
+            self._chunks.clear()
+            self._condition.notify_all()  # wake blocked put()
+        return chunks
+
+    def deliver(self, observer, data):
+        """
+        Call observer with chunk taken out of queue and record that call in statistics
+
+        :param observer: callable to pass data to
+        :param data: chunk of data (decoded data or lines)
+        """
+        call_start = default_timer()
+        try:
+            observer(data)
+        finally:
+            self._on_delivered(default_timer() - call_start, _data_size(data))
+
+    def close(self):
+        """Stop accepting data and wake all awaiting threads"""
+        with self._condition:
+            self._closed = True
+            self._chunks.clear()
+            self._condition.notify_all()
+
+
+def _data_size(data):
+    if isinstance(data, tuple):  # lines: ((line, is_full_line), ...)
+        return sum(len(line) for line, _ in data)
+    return len(data)
+
+
+def _utf8_encoder(data):
+    return data.encode('utf-8')
+
+
+_received_data_log_extra = {'transfer_direction': '<', 'encoder': _utf8_encoder}
+_sent_data_log_extra = {'transfer_direction': '>', 'encoder': _utf8_encoder}
+
+# form of data observer is subscribed for
+_DECODED_DATA = "data"
+_LINES = "lines"
+_RAW_DATA = "raw"
+
+
+def split_into_lines(data, newline_chars=("\n", "\r")):
+    """
+    Split chunk of data into lines
+
+    :param data: chunk of data received from connection
+    :param newline_chars: characters ending line
+    :return: tuple of (line, is_full_line) pairs; full line has newline characters stripped,
+             last line may be not full (chunk of line to be continued by next data)
+    """
+    lines = list()
+    for line in data.splitlines(True):
+        is_full_line = line.endswith(newline_chars)
+        if is_full_line:
+            for char in newline_chars:
+                line = line.rstrip(char)
+        lines.append((line, is_full_line))
+    return tuple(lines)
+
+
+def _data_in_form(data_form, data, lines, raw_data):
+    if data_form == _RAW_DATA:
+        return raw_data
+    if data_form == _LINES:
+        return lines
+    return data
+
+
+class _EnabledLevels(object):
+    """
+    Cache of logger.isEnabledFor() decisions.
+
+    Cache is dropped when other logger is queried, when level of that logger changes, when logging.disable()
+    is called or when logging configuration changes (see moler.config.loggers.logging_config_changed()).
+    """
+    __slots__ = ('logger', 'logger_level', 'disabled_level', 'config_generation', 'levels')
+
+    def __init__(self):
+        self.logger = None
+        self.logger_level = None
+        self.disabled_level = None
+        self.config_generation = None
+        self.levels = dict()
+
+    def is_enabled_for(self, logger, level):
+        if logger is None:
+            return False
+        if (logger is not self.logger) or (logger.level != self.logger_level) or \
+                (logger.manager.disable != self.disabled_level) or \
+                (loggers_cfg.logging_config_generation != self.config_generation):
+            self.logger = logger
+            self.logger_level = logger.level
+            self.disabled_level = logger.manager.disable
+            self.config_generation = loggers_cfg.logging_config_generation
+            self.levels = dict()
+        try:
+            return self.levels[level]
+        except KeyError:
+            enabled = logger.isEnabledFor(level)
+            self.levels[level] = enabled
+            return enabled
+
+
+def _await_blocked_deliveries(blocked_deliveries):
+    for delivery_queue, data in blocked_deliveries:
+        delivery_queue.put(data)  # waits till observer takes data out of its full queue
+
+
 class Connection(object):
-    """Connection API required by ConnectionObservers."""
+    """
+    Connection API required by ConnectionObservers.
+
+    Each send() is passed to external-IO at once. Many small writes (like configuration pushed line by line)
+    may be coalesced into single write of external-IO:
+    - explicitly - data sent inside "with connection.batch():" is written at the end of that block
+    - by delay - data sent within write_coalescing_delay is written together when that delay passes
+    """
 
     def __init__(self, how2send=None, encoder=identity_transformation, decoder=identity_transformation,
-                 name=None, newline='\r\n', logger_name=""):
+                 name=None, newline='\r\n', logger_name="", write_coalescing_delay=None):
         """
         Create Connection via registering external-IO
 
@@ -47,6 +303,8 @@ class Connection(object):
         :param name: name assigned to connection
         :param logger_name: take that logger from logging
         :param newline: new line character
+        :param write_coalescing_delay: how long (float seconds) sent data may await to be written together
+                                       with data sent after it; None means: write at once
 
         Logger is retrieved by logging.getLogger(logger_name)
         If logger_name == "" - take logger "moler.connection.<name>"
@@ -61,6 +319,13 @@ class Connection(object):
         self.newline = newline
         self.data_logger = logging.getLogger('moler.{}'.format(self.name))
         self.logger = Connection._select_logger(logger_name, self._name)
+        self._data_logger_levels = _EnabledLevels()
+        self._logger_levels = _EnabledLevels()
+        self.write_coalescing_delay = write_coalescing_delay
+        self._pending_writes = list()  # encoded data awaiting coalesced write
+        self._pending_writes_lock = Lock()
+        self._batch_depth = 0
+        self._flush_timer = None
 
     @property
     def name(self):
@@ -130,8 +395,7 @@ class Connection(object):
             length = len(data)
             msg = "*" * length
 
-        self._log_data(msg=msg, level=logging.INFO,
-                       extra={'transfer_direction': '>', 'encoder': lambda data: data.encode('utf-8')})
+        self._log_data(msg=msg, level=logging.INFO, extra=_sent_data_log_extra)
         self._log(level=logging.INFO,
                   msg=Connection._strip_data(msg),
                   extra={
@@ -139,12 +403,58 @@ class Connection(object):
                       'log_name': self.name
                   })
 
-        encoded_msg = self.encode(msg)
-        self._log_data(msg=encoded_msg, level=RAW_DATA,
-                       extra={'transfer_direction': '>', 'encoder': lambda data: data.encode('utf-8')})
-
         encoded_data = self.encode(data)
-        self.how2send(encoded_data)
+        if self._data_logger_levels.is_enabled_for(self.data_logger, RAW_DATA):
+            encoded_msg = self.encode(msg) if encrypt else encoded_data
+            self._emit_data_log(msg=encoded_msg, level=RAW_DATA, extra=_sent_data_log_extra)
+
+        if self._batch_depth or self._pending_writes or (self.write_coalescing_delay is not None):
+            self._write_coalesced(encoded_data)
+        else:
+            self.how2send(encoded_data)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Coalesce data sent inside "with connection.batch():" block into single write of external-IO.
+
+        Blocks may be nested - data is written at the end of outermost one.
+        """
+        with self._pending_writes_lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._pending_writes_lock:
+                self._batch_depth -= 1
+                batch_finished = self._batch_depth == 0
+            if batch_finished:
+                self.flush()
+
+    def flush(self):
+        """Write into external-IO all sent data still awaiting coalesced write"""
+        with self._pending_writes_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending_writes:
+                return
+            pending_writes = self._pending_writes
+            self._pending_writes = list()
+            # under lock - data flushed by other thread can't overtake this one
+            self.how2send(pending_writes[0][:0].join(pending_writes))
+
+    def _write_coalesced(self, encoded_data):
+        with self._pending_writes_lock:
+            self._pending_writes.append(encoded_data)
+            if self._batch_depth or (self._flush_timer is not None):
+                return
+            if self.write_coalescing_delay is not None:
+                self._flush_timer = Timer(self.write_coalescing_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+                return
+        self.flush()  # data left by finished batch
 
     def change_newline_seq(self, newline_seq="\n"):
         """
@@ -180,6 +490,12 @@ class Connection(object):
         decoded_data = self._decoder(data)
         return decoded_data
 
+    def reset_decoder(self):
+        """Forget data partially decoded by stream decoder (like IncrementalDecoder) - f.ex. on reconnection"""
+        reset = getattr(self._decoder, 'reset', None)
+        if reset is not None:
+            reset()
+
     def _unknown_send(self, data2send):
         err_msg = "Can't send('{}')".format(data2send)
         err_msg += "\nYou haven't installed sending method of external-IO system"
@@ -190,13 +506,18 @@ class Connection(object):
         raise WrongUsage(err_msg)
 
     def _log_data(self, msg, level, extra=None):
+        if self._data_logger_levels.is_enabled_for(self.data_logger, level):
+            self._emit_data_log(msg, level, extra)
+
+    def _emit_data_log(self, msg, level, extra=None):
+        # caller has checked that level is enabled
         try:
             self.data_logger.log(level, msg, extra=extra)
         except Exception as err:
             print(err)  # logging errors should not propagate
 
     def _log(self, level, msg, extra=None):
-        if self.logger:
+        if self._logger_levels.is_enabled_for(self.logger, level):
             extra_params = {
                 'log_name': self.name
             }
@@ -217,10 +538,33 @@ class ObservableConnection(Connection):
 
     def observer(data):
         # handle that data
+
+    Observers of textual data may subscribe for lines - then chunk of data is split into lines
+    once for all of them (see subscribe(observer, lines=True)).
+    Observers of binary data may subscribe for raw data - they get data as given by external-IO
+    without decoding (see subscribe(observer, raw=True)). If connection keeps no
+    recently received data (recent_data_max_size=0) and has raw observers only, it doesn't decode at all.
+    Data given by external-IO as memoryview (of its reused buffer) is seen by decoder only -
+    raw observers, delivery queues and recently received data get it as bytes.
+
+    Recently received data is kept (up to recent_data_max_size) together with its offset
+    inside stream of received data. So, observer may subscribe "from offset" taken
+    before it asked device for output (see received_offset) and no output is lost.
+
+    Observers are called synchronously - slow one delays all others. To find such one
+    connection measures how long observers process data (see stats()) and may log
+    observer exceeding slow_observer_threshold.
+    Connection may be configured to use DeliveryQueue per observer (see delivery_queue_size) - then
+    it only puts data into queues of observers subscribed with queued=True and their runner calls them.
+    Full queue of BLOCK policy makes external-IO wait - but not while connection is locked
+    (subscribing/unsubscribing and data delivery to other observers are not blocked by it).
     """
+    lines_newline_chars = ("\n", "\r")  # used to split data into lines for observers subscribed for lines
 
     def __init__(self, how2send=None, encoder=identity_transformation, decoder=identity_transformation,
-                 name=None, newline='\n', logger_name=""):
+                 name=None, newline='\n', logger_name="", recent_data_max_size=64 * 1024,
+                 slow_observer_threshold=None, delivery_queue_size=None, delivery_overflow=DeliveryQueue.BLOCK,
+                 write_coalescing_delay=None):
         """
         Create Connection via registering external-IO
 
@@ -229,41 +573,162 @@ class ObservableConnection(Connection):
         :param decoder: callable restoring data from bytes
         :param name: name assigned to connection
         :param logger_name: take that logger from logging
+        :param recent_data_max_size: max size (len() of decoded data) of recently received data kept for replay
+        :param slow_observer_threshold: log warning when observer processes single chunk of data longer
+                                        than that (float seconds); None means: don't check
+        :param delivery_queue_size: max size of DeliveryQueue of observer subscribed with queued=True;
+                                    None means: no queues, all observers are called directly
+        :param delivery_overflow: overflow policy of delivery queues (see DeliveryQueue)
+        :param write_coalescing_delay: how long (float seconds) sent data may await coalesced write (see Connection)
 
         Logger is retrieved by logging.getLogger(logger_name)
         If logger_name == "" - take logger "moler.connection.<name>"
         If logger_name is None - don't use logging
         """
         super(ObservableConnection, self).__init__(how2send, encoder, decoder, name=name, newline=newline,
-                                                   logger_name=logger_name)
+                                                   logger_name=logger_name,
+                                                   write_coalescing_delay=write_coalescing_delay)
         self._observers = dict()
+        self._observers_snapshot = tuple()  # immutable copy of self._observers.values() read by notify_observers()
         self._observers_lock = Lock()
+        self.recent_data_max_size = recent_data_max_size
+        self._recent_data = collections.deque()  # (offset, data) of recently received data
+        self._recent_data_size = 0
+        self._received_offset = 0
+        self._received_data_lock = RLock()  # replay for new subscriber can't interleave with notification
+        self.slow_observer_threshold = slow_observer_threshold
+        self._observers_stats = dict()  # name: ObserverStats
+        self.delivery_queue_size = delivery_queue_size
+        self.delivery_overflow = delivery_overflow
+        self._decoding_skipped = False
+
+    @property
+    def received_offset(self):
+        """Offset (inside stream of received decoded data) of data to be received next"""
+        return self._received_offset
 
     def data_received(self, data):
         """
         Incoming-IO API:
         external-IO should call this method when data is received
         """
-        self._log_data(msg=data, level=RAW_DATA,
-                       extra={'transfer_direction': '<', 'encoder': lambda data: data.encode('utf-8')})
-
-        decoded_data = self.decode(data)
-        self._log_data(msg=decoded_data, level=logging.INFO,
-                       extra={'transfer_direction': '<', 'encoder': lambda data: data.encode('utf-8')})
-
-        self.notify_observers(decoded_data)
-
-    def subscribe(self, observer):
+        raw_data = self._raw_data_for_consumers(data)
+        # guards (checked once per chunk) avoid any formatting/allocation on data path when given log level is off
+        if self._data_logger_levels.is_enabled_for(self.data_logger, RAW_DATA):
+            self._emit_data_log(msg=raw_data, level=RAW_DATA, extra=_received_data_log_extra)
+
+        decoded_data = None
+        if (self.recent_data_max_size > 0) or \
+                any(data_form != _RAW_DATA for _, _, data_form, _, _ in self._observers_snapshot):
+            if self._decoding_skipped:  # stream decoder has seen only part of stream
+                self.reset_decoder()
+                self._decoding_skipped = False
+            decoded_data = self.decode(data)
+            if isinstance(decoded_data, memoryview):  # decoder passed buffer of external-IO through
+                decoded_data = decoded_data.tobytes()
+            if data and not decoded_data:
+                decoded_data = None  # stream decoder awaits rest of multibyte character
+            elif self._data_logger_levels.is_enabled_for(self.data_logger, logging.INFO):
+                self._emit_data_log(msg=decoded_data, level=logging.INFO, extra=_received_data_log_extra)
+        else:
+            self._decoding_skipped = True
+
+        with self._received_data_lock:
+            if decoded_data is not None:
+                self._remember_recent_data(decoded_data)
+            blocked_deliveries = self._notify(decoded_data, observers=self._observers_snapshot, raw_data=raw_data)
+        if blocked_deliveries:
+            _await_blocked_deliveries(blocked_deliveries)
+
+    def _raw_data_for_consumers(self, data):
+        if not isinstance(data, memoryview):
+            return data
+        # buffer of external-IO changes with next chunk - only decoder may read it directly
+        if self._data_logger_levels.is_enabled_for(self.data_logger, RAW_DATA) or \
+                any(data_form == _RAW_DATA for _, _, data_form, _, _ in self._observers_snapshot):
+            return data.tobytes()
+        return None  # no raw data consumers
+
+    def _remember_recent_data(self, data):
+        data_offset = self._received_offset
+        self._received_offset += len(data)
+        if self.recent_data_max_size <= 0:
+            return  # nothing is kept - only offset of stream advances
+        if len(data) > self.recent_data_max_size:  # keep its tail only
+            data_offset += len(data) - self.recent_data_max_size
+            data = data[len(data) - self.recent_data_max_size:]
+        self._recent_data.append((data_offset, data))
+        self._recent_data_size += len(data)
+        while self._recent_data_size > self.recent_data_max_size:
+            _, forgotten_data = self._recent_data.popleft()
+            self._recent_data_size -= len(forgotten_data)
+
+    def subscribe(self, observer, lines=False, from_offset=None, name=None, queued=False, raw=False):
         """
         Subscribe for 'data-received notification'
         :param observer: function to be called
+        :param lines: if True observer is called with tuple of (line, is_full_line) pairs
+                      (see split_into_lines()) instead of raw chunk of data
+        :param from_offset: if given, observer is at once notified about data received since that offset
+                            (see received_offset) - as much as is still kept in recently received data
+                            (observer of raw data gets no such past data - connection keeps decoded data only)
+        :param name: name of observer inside stats(); observers of same name share statistics
+        :param queued: if True and connection uses delivery queues (see delivery_queue_size) data is put into
+                       DeliveryQueue of observer instead of calling it - caller must take data from that queue
+        :param raw: if True observer is called with data as given by external-IO - not decoded
+        :return: DeliveryQueue of observer or None if observer is called directly by connection
         """
+        if lines and raw:
+            raise WrongUsage("Observer may subscribe either for lines or for raw data (not both)")
+        data_form = _LINES if lines else (_RAW_DATA if raw else _DECODED_DATA)
+        if from_offset is not None:
+            with self._received_data_lock:  # no new data till subscribed observer gets past data
+                observer_entry = self._subscribe(observer, data_form, name, queued)
+                if observer_entry:
+                    self._replay_recent_data(observer_entry, from_offset)
+        else:
+            observer_entry = self._subscribe(observer, data_form, name, queued)
+        return observer_entry[4] if observer_entry else None
+
+    def _subscribe(self, observer, data_form, name, queued):
         with self._observers_lock:
             self._log(level=TRACE, msg="subscribe({})".format(observer))
-            observer_key, value = self._get_observer_key_value(observer)
+            observer_key, (self_or_none, observer_function) = self._get_observer_key_value(observer)
 
             if observer_key not in self._observers:
-                self._observers[observer_key] = value
+                name = name or self._observer_name(observer)
+                if name not in self._observers_stats:
+                    self._observers_stats[name] = ObserverStats(name)
+                observer_stats = self._observers_stats[name]
+                delivery_queue = None
+                if queued and self.delivery_queue_size:
+                    delivery_queue = DeliveryQueue(max_size=self.delivery_queue_size, overflow=self.delivery_overflow,
+                                                   stats=observer_stats,
+                                                   on_delivered=functools.partial(self._update_observer_stats,
+                                                                                  observer_stats))
+                self._observers[observer_key] = (self_or_none, observer_function, data_form, observer_stats,
+                                                 delivery_queue)
+                self._observers_snapshot = tuple(self._observers.values())
+                return self._observers[observer_key]
+        return None
+
+    def _replay_recent_data(self, observer_entry, from_offset):
+        if self._recent_data and (from_offset < self._recent_data[0][0]):
+            self._log(level=logging.WARNING,
+                      msg="data since offset {} is not kept anymore - replaying since offset {}".format(
+                          from_offset, self._recent_data[0][0]))
+        replayed_chunks = list()
+        for data_offset, data in self._recent_data:
+            if data_offset + len(data) <= from_offset:
+                continue
+            if data_offset < from_offset:
+                data = data[from_offset - data_offset:]
+            replayed_chunks.append(data)
+        if replayed_chunks and (observer_entry[4] is not None):
+            # as single chunk - it must fit into delivery queue that nobody drains yet
+            replayed_chunks = [replayed_chunks[0][:0].join(replayed_chunks)]
+        for data in replayed_chunks:
+            self._notify(data, observers=(observer_entry,))
 
     def unsubscribe(self, observer):
         """
@@ -274,28 +739,121 @@ class ObservableConnection(Connection):
             self._log(level=TRACE, msg="unsubscribe({})".format(observer))
             observer_key, _ = self._get_observer_key_value(observer)
             if observer_key in self._observers:
-                del self._observers[observer_key]
+                delivery_queue = self._observers.pop(observer_key)[4]
+                self._observers_snapshot = tuple(self._observers.values())
+                if delivery_queue is not None:
+                    delivery_queue.close()
             else:
                 self._log(level=logging.WARNING,
                           msg="{} was not subscribed".format(observer))
 
+    def unsubscribe_all(self):
+        """Unsubscribe all observers from 'data-received notification'"""
+        with self._observers_lock:
+            self._log(level=TRACE, msg="unsubscribe all observers")
+            delivery_queues = [observer_entry[4] for observer_entry in self._observers.values()
+                               if observer_entry[4] is not None]
+            self._observers.clear()
+            self._observers_snapshot = tuple()
+        for delivery_queue in delivery_queues:
+            delivery_queue.close()
+
+    def clear_recent_data(self):
+        """Forget recently received data - observers subscribing from_offset get only data received after that"""
+        with self._received_data_lock:
+            self._recent_data.clear()
+            self._recent_data_size = 0
+
     def notify_observers(self, data):
         """Notify all subscribed observers about data received on connection"""
-        # need copy since calling subscribers may change self._observers
-        current_subscribers = list(self._observers.values())
-        for self_or_none, observer_function in current_subscribers:
+        # snapshot is replaced (not modified) by subscribe/unsubscribe - so, no lock and no copy needed here
+        blocked_deliveries = self._notify(data, observers=self._observers_snapshot)
+        if blocked_deliveries:
+            _await_blocked_deliveries(blocked_deliveries)
+
+    def stats(self):
+        """
+        Return statistics of passing data to observers (of current and past subscriptions)
+
+        :return: dict {observer name: {'calls': int, 'processing_time': float sec, 'max_processing_time': float sec,
+                                       'data_size': int}}
+        """
+        with self._observers_lock:
+            observers_stats = list(self._observers_stats.values())
+            queues = [(observer_stats.name, delivery_queue)
+                      for _, _, _, observer_stats, delivery_queue in self._observers.values() if delivery_queue]
+        stats = dict((observer_stats.name, observer_stats.as_dict()) for observer_stats in observers_stats)
+        for observer_stats in stats.values():
+            observer_stats['queue_depth'] = 0
+        for name, delivery_queue in queues:
+            stats[name]['queue_depth'] += len(delivery_queue)
+        return stats
+
+    @staticmethod
+    def _observer_name(observer):
+        try:
+            observer_self = six.get_method_self(observer)
+            return "{}.{}".format(observer_self.__class__.__name__, six.get_method_function(observer).__name__)
+        except AttributeError:
+            return getattr(observer, '__name__', repr(observer))
+
+    def _notify(self, data, observers, raw_data=None):
+        """
+        Pass data to observers (call them or put data into their delivery queues)
+
+        :return: None or list of (delivery queue, data) that wait for space inside full queue - caller puts them
+                 after releasing its locks (external-IO may block there, but not while keeping connection locked)
+        """
+        trace_notifications = self._logger_levels.is_enabled_for(self.logger, TRACE)
+        lines = None  # split once, on demand of first observer subscribed for lines
+        blocked_deliveries = None
+        for observer_entry in observers:
+            data_form = observer_entry[2]
+            if (data_form == _LINES) and (lines is None) and (data is not None):
+                lines = split_into_lines(data, self.lines_newline_chars)
+            observer_data = _data_in_form(data_form, data=data, lines=lines, raw_data=raw_data)
+            if observer_data is None:  # not decoded or not received from external-IO
+                continue
+            if not self._deliver(observer_entry, observer_data, data, trace_notifications):
+                blocked_deliveries = blocked_deliveries or list()
+                blocked_deliveries.append((observer_entry[4], observer_data))
+        return blocked_deliveries
+
+    def _deliver(self, observer_entry, observer_data, data, trace_notifications):
+        self_or_none, observer_function, data_form, observer_stats, delivery_queue = observer_entry
+        try:
+            if trace_notifications:
+                self._log(level=TRACE, msg=r'notifying {}({!r})'.format(observer_function, repr(observer_data)))
             try:
-                self._log(level=TRACE, msg=r'notifying {}({!r})'.format(observer_function, repr(data)))
-                try:
-                    if self_or_none is None:
-                        observer_function(data)
-                    else:
-                        observer_self = self_or_none
-                        observer_function(observer_self, data)
-                except Exception:
-                    self.logger.exception(msg=r'Exception inside: {}({!r})'.format(observer_function, repr(data)))
-            except ReferenceError:
-                pass  # ignore: weakly-referenced object no longer exists
+                if delivery_queue is not None:
+                    return delivery_queue.put(observer_data, block=False)
+                data_size = len(observer_data) if data_form == _RAW_DATA else len(data)
+                self._call_observer(self_or_none, observer_function, observer_data, observer_stats, data_size)
+            except Exception:
+                self.logger.exception(msg=r'Exception inside: {}({!r})'.format(observer_function,
+                                                                               repr(observer_data)))
+        except ReferenceError:
+            pass  # ignore: weakly-referenced object no longer exists
+        return True
+
+    def _call_observer(self, self_or_none, observer_function, observer_data, observer_stats, data_size):
+        call_start = default_timer()
+        try:
+            if self_or_none is None:
+                observer_function(observer_data)
+            else:
+                observer_self = self_or_none
+                observer_function(observer_self, observer_data)
+        finally:
+            self._update_observer_stats(observer_stats, processing_time=default_timer() - call_start,
+                                        data_size=data_size)
+
+    def _update_observer_stats(self, observer_stats, processing_time, data_size):
+        observer_stats.record_call(processing_time, data_size)
+        if (self.slow_observer_threshold is not None) and (processing_time > self.slow_observer_threshold):
+            self._log(level=logging.WARNING,
+                      msg="slow observer {} processed {} of data in {:.4f} sec (threshold {} sec)".format(
+                          observer_stats.name, data_size, processing_time, self.slow_observer_threshold))
 
     @staticmethod
     def _get_observer_key_value(observer):
@@ -452,6 +1010,19 @@ def get_connection(name=None, io_type=None, variant=None, **constructor_kwargs):
     return io_conn
 
 
+def get_named_connection_params(name, variant=None):
+    """
+    Return parameters of connection defined in configuration under given name
+
+    :param name: name of connection defined in configuration
+    :param variant: implementation variant, if not given then it is taken from configuration
+    :return: tuple (io_type, variant, constructor_kwargs) - ConnectionFactory.get_connection() parameters building it
+    """
+    io_type, constructor_kwargs = _try_take_named_connection_params(name, io_type=None)
+    variant = _try_select_io_type_variant(io_type, variant)
+    return io_type, variant, dict(constructor_kwargs)
+
+
 def _try_take_named_connection_params(name, io_type, **constructor_kwargs):
     if name:
         if name not in connection_cfg.named_connections:
@@ -506,7 +1077,7 @@ def _register_builtin_connections():
 
     def mlr_conn_utf8(name):
         return ObservableConnection(encoder=lambda data: data.encode("utf-8"),
-                                    decoder=lambda data: data.decode("utf-8"),
+                                    decoder=IncrementalDecoder("utf-8"),
                                     name=name)
 
     def mem_thd_conn(name=None, echo=True):
@@ -529,13 +1100,38 @@ def _register_builtin_connections():
                                             variant="threaded",
                                             constructor=tcp_thd_conn)
 
+    if sys.version_info >= (3, 5):  # asyncio based connections
+        from moler.io.asyncio.tcp import AsyncioTcp
+
+        def tcp_asyncio_conn(port, host='localhost', name=None):
+            mlr_conn = mlr_conn_utf8(name=name)
+            io_conn = AsyncioTcp(moler_connection=mlr_conn,
+                                 port=port, host=host)  # TODO: add name
+            return io_conn
+
+        ConnectionFactory.register_construction(io_type="tcp",
+                                                variant="asyncio",
+                                                constructor=tcp_asyncio_conn)
+
 
 def _register_builtin_unix_connections():
+    from moler.io.raw.subprocess import ThreadedSubprocess
     from moler.io.raw.terminal import ThreadedTerminal
 
+    def mlr_conn_utf8(name):
+        return ObservableConnection(encoder=lambda data: data.encode("utf-8"),
+                                    decoder=IncrementalDecoder("utf-8"),
+                                    name=name)
+
     def mlr_conn_no_encoding(name):
         return ObservableConnection(name=name)
 
+    def subprocess_thd_conn(command, cwd=None, env=None, name=None):
+        mlr_conn = mlr_conn_utf8(name=name)
+        io_conn = ThreadedSubprocess(moler_connection=mlr_conn,
+                                     command=command, cwd=cwd, env=env)  # TODO: add name, logger
+        return io_conn
+
     def terminal_thd_conn(name=None):
         # ThreadedTerminal works on unicode so moler_connection must do no encoding
         mlr_conn = mlr_conn_no_encoding(name=name)
@@ -546,6 +1142,22 @@ def _register_builtin_unix_connections():
     ConnectionFactory.register_construction(io_type="terminal",
                                             variant="threaded",
                                             constructor=terminal_thd_conn)
+    ConnectionFactory.register_construction(io_type="subprocess",
+                                            variant="threaded",
+                                            constructor=subprocess_thd_conn)
+
+    if sys.version_info >= (3, 5):  # asyncio based connections
+        from moler.io.asyncio.terminal import AsyncioTerminal
+
+        def terminal_asyncio_conn(name=None):
+            # AsyncioTerminal works on unicode so moler_connection must do no encoding
+            mlr_conn = mlr_conn_no_encoding(name=name)
+            io_conn = AsyncioTerminal(moler_connection=mlr_conn)  # TODO: add name, logger
+            return io_conn
+
+        ConnectionFactory.register_construction(io_type="terminal",
+                                                variant="asyncio",
+                                                constructor=terminal_asyncio_conn)
 
 
 # actions during import
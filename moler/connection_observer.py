@@ -18,7 +18,7 @@ from moler.exceptions import ResultNotAvailableYet
 from moler.helpers import ClassProperty
 from moler.helpers import camel_case_to_lower_case_underscore
 from moler.helpers import instance_id
-from moler.runner import ThreadPoolExecutorRunner
+from moler.runner import get_default_runner
 import threading
 
 
@@ -31,6 +31,7 @@ class ConnectionObserver(object):
         """
         Create instance of ConnectionObserver class
         :param connection: connection used to receive data awaited for
+        :param runner: runner to run observer in background; if not given - process-wide default runner is used
         """
         self.connection = connection
         self._is_running = False
@@ -38,9 +39,15 @@ class ConnectionObserver(object):
         self._is_cancelled = False
         self._result = None
         self._exception = None
-        self.runner = runner if runner else ThreadPoolExecutorRunner()
+        self._done_callbacks = list()
+        self._done_callbacks_lock = threading.Lock()
+        self.runner = runner if runner else get_default_runner(user=self)
         self._future = None
+        self._start_offset = None  # offset of connection's data when observer was started
         self.timeout = 7
+        # if True and connection uses delivery queues, runner feeds observer from its DeliveryQueue
+        # (inside runner's thread) - so, slow observer doesn't delay external-IO nor other observers
+        self.queued_delivery = False
         self.device_logger = logging.getLogger('moler.{}'.format(self.get_logger_name()))
         self.logger = logging.getLogger('moler.connection.{}'.format(self.get_logger_name()))
 
@@ -66,6 +73,17 @@ class ConnectionObserver(object):
             return started_observer.await_done(*args, **kwargs)
         # TODO: raise ConnectionObserverFailedToStart
 
+    def __await__(self):
+        """
+        Await completion of connection-observer (Python3 'await observer').
+
+        Starts connection-observer if it is not started yet.
+        Awaiting is supported by runners that run observers inside event loop (like AsyncioRunner).
+        """
+        if self._future is None:
+            self.start()
+        return self.runner.wait_for_iterator(connection_observer=self, connection_observer_future=self._future)
+
     def get_logger_name(self):
         if self.connection and hasattr(self.connection, "name"):
             return self.connection.name
@@ -78,6 +96,8 @@ class ConnectionObserver(object):
             self.timeout = timeout
         self._validate_start(*args, **kwargs)
         self._is_running = True
+        # runner may subscribe us a bit later - data coming meanwhile should not be lost
+        self._start_offset = getattr(self.connection, 'received_offset', None)
         self._future = self.runner.submit(self)
         if self._future is None:
             self._is_running = False
@@ -114,10 +134,15 @@ class ConnectionObserver(object):
 
     def cancel(self):
         """Cancel execution of connection-observer."""
+        return self._cancel(notify_done=True)
+
+    def _cancel(self, notify_done):
         if self.cancelled() or self.done():
             return False
         self._is_done = True
         self._is_cancelled = True
+        if notify_done:
+            self._notify_done()
         return True
 
     def cancelled(self):
@@ -138,8 +163,47 @@ class ConnectionObserver(object):
         """Should be used to set final result"""
         if self.done():
             raise ResultAlreadySet(self)
-        self._is_done = True
         self._result = result
+        self._is_done = True
+        self._notify_done()
+
+    def add_done_callback(self, fn):
+        """
+        Attach callable to be called when connection-observer becomes done (has result, exception or is cancelled).
+
+        :param fn: callable taking connection-observer as its only argument;
+                   if connection-observer is already done fn is called immediately
+        :return: None
+        """
+        with self._done_callbacks_lock:
+            if not self._is_done:
+                self._done_callbacks.append(fn)
+                return
+        self._call_done_callback(fn)
+
+    def remove_done_callback(self, fn):
+        """
+        Detach callable previously attached by add_done_callback()
+
+        :param fn: callable to be removed
+        :return: None
+        """
+        with self._done_callbacks_lock:
+            if fn in self._done_callbacks:
+                self._done_callbacks.remove(fn)
+
+    def _notify_done(self):
+        with self._done_callbacks_lock:
+            callbacks = self._done_callbacks
+            self._done_callbacks = list()
+        for fn in callbacks:
+            self._call_done_callback(fn)
+
+    def _call_done_callback(self, fn):
+        try:
+            fn(self)
+        except Exception:
+            self.logger.exception("Exception inside done-callback {!r} of {!r}".format(fn, self))
 
     @abstractmethod
     def data_received(self, data):
@@ -149,6 +213,16 @@ class ConnectionObserver(object):
         """
         pass
 
+    def accepts_lines(self, newline_chars):
+        """
+        Check if observer may be fed via lines_received() by data split into lines by connection
+        (see moler.connection.split_into_lines) instead of data_received() with raw data.
+
+        :param newline_chars: characters used by connection to split data into lines
+        :return: True if observer implements lines_received() giving same parsing as data_received()
+        """
+        return False
+
     def set_exception(self, exception):
         """Should be used to indicate some failure during observation"""
         self._is_done = True
@@ -168,6 +242,7 @@ class ConnectionObserver(object):
                                                                             self.__class__.__name__,
                                                                             exception.__class__.__module__,
                                                                             exception.__class__.__name__))
+        self._notify_done()
 
     def result(self):
         """Retrieve final result of connection-observer"""
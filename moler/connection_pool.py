@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of external-IO connections created from named connections (see moler.config.connections).
+
+Opening connection (TCP handshake, spawning shell, login ...) may take more time than
+short job using it. Pool keeps connections returned by one job open so, next job asking
+for connection of same name gets already opened one.
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import contextlib
+import logging
+import threading
+import time
+
+from moler.connection import ObservableConnection
+from moler.connection import get_connection
+from moler.connection import get_named_connection_params
+from moler.exceptions import WrongUsage
+
+
+class ConnectionPool(object):
+    """
+    Pool of external-IO connections keyed by named connection specification.
+
+    Connection is created and opened lazily - when first checked out. Checked in connection
+    stays open as idle one (max max_size idle connections per specification) till it is
+    checked out again or stays idle longer than idle_timeout.
+    Checked in connection has its Moler's connection cleared (no observers, no recent data to replay).
+    Connection lost meanwhile (or failing health_check) is not given out but closed and replaced.
+    Connection not reporting connection lost (like ThreadedTcp, ThreadedSubprocess) is checked
+    on checkout by health_check or, if not given, by looking if its socket/process is still there.
+    Redefining named connection inside configuration makes pool create connections of new definition.
+    """
+
+    def __init__(self, max_size=4, idle_timeout=60.0, health_check=None):
+        """
+        Create instance of ConnectionPool class
+
+        :param max_size: max number of idle connections kept per named connection
+        :param idle_timeout: idle connection is closed after that time (float seconds)
+        :param health_check: callable(io_connection) returning False for connection not usable anymore
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self._idle_connections = dict()  # specification: list of (io_connection, checkin time)
+        self._specifications = dict()  # io_connection: specification it was created from
+        self._lost_connections = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.logger = logging.getLogger('moler.connection-pool')
+
+    def __len__(self):
+        """Number of idle connections"""
+        with self._lock:
+            return sum(len(idle_connections) for idle_connections in self._idle_connections.values())
+
+    def checkout(self, name, variant=None):
+        """
+        Take opened connection of given name out of pool
+
+        :param name: name of connection defined in configuration
+        :param variant: implementation variant, if not given then it is taken from configuration
+        :return: opened external-IO connection (to be returned via checkin())
+        """
+        io_type, variant, constructor_kwargs = get_named_connection_params(name, variant=variant)
+        specification = (name, io_type, variant, repr(sorted(constructor_kwargs.items())))
+
+        for io_conn in self._pop_idle_connections(specification):
+            if self._is_healthy(io_conn):
+                self.logger.debug("reusing {!r} as '{}'".format(io_conn, name))
+                return io_conn
+            self._discard(io_conn)
+
+        io_conn = get_connection(name=name, variant=variant)  # handles constructors not accepting 'name'
+        if _reports_connection_lost(io_conn):
+            io_conn.subscribe_on_connection_made(self._on_connection_made)
+            io_conn.subscribe_on_connection_lost(self._on_connection_lost)
+        with self._lock:
+            self._specifications[io_conn] = specification
+        self.logger.debug("opening {!r} as '{}'".format(io_conn, name))
+        try:
+            io_conn.open()
+        except Exception:
+            self._discard(io_conn)
+            raise
+        return io_conn
+
+    def checkin(self, io_conn):
+        """Return connection taken by checkout() - it stays open for next checkout()"""
+        with self._lock:
+            if io_conn not in self._specifications:
+                raise WrongUsage("{!r} was not taken out of this ConnectionPool".format(io_conn))
+        self._clear_moler_connection(io_conn)  # next user must not see observers or data of previous one
+        with self._lock:
+            idle_connections = self._idle_connections.setdefault(self._specifications[io_conn], [])
+            keep_connection = (not self._closed) and (io_conn not in self._lost_connections) and \
+                              (len(idle_connections) < self.max_size)
+            if keep_connection:
+                idle_connections.append((io_conn, time.time()))
+            expired_connections = self._pop_expired_connections()
+        if not keep_connection:
+            self._discard(io_conn)
+        for expired_conn in expired_connections:
+            self._discard(expired_conn)
+
+    @contextlib.contextmanager
+    def connection(self, name, variant=None):
+        """Context manager API: connection is checked out inside "with" block"""
+        io_conn = self.checkout(name, variant=variant)
+        try:
+            yield io_conn
+        finally:
+            self.checkin(io_conn)
+
+    def close(self):
+        """Close all idle connections; connections checked out are closed when checked in"""
+        with self._lock:
+            self._closed = True
+            idle_connections = [io_conn for connections in self._idle_connections.values()
+                                for io_conn, _ in connections]
+            self._idle_connections.clear()
+        for io_conn in idle_connections:
+            self._discard(io_conn)
+
+    def _pop_idle_connections(self, specification):
+        while True:
+            with self._lock:
+                expired_connections = self._pop_expired_connections()
+                idle_connections = self._idle_connections.get(specification)
+                io_conn = idle_connections.pop()[0] if idle_connections else None
+            for expired_conn in expired_connections:
+                self._discard(expired_conn)
+            if io_conn is None:
+                return
+            yield io_conn  # most recently used first - it is most probably alive
+
+    def _pop_expired_connections(self):
+        expiry_time = time.time() - self.idle_timeout
+        expired_connections = []
+        for idle_connections in self._idle_connections.values():
+            expired_connections.extend(io_conn for io_conn, checkin_time in idle_connections
+                                       if checkin_time < expiry_time)
+            idle_connections[:] = [(io_conn, checkin_time) for io_conn, checkin_time in idle_connections
+                                   if checkin_time >= expiry_time]
+        return expired_connections
+
+    def _is_healthy(self, io_conn):
+        with self._lock:
+            if io_conn in self._lost_connections:
+                return False
+        health_check = self.health_check
+        if (health_check is None) and not _reports_connection_lost(io_conn):
+            health_check = _is_io_alive
+        if health_check is None:
+            return True
+        try:
+            return health_check(io_conn)
+        except Exception:
+            self.logger.exception("health check of {!r} raised".format(io_conn))
+            return False
+
+    @staticmethod
+    def _clear_moler_connection(io_conn):
+        moler_conn = getattr(io_conn, 'moler_connection', None)
+        if isinstance(moler_conn, ObservableConnection):
+            moler_conn.unsubscribe_all()
+            moler_conn.clear_recent_data()
+
+    def _discard(self, io_conn):
+        if _reports_connection_lost(io_conn):
+            io_conn.unsubscribe_on_connection_made(self._on_connection_made)
+            io_conn.unsubscribe_on_connection_lost(self._on_connection_lost)
+        with self._lock:
+            self._specifications.pop(io_conn, None)
+            self._lost_connections.discard(io_conn)
+        self.logger.debug("closing {!r}".format(io_conn))
+        try:
+            io_conn.close()  # lost connection may still hold resources (socket, pty)
+        except Exception:
+            self.logger.exception("closing {!r} raised".format(io_conn))
+
+    def _on_connection_made(self, io_conn):
+        with self._lock:
+            self._lost_connections.discard(io_conn)
+
+    def _on_connection_lost(self, io_conn):
+        with self._lock:
+            self._lost_connections.add(io_conn)
+
+
+def _reports_connection_lost(io_conn):
+    """IOConnection based external-IO notifies about connection made/lost"""
+    return hasattr(io_conn, 'subscribe_on_connection_lost')
+
+
+def _is_io_alive(io_conn):
+    """Health check of external-IO not reporting connection lost - it drops its socket/process when it is gone"""
+    if hasattr(io_conn, 'socket'):
+        return io_conn.socket is not None
+    if hasattr(io_conn, 'process'):
+        return (io_conn.process is not None) and (io_conn.process.poll() is None)
+    return True
@@ -8,8 +8,14 @@ __author__ = 'Marcin Usielski'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'marcin.usielski@nokia.com'
 
+import logging
+import threading
 import time
 
+from six.moves import queue
+
+from moler.runner import time_out_observer
+
 
 class EventAwaiter(object):
 
@@ -19,43 +25,57 @@ class EventAwaiter(object):
         Wait for all events are done or timeout occurs
         :param timeout: time in seconds
         :param events: list of events to check
-        :param interval: interval in seconds between checking events
+        :param interval: not used - kept for backward compatibility (events are not polled anymore)
         :return: True if all events are done, False otherwise
         """
-        grand_timeout = timeout
-        start_time = time.time()
-        all_done = True
-        while timeout >= 0:
-            time.sleep(interval)
-            all_done = True
-            for event in events:
-                if not event.done():
-                    all_done = False
-                    break
-            if all_done:
-                break
-            timeout = grand_timeout - (time.time() - start_time)
-        return all_done
+        done_events = EventAwaiter.wait_for_done_events(timeout=timeout, events=events)
+        return len(done_events) == len(events)
 
     @staticmethod
     def wait_for_any(timeout, events, interval=0.001):
         """
         :param timeout: time in seconds
         :param events: list of events to check
-        :param interval: interval in seconds between checking events
+        :param interval: not used - kept for backward compatibility (events are not polled anymore)
         :return: True if any event is done, False otherwise
         """
-        grand_timeout = timeout
-        start_time = time.time()
-        any_done = False
-        while timeout >= 0 and not any_done:
-            time.sleep(interval)
-            for event in events:
-                if event.done():
-                    any_done = True
-                    break
-            timeout = grand_timeout - (time.time() - start_time)
-        return any_done
+        done_events = EventAwaiter.wait_for_done_events(timeout=timeout, events=events, count=1)
+        return len(done_events) > 0
+
+    @staticmethod
+    def wait_for_done_events(timeout, events, count=None):
+        """
+        Wait till count of events are done or timeout occurs.
+
+        Awaiting is woken up by events completion - there is no polling.
+        :param timeout: time in seconds
+        :param events: list of events to await
+        :param count: how many done events are enough to stop awaiting; None means all events
+        :return: list of events done till return - in order of their completion (already done ones go first)
+        """
+        if count is None:
+            count = len(events)
+        done_events = list()
+        events_completion = threading.Condition()
+
+        def on_done(event):
+            with events_completion:
+                done_events.append(event)
+                events_completion.notify()
+
+        for event in events:
+            event.add_done_callback(on_done)  # called at once for already done event
+        try:
+            start_time = time.time()
+            with events_completion:
+                while len(done_events) < count:
+                    remain_time = timeout - (time.time() - start_time)
+                    if remain_time <= 0:
+                        break
+                    events_completion.wait(timeout=remain_time)
+                return list(done_events)
+        finally:
+            EventAwaiter._remove_done_callback(events, on_done)
 
     @staticmethod
     def separate_done_events(events):
@@ -80,3 +100,89 @@ class EventAwaiter(object):
         """
         for event in events:
             event.cancel()
+
+    @staticmethod
+    def as_completed(events, timeout=None):
+        """
+        Start events (connection-observers) that are not started yet and iterate over them as they become done.
+
+        All events run concurrently, so total time is the one of slowest event, not sum of them.
+        :param events: list of events (connection-observers) to run
+        :param timeout: max time in seconds to await all events; events not done by then are timed out.
+                        If None then each event is limited by its own timeout.
+        :return: iterator yielding events in order of their completion
+        """
+        events = list(events)
+        done_events = queue.Queue()
+
+        def on_done(event):
+            done_events.put(event)
+
+        try:
+            for event in events:
+                event.add_done_callback(on_done)
+            for event in events:
+                if not (event.running() or event.done()):
+                    event.start()
+        except Exception:
+            EventAwaiter._remove_done_callback(events, on_done)
+            raise
+        return EventAwaiter._iter_completed(events, done_events, on_done, timeout)
+
+    @staticmethod
+    def gather(events, timeout=None, return_exceptions=True):
+        """
+        Run events (connection-observers) concurrently and await all of them.
+
+        :param events: list of events (connection-observers) to run
+        :param timeout: max time in seconds to await all events; events not done by then are timed out.
+                        If None then each event is limited by its own timeout.
+        :param return_exceptions: if True then exception of failed event is returned in place of its result,
+                                  if False then first (in order of events) of such exceptions is raised
+        :return: list of results in order of events
+        """
+        events = list(events)
+        for _ in EventAwaiter.as_completed(events, timeout=timeout):
+            pass
+        results = list()
+        for event in events:
+            try:
+                results.append(event.result())
+            except Exception as exc:
+                if not return_exceptions:
+                    raise
+                results.append(exc)
+        return results
+
+    @staticmethod
+    def _iter_completed(events, done_events, on_done, timeout):
+        start_time = time.time()
+        not_yielded_count = len(events)
+        try:
+            while not_yielded_count > 0:
+                try:
+                    if timeout is None:
+                        event = done_events.get()
+                    else:
+                        event = done_events.get(timeout=max(timeout - (time.time() - start_time), 0.0))
+                except queue.Empty:
+                    # timed out events become done so, they come into done_events queue
+                    EventAwaiter._time_out_events(events, timeout=timeout, passed_time=time.time() - start_time)
+                    timeout = None
+                    continue
+                not_yielded_count -= 1
+                yield event
+        finally:
+            EventAwaiter._remove_done_callback(events, on_done)
+
+    @staticmethod
+    def _time_out_events(events, timeout, passed_time):
+        logger = logging.getLogger('moler.event_awaiter')
+        for event in events:
+            if not event.done():
+                time_out_observer(event, timeout=timeout, passed_time=passed_time, runner_logger=logger)
+
+    @staticmethod
+    def _remove_done_callback(events, on_done):
+        for event in events:
+            event.remove_done_callback(on_done)
@@ -4,6 +4,9 @@ __author__ = 'Marcin Usielski'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'marcin.usielski@nokia.com'
 
+import six
+
+from moler.connection import split_into_lines
 from moler.event import Event
 
 
@@ -35,18 +38,29 @@ class TextualEvent(Event):
         :param data: List of strings sent by device
         :return: Nothing
         """
-        lines = data.splitlines(True)
-        for line in lines:
+        self.lines_received(split_into_lines(data, self._newline_chars))
+
+    def lines_received(self, lines):
+        """
+        Called by framework with data already split into lines
+        :param lines: Tuple of (line, is_full_line) pairs, full lines have new line chars stripped
+        :return: Nothing
+        """
+        for line, is_full_line in lines:
             if self._last_not_full_line is not None:
                 line = self._last_not_full_line + line
                 self._last_not_full_line = None
-            is_full_line = self.is_new_line(line)
             if is_full_line:
                 line = self._strip_new_lines_chars(line)
             else:
                 self._last_not_full_line = line
             self.on_new_line(line, is_full_line)
 
+    def accepts_lines(self, newline_chars):
+        data_received = six.get_unbound_function(type(self).data_received)
+        return (tuple(newline_chars) == tuple(self._newline_chars)) and \
+            (data_received is six.get_unbound_function(TextualEvent.data_received))
+
     def is_new_line(self, line):
         """
         Method to check if line has chars of new line at the right side
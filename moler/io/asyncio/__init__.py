@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+External-IO connections driven by asyncio event loop. Requires Python 3.5+.
+
+They have no pulling threads - event loop calls them when data is ready.
+Still they fulfill 3 requirements of Moler's external-IO:
+(1) store Moler's connection inside self.moler_connection attribute
+(2) plugin into Moler's connection the way IO outputs data to external world:
+
+    self.moler_connection.how2send = self.send
+
+(3) forward IO received data into self.moler_connection.data_received(data)
+
+They have blocking open()/close() usable outside of running event loop
+and awaitable open_async() usable inside it.
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import asyncio
+import concurrent.futures
+import inspect
+import sys
+import threading
+
+from moler.exceptions import WrongUsage
+
+
+def get_running_loop():
+    """Return event loop running in current thread or None"""
+    if sys.version_info >= (3, 7):
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:  # no running loop
+            return None
+    try:
+        loop = asyncio.get_event_loop()  # it returns running loop when called from inside of it
+    except RuntimeError:  # thread without event loop
+        return None
+    return loop if loop.is_running() else None
+
+
+_thread_event_loops = threading.local()  # loops used by Moler outside of running loop, one per thread
+
+
+def get_event_loop():
+    """
+    Return event loop running in current thread; outside of running loop - Moler's event loop of current thread.
+
+    That one is created at first use (asyncio.get_event_loop() creating it is deprecated).
+    Pass loop explicitly to runner/connections if they should use other not running loop.
+    """
+    loop = get_running_loop()
+    if loop is None:
+        loop = getattr(_thread_event_loops, 'loop', None)
+        if (loop is None) or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            _thread_event_loops.loop = loop
+    return loop
+
+
+def call_in_loop(loop, callback, *args):
+    """
+    Call callback inside event loop thread.
+
+    If we are already there (or loop is not running at all) callback is called at once.
+    """
+    if (get_running_loop() is loop) or (not loop.is_running()):
+        callback(*args)
+    else:
+        loop.call_soon_threadsafe(callback, *args)
+
+
+def run_in_loop(loop, function):
+    """
+    Blocking call of function inside event loop thread; if function returns awaitable - await it.
+
+    :param loop: event loop; if it is not running it is run till function completes
+    :param function: callable without parameters
+    :return: result of function
+    """
+    if get_running_loop() is loop:
+        raise WrongUsage("Can't block inside running event loop - use 'await' on awaitable version of call")
+    if not loop.is_running():
+        result = function()
+        if inspect.isawaitable(result):
+            result = loop.run_until_complete(result)
+        return result
+    return _run_in_loop_of_other_thread(loop, function)
+
+
+def _run_in_loop_of_other_thread(loop, function):
+    done = concurrent.futures.Future()
+
+    def pass_outcome(future):
+        if future.cancelled():
+            done.cancel()
+        elif future.exception() is not None:
+            done.set_exception(future.exception())
+        else:
+            done.set_result(future.result())
+
+    def run_function():
+        try:
+            result = function()
+        except Exception as exc:
+            done.set_exception(exc)
+            return
+        if inspect.isawaitable(result):
+            asyncio.ensure_future(result, loop=loop).add_done_callback(pass_outcome)
+        else:
+            done.set_result(result)
+
+    loop.call_soon_threadsafe(run_function)
+    return done.result()
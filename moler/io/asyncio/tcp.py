@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+External-IO TCP connection based on asyncio.Protocol.
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import asyncio
+
+from moler.io.asyncio import call_in_loop
+from moler.io.asyncio import get_event_loop
+from moler.io.asyncio import run_in_loop
+from moler.io.io_connection import IOConnection
+from moler.io.io_exceptions import RemoteEndpointNotConnected
+
+
+class AsyncioTcp(IOConnection, asyncio.Protocol):
+    """
+    TCP connection feeding Moler's connection from inside of asyncio event loop.
+
+    Event loop calls data_received() of this protocol when data comes from socket,
+    so there is no thread pulling data.
+    """
+
+    def __init__(self, moler_connection, port, host="localhost", loop=None, logger=None):
+        """Initialization of TCP-asyncio connection."""
+        super(AsyncioTcp, self).__init__(moler_connection=moler_connection)
+        self.host = host
+        self.port = port
+        self._loop = loop
+        self._transport = None
+        self._connection_lost = None
+        if logger:
+            self.logger = logger
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = get_event_loop()
+        return self._loop
+
+    def open(self):
+        """Open TCP connection (blocking call - use open_async() inside running event loop)."""
+        run_in_loop(self.loop, self.open_async)
+
+    def open_async(self):
+        """Return awaitable opening TCP connection."""
+        self.logger.debug('connecting to {}'.format(self))
+        return self.loop.create_connection(lambda: self, self.host, self.port)
+
+    def close(self):
+        """Close TCP connection (blocking call - use close_async() inside running event loop)."""
+        run_in_loop(self.loop, self.close_async)
+
+    def close_async(self):
+        """Return awaitable closing TCP connection."""
+        if self._transport is None:
+            already_closed = self.loop.create_future()
+            already_closed.set_result(None)
+            return already_closed
+        self.logger.debug('closing {}'.format(self))
+        self._transport.close()
+        return self._connection_lost
+
+    def send(self, data):
+        """Send data bytes via TCP connection (allowed also from outside of event loop thread)."""
+        if self._transport is None:
+            raise RemoteEndpointNotConnected()
+        call_in_loop(self.loop, self._transport.write, data)
+
+    def connection_made(self, transport):
+        """asyncio.Protocol API: called by event loop when connection is established."""
+        self._transport = transport
+        self._connection_lost = self.loop.create_future()
+        self.logger.debug('connection {} is open'.format(self))
+        self._notify_on_connect()
+
+    def connection_lost(self, exc):
+        """asyncio.Protocol API: called by event loop when connection is closed."""
+        self._transport = None
+        self.logger.debug('connection {} is closed'.format(self))
+        self._notify_on_disconnect()
+        if not self._connection_lost.done():
+            self._connection_lost.set_result(exc)
+
+    def __str__(self):
+        address = 'tcp://{}:{}'.format(self.host, self.port)
+        return address
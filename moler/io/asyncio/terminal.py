@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+External-IO terminal connection (shell working under pty) driven by asyncio event loop.
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import asyncio
+
+from moler.io.asyncio import call_in_loop
+from moler.io.asyncio import get_event_loop
+from moler.io.asyncio import run_in_loop
+from moler.io.raw.terminal import ThreadedTerminal
+
+
+class AsyncioTerminal(ThreadedTerminal):
+    """
+    Works on Unix (like Linux) systems only!
+
+    AsyncioTerminal is shell working under Pty. Its pty fd is watched by event loop (loop.add_reader)
+    so there is no thread pulling data.
+    """
+
+    def __init__(self, moler_connection, cmd=None, read_buffer_size=4096, first_prompt=None,
+                 dimensions=(100, 300), loop=None):
+        super(AsyncioTerminal, self).__init__(moler_connection=moler_connection, cmd=cmd,
+                                              read_buffer_size=read_buffer_size, first_prompt=first_prompt,
+                                              dimensions=dimensions)
+        self._loop = loop
+        self._shell_prompt_appeared = None
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = get_event_loop()
+        return self._loop
+
+    def open(self):
+        """Open AsyncioTerminal connection (blocking call - use open_async() inside running event loop)."""
+        run_in_loop(self.loop, self.open_async)
+
+    def open_async(self):
+        """Return awaitable spawning shell and awaiting (max 2 sec) its prompt."""
+        if not self._terminal:
+            self._terminal = self._spawn_shell()
+            self._shell_prompt_appeared = self.loop.create_future()
+            self.loop.add_reader(self._terminal.fd, self._read_ready)
+        return asyncio.wait([self._shell_prompt_appeared], timeout=2)
+
+    def close(self):
+        """Close AsyncioTerminal connection & stop watching its pty."""
+        if self._terminal:
+            run_in_loop(self.loop, self._stop_reading)
+        super(AsyncioTerminal, self).close()
+
+    def send(self, data):
+        """Write data into AsyncioTerminal connection (allowed also from outside of event loop thread)."""
+        call_in_loop(self.loop, self._terminal.write, data)
+
+    def _read_ready(self):
+        try:
+            data = self._read_with_adaptive_size()
+        except EOFError:
+            self._stop_reading()
+            self._notify_on_disconnect()
+            return
+        self._terminal_output_received(data)
+        if self._shell_operable.is_set() and not self._shell_prompt_appeared.done():
+            self._shell_prompt_appeared.set_result(True)
+
+    def _stop_reading(self):
+        if self._terminal:
+            self.loop.remove_reader(self._terminal.fd)
@@ -168,6 +168,9 @@ class IOConnection(object):
             msg="Connection to: '{}' has been opened.".format(self.name),
             extra={'log_name': self.name}
         )
+        reset_decoder = getattr(self.moler_connection, 'reset_decoder', None)
+        if reset_decoder is not None:  # bytes of previous connection are not continued by new one
+            reset_decoder()
         self._notify(self._connect_subscribers_lock, self._connect_subscribers)
 
     def _notify_on_disconnect(self):
@@ -220,6 +220,8 @@ class ThreadedFifoBuffer(FifoBuffer):
     def close(self):
         """Stop pulling thread."""
         if self.pulling_thread:
+            self.pulling_thread.done_event.set()
+            self.injections.put((None, 0.0))  # wake pulling thread
             self.pulling_thread.join()
             self.pulling_thread = None
         super(ThreadedFifoBuffer, self).close()
@@ -251,10 +253,12 @@ class ThreadedFifoBuffer(FifoBuffer):
         while not pulling_done.is_set():
             self.read()  # internally forwards to embedded Moler connection
             try:
-                data, delay = self.injections.get_nowait()
+                # FIFO has no fd to be watched by reactor - but it may sleep till injection comes
+                data, delay = self.injections.get(timeout=0.1)
                 if delay:
                     time.sleep(delay)
-                self._inject(data)
+                if data is not None:
+                    self._inject(data)
                 self.injections.task_done()
             except Empty:
-                time.sleep(0.01)  # give FIFO chance to get data
+                pass
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Reactor - single thread watching many file descriptors (via epoll/kqueue/select - see selectors module).
+
+Threaded external-IO connections register their socket/pty with reactor instead of running
+own thread polling it. Reactor thread sleeps till some registered fd becomes readable
+and then calls callback of that fd (which forwards data into Moler's connection).
+Callbacks are run inside reactor thread so, they should not block - one slow callback delays
+all connections of that reactor. Connections are sharded among few reactors (by fd) to limit such impact.
+
+Be aware that connection's callback forwards data into Moler's connection which notifies its observers
+inside that same reactor thread. So, slow observer of one connection delays data of other connections
+sharing its reactor. Such observer should be subscribed with queued=True - it gets data inside
+its own delivery thread (see ObservableConnection.subscribe()).
+Reactor's lock is not held while callbacks run - (un)registering other fds doesn't await them.
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import logging
+import socket
+import threading
+
+try:
+    import selectors
+except ImportError:  # Python 2.7 - connections keep their own pulling threads
+    selectors = None
+
+reactor_shards = 4  # max number of reactor threads
+_reactors = dict()  # shard: Reactor
+_reactors_lock = threading.Lock()
+
+
+def is_reactor_available():
+    """Reactor requires selectors module (Python 3.4+)"""
+    return selectors is not None
+
+
+def get_reactor(fileobj):
+    """
+    Return reactor watching given file descriptor (reactors are created lazily)
+
+    :param fileobj: file descriptor (int) or object having fileno() method
+    :return: instance of Reactor
+    """
+    fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()
+    shard = fd % reactor_shards
+    with _reactors_lock:
+        if shard not in _reactors:
+            _reactors[shard] = Reactor(name="Reactor-{}".format(shard))
+        return _reactors[shard]
+
+
+class Reactor(object):
+    def __init__(self, name="Reactor"):
+        """
+        Create instance of Reactor class
+
+        :param name: name of reactor thread
+        """
+        self.name = name
+        self._selector = selectors.DefaultSelector()
+        # selector wakes on our byte to see changed registrations or shutdown
+        self._wakeup_receiver, self._wakeup_sender = socket.socketpair()
+        self._wakeup_receiver.setblocking(False)
+        self._selector.register(self._wakeup_receiver, selectors.EVENT_READ, None)
+        self._lock = threading.Lock()  # guards registrations
+        self._callback_lock = threading.RLock()  # held while callback runs; callback may unregister its own fd
+        self._running_callback_fileobj = None
+        self._thread = None
+        self._in_shutdown = False
+        self.logger = logging.getLogger('moler.reactor')
+
+    def __len__(self):
+        """Number of registered file descriptors"""
+        with self._lock:
+            return len(self._selector.get_map()) - 1  # without wakeup socket
+
+    def register(self, fileobj, on_readable):
+        """
+        Call on_readable() from reactor thread each time fileobj becomes readable.
+
+        :param fileobj: file descriptor (int) or object having fileno() method
+        :param on_readable: callable without parameters
+        """
+        with self._lock:
+            self._selector.register(fileobj, selectors.EVENT_READ, on_readable)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name)
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup()
+
+    def unregister(self, fileobj):
+        """
+        Stop watching fileobj (no-op if it is not registered)
+
+        When unregister() returns on_readable() of fileobj is not running and will not be called anymore.
+        """
+        with self._lock:
+            try:
+                self._selector.unregister(fileobj)
+            except (KeyError, ValueError):
+                return
+            callback_is_running = self._running_callback_fileobj is fileobj
+        if callback_is_running:
+            with self._callback_lock:  # awaits end of its callback
+                pass
+        self._wakeup()
+
+    def shutdown(self):
+        """Stop reactor thread; registered file descriptors are not watched anymore."""
+        with self._lock:
+            if self._in_shutdown:
+                return
+            self._in_shutdown = True
+        self._wakeup()
+        if (self._thread is not None) and (self._thread is not threading.current_thread()):
+            self._thread.join()
+        self._selector.close()
+        self._wakeup_receiver.close()
+        self._wakeup_sender.close()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_sender.send(b'\0')
+        except socket.error:
+            pass  # wakeup byte is already awaiting reactor (full buffer) or reactor is closed
+
+    def _run(self):
+        self.logger.debug("{} started".format(self.name))
+        while True:
+            events = self._selector.select()
+            with self._lock:
+                if self._in_shutdown:
+                    break
+            for key, _ in events:
+                if key.fileobj is self._wakeup_receiver:
+                    self._drain_wakeups()
+                else:
+                    self._call_if_registered(key)
+        self.logger.debug("{} finished".format(self.name))
+
+    def _call_if_registered(self, key):
+        with self._callback_lock:
+            with self._lock:  # not unregistered meanwhile (nor reactor shut down by previous callback)
+                is_registered = (not self._in_shutdown) and (self._selector.get_map().get(key.fileobj) is key)
+                if is_registered:
+                    self._running_callback_fileobj = key.fileobj
+            if is_registered:
+                try:
+                    key.data()
+                except Exception:
+                    self.logger.exception("callback {} raised".format(key.data))
+                finally:
+                    with self._lock:
+                        self._running_callback_fileobj = None
+
+    def _drain_wakeups(self):
+        try:
+            while self._wakeup_receiver.recv(4096):
+                pass
+        except socket.error:
+            pass  # nothing more to read
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Shell pool - shells (pty processes) spawned in background before terminal connections ask for them.
+
+Opening ThreadedTerminal spawns bash and awaits its prompt. With shell pool enabled
+
+    from moler.io.raw import shell_pool
+    shell_pool.enable_shell_pool(size=2)
+
+terminal takes already started shell out of pool (its prompt already awaits reading inside pty)
+and pool spawns replacement in background - keeping max 'size' idle shells per command & pty dimensions.
+Shell is never given back to pool - after close its state (current directory, environment, login
+into other host, ...) is unknown so, it is terminated and its slot is recycled by fresh shell.
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import atexit
+import logging
+import threading
+
+from ptyprocess import PtyProcessUnicode
+
+_shell_pool = None
+_shell_pool_lock = threading.Lock()
+
+
+class ShellPool(object):
+    def __init__(self, size=2):
+        """
+        Create instance of ShellPool class
+
+        :param size: max number of idle shells kept per command & pty dimensions
+        """
+        self.size = size
+        self._idle_shells = dict()  # (command, dimensions): list of spawned shells
+        self._lock = threading.Lock()
+        self._refilling_thread = None
+        self._closed = False
+        self.logger = logging.getLogger('moler.shell-pool')
+
+    def __len__(self):
+        """Number of idle shells"""
+        with self._lock:
+            return sum(len(shells) for shells in self._idle_shells.values())
+
+    def prespawn(self, cmd, dimensions):
+        """Start spawning shells of given command & pty dimensions in background"""
+        with self._lock:
+            self._idle_shells.setdefault(self._key(cmd, dimensions), [])
+        self._start_refilling()
+
+    def take(self, cmd, dimensions):
+        """
+        Take spawned shell out of pool
+
+        :param cmd: command of shell (list of program and its arguments)
+        :param dimensions: (rows, columns) of shell's pty
+        :return: PtyProcessUnicode or None if there is no idle shell (yet) - then caller spawns shell itself
+        """
+        shell = None
+        dead_shells = []
+        with self._lock:
+            idle_shells = self._idle_shells.setdefault(self._key(cmd, dimensions), [])
+            while idle_shells and (shell is None):
+                candidate = idle_shells.pop(0)  # oldest first - it had most time to start
+                if candidate.isalive():
+                    shell = candidate
+                else:
+                    dead_shells.append(candidate)
+        for dead_shell in dead_shells:
+            self._terminate(dead_shell)
+        self._start_refilling()
+        return shell
+
+    def close(self):
+        """Terminate idle shells and stop spawning new ones"""
+        with self._lock:
+            self._closed = True
+            idle_shells = [shell for shells in self._idle_shells.values() for shell in shells]
+            self._idle_shells.clear()
+        for shell in idle_shells:
+            self._terminate(shell)
+
+    @staticmethod
+    def _key(cmd, dimensions):
+        return tuple(cmd), tuple(dimensions)
+
+    def _start_refilling(self):
+        with self._lock:
+            if (self._refilling_thread is None) and (not self._closed):
+                self._refilling_thread = threading.Thread(target=self._refill, name="ShellPool-refilling")
+                self._refilling_thread.daemon = True
+                self._refilling_thread.start()
+
+    def _refill(self):
+        while True:
+            with self._lock:
+                missing_keys = [key for key, shells in self._idle_shells.items() if len(shells) < self.size]
+                if self._closed or not missing_keys:
+                    self._refilling_thread = None  # under lock - so _start_refilling() sees we are done
+                    return
+            cmd, dimensions = missing_keys[0]
+            try:
+                shell = PtyProcessUnicode.spawn(list(cmd), dimensions=dimensions)
+            except Exception:
+                self.logger.exception("spawning {} failed".format(cmd))
+                with self._lock:
+                    self._refilling_thread = None
+                return
+            with self._lock:
+                keep_shell = not self._closed
+                if keep_shell:
+                    self._idle_shells.setdefault((cmd, dimensions), []).append(shell)
+            if not keep_shell:
+                self._terminate(shell)
+
+    def _terminate(self, shell):
+        try:
+            shell.close(force=True)
+        except Exception:
+            self.logger.exception("terminating shell {} raised".format(shell.pid))
+
+
+def enable_shell_pool(size=2, dimensions=(100, 300)):
+    """
+    Enable pool of shells and start spawning shells of ThreadedTerminal default command.
+
+    :param size: max number of idle shells kept per command & pty dimensions
+    :param dimensions: (rows, columns) of pty of shells spawned in advance
+    :return: None
+    """
+    from moler.io.raw.terminal import ThreadedTerminal
+    global _shell_pool
+    pool = ShellPool(size=size)
+    with _shell_pool_lock:
+        previous_pool, _shell_pool = _shell_pool, pool
+    if previous_pool is not None:
+        previous_pool.close()
+    pool.prespawn(cmd=ThreadedTerminal.default_cmd(), dimensions=dimensions)
+
+
+def disable_shell_pool():
+    """Disable pool of shells - terminal connections spawn their shells on open() again."""
+    global _shell_pool
+    with _shell_pool_lock:
+        previous_pool, _shell_pool = _shell_pool, None
+    if previous_pool is not None:
+        previous_pool.close()
+
+
+def is_shell_pool_enabled():
+    return _shell_pool is not None
+
+
+def get_shell_pool():
+    """Return pool of shells or None if it is disabled"""
+    return _shell_pool
+
+
+def take_shell(cmd, dimensions):
+    """Return shell spawned in advance or None (pool disabled or it has no ready shell)"""
+    pool = _shell_pool
+    if pool is None:
+        return None
+    return pool.take(cmd=cmd, dimensions=dimensions)
+
+
+atexit.register(disable_shell_pool)
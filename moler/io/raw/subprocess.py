@@ -1,43 +1,234 @@
 # -*- coding: utf-8 -*-
-"""External-IO connections based on pyhon subprocess module."""
+"""
+External-IO connections based on python subprocess module.
 
-__author__ = 'Michal Plichta'
+Tool is started directly (no pty, no bash wrapper) so, it starts faster than ThreadedTerminal.
+But it sees pipes, not terminal - there is no echo of sent data, no shell prompt
+and tool may buffer its output (like python does without -u option).
+Works on Unix (like Linux) systems only! (select() on pipes)
+
+The only 3 requirements for these connections are:
+(1) store Moler's connection inside self.moler_connection attribute
+(2) plugin into Moler's connection the way IO outputs data to external world:
+
+    self.moler_connection.how2send = self.send
+
+(3) forward IO received data into self.moler_connection.data_received(data)
+"""
+from __future__ import absolute_import  # stdlib subprocess, not this module
+
+__author__ = 'Michal Plichta, Grzegorz Latuszek'
 __copyright__ = 'Copyright (C) 2018, Nokia'
-__email__ = 'michal.plichta@nokia.com'
+__email__ = 'michal.plichta@nokia.com, grzegorz.latuszek@nokia.com'
+
+import errno
+import fcntl
+import os
+import select
+import shlex
+import subprocess
+import threading
+import time
+
+import six
+
+from moler.io.io_exceptions import ConnectionTimeout
+from moler.io.io_exceptions import RemoteEndpointDisconnected
+from moler.io.io_exceptions import RemoteEndpointNotConnected
+from moler.io.raw import TillDoneThread
+from moler.io.raw.reactor import get_reactor, is_reactor_available
 
 
 class Subprocess(object):
-    def __init__(self):
-        pass
+    r"""
+    Implementation of connection to local process using python builtin modules.::
+
+        stdin.write      +-----------+
+                  -----> |  command  |
+        os.read          |           |
+                  <----- +-----------+  (stdout and stderr)
 
-    def start(self):
-        pass
+    """
+    def __init__(self, command, cwd=None, env=None, read_chunk_size=4096, terminate_timeout=2.0,
+                 logger=None):
+        """
+        Initialization of subprocess connection.
 
-    def stop(self):
-        pass
+        :param command: command to run - list of program and its arguments or string to be split like by shell
+        :param cwd: working directory of process
+        :param env: environment variables of process (default: inherited from our process)
+        :param read_chunk_size: max number of bytes read from process output at once
+        :param terminate_timeout: time (float seconds) given to process to exit on close() before it is killed
+        :param logger: logger for connection activity
+        """
+        if isinstance(command, six.string_types):
+            command = shlex.split(command)
+        self.command = list(command)
+        self.cwd = cwd
+        self.env = env
+        self.read_chunk_size = read_chunk_size
+        self.terminate_timeout = terminate_timeout
+        self.logger = logger
+        self.process = None
+
+    def open(self):
+        """Start process with non-blocking pipe of its output."""
+        self._debug('starting {}'.format(self))
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, bufsize=0, cwd=self.cwd, env=self.env,
+                                        close_fds=True)
+        output_fd = self.process.stdout.fileno()
+        fcntl.fcntl(output_fd, fcntl.F_SETFL, fcntl.fcntl(output_fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self._debug('process {} of {} is running'.format(self.process.pid, self))
+
+    def close(self):
+        """Stop process - give it terminate_timeout to exit after closing its input and SIGTERM, then kill it."""
+        if self.process is not None:
+            self._debug('stopping process {} of {}'.format(self.process.pid, self))
+            self._close_ignoring_exceptions(self.process.stdin)
+            if not self._await_exit(timeout=0.1):  # allow tool to finish on end of its input
+                self.process.terminate()
+                if not self._await_exit(timeout=self.terminate_timeout):
+                    self.process.kill()
+                    self.process.wait()
+            self._close_ignoring_exceptions(self.process.stdout)
+            self._debug('process {} of {} exited with {}'.format(self.process.pid, self, self.process.returncode))
+            self.process = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False  # reraise exceptions if any
 
     def send(self, data):
-        pass
+        """Send data bytes into input of process."""
+        if self.process is None:
+            raise RemoteEndpointNotConnected()
+        try:
+            self.process.stdin.write(data)
+            self._debug('> {}', data)
+        except (IOError, OSError) as err:
+            if err.errno in (errno.EPIPE, errno.EINVAL):  # process has exited
+                raise RemoteEndpointDisconnected(err.errno)
+            raise
 
     def receive(self, timeout=30):
-        pass
+        """
+        Receive data (max read_chunk_size bytes) from output of process.
+
+        :param timeout: time-out, default 30 sec
+        :type timeout: float
+        """
+        if self.process is None:
+            raise RemoteEndpointNotConnected()
+        ready = select.select([self.process.stdout], [], [], timeout)
+        if ready[0]:
+            try:
+                data = os.read(self.process.stdout.fileno(), self.read_chunk_size)
+            except OSError as err:
+                if err.errno in (errno.EAGAIN, errno.EWOULDBLOCK):  # readiness was stale
+                    raise ConnectionTimeout()
+                raise
+            if not data:  # process closed its output - it has exited
+                raise RemoteEndpointDisconnected()
+            self._debug('< {}', data)
+            return data
+        else:
+            raise ConnectionTimeout()
+
+    def _await_exit(self, timeout):
+        give_up_time = time.time() + timeout
+        while self.process.poll() is None:
+            if time.time() > give_up_time:
+                return False
+            time.sleep(0.01)
+        return True
 
-    def data_received(self, data):
-        pass
+    @staticmethod
+    def _close_ignoring_exceptions(pipe):
+        try:
+            pipe.close()
+        except (IOError, OSError):
+            pass  # process may be gone with unread part of its input
 
-    def read_subprocess_output(self):
-        pass
+    def __str__(self):
+        return 'subprocess:{}'.format(' '.join(self.command))
+
+    def _debug(self, msg, *args):
+        if self.logger:
+            self.logger.debug(msg.format(*args) if args else msg)
 
 
 class ThreadedSubprocess(Subprocess):
-    def __init__(self):
-        super(ThreadedSubprocess, self).__init__()
+    """
+    Subprocess connection feeding Moler's connection inside background thread.
+
+    Output of process is read by reactor thread shared with other connections
+    (see moler.io.raw.reactor) or by dedicated thread if reactor is not available.
+    """
+
+    def __init__(self, moler_connection, command, cwd=None, env=None, read_chunk_size=4096,
+                 terminate_timeout=2.0, logger=None):
+        """Initialization of subprocess-threaded connection."""
+        super(ThreadedSubprocess, self).__init__(command=command, cwd=cwd, env=env,
+                                                 read_chunk_size=read_chunk_size,
+                                                 terminate_timeout=terminate_timeout,
+                                                 logger=logger)
+        self.pulling_thread = None
+        self._reactor = None
+        self._registered_output = None
+        # make Moler happy (3 requirements) :-)
+        self.moler_connection = moler_connection  # (1)
+        self.moler_connection.how2send = self.send  # (2)
 
     def open(self):
-        pass
+        """Start process & start feeding Moler's connection with its output."""
+        super(ThreadedSubprocess, self).open()
+        if is_reactor_available():
+            self._registered_output = self.process.stdout
+            self._reactor = get_reactor(self.process.stdout)
+            self._reactor.register(self.process.stdout, self._on_readable)
+            return
+        done = threading.Event()
+        self.pulling_thread = TillDoneThread(target=self.pull_data,
+                                             done_event=done,
+                                             kwargs={'pulling_done': done})
+        self.pulling_thread.start()
 
     def close(self):
-        pass
+        """Stop feeding Moler's connection & stop process."""
+        self._unregister_from_reactor()
+        if self.pulling_thread:
+            self.pulling_thread.join()
+            self.pulling_thread = None
+        super(ThreadedSubprocess, self).close()
 
     def pull_data(self, pulling_done):
-        pass
+        """Pull data from output of process."""
+        while not pulling_done.is_set():
+            try:
+                data = self.receive(timeout=0.1)
+                self.moler_connection.data_received(data)  # (3)
+            except ConnectionTimeout:
+                continue
+            except (RemoteEndpointNotConnected, RemoteEndpointDisconnected):
+                break
+
+    def _on_readable(self):
+        """Called by reactor when process has output."""
+        try:
+            data = self.receive(timeout=0)  # don't block reactor if readiness is stale
+            self.moler_connection.data_received(data)  # (3)
+        except ConnectionTimeout:
+            pass
+        except (RemoteEndpointNotConnected, RemoteEndpointDisconnected):
+            self._unregister_from_reactor()  # closed pipe stays readable - reactor would spin
+
+    def _unregister_from_reactor(self):
+        if self._reactor is not None:
+            self._reactor.unregister(self._registered_output)
+            self._reactor = None
+            self._registered_output = None
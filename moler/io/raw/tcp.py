@@ -15,6 +15,7 @@ __author__ = 'Grzegorz Latuszek'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'grzegorz.latuszek@nokia.com'
 
+import logging
 import select
 import socket
 import sys
@@ -24,6 +25,7 @@ from moler.io.io_exceptions import ConnectionTimeout
 from moler.io.io_exceptions import RemoteEndpointDisconnected
 from moler.io.io_exceptions import RemoteEndpointNotConnected
 from moler.io.raw import TillDoneThread
+from moler.io.raw.reactor import get_reactor, is_reactor_available
 
 # TODO: logging - want to know what happens on GIVEN connection
 # TODO: logging - rethink details
@@ -51,6 +53,7 @@ class Tcp(object):
         self.receive_buffer_size = receive_buffer_size
         self.logger = logger  # TODO: build default logger if given is None?
         self.socket = None
+        self._receive_buffer = None  # reused by receive_into()
 
     def open(self):
         """Open TCP connection."""
@@ -90,7 +93,7 @@ class Tcp(object):
             self.socket.send(data)
             # TODO: rework logging to have LogRecord with extra=direction
             # TODO: separate data sent/received from other log records ?
-            self._debug('> {}'.format(data))
+            self._debug('> {}', data)
         except socket.error as serr:
             if (serr.errno == 10054) or (serr.errno == 10053):
                 self._close_ignoring_exceptions()
@@ -106,15 +109,33 @@ class Tcp(object):
         :param timeout: time-out, default 30 sec
         :type timeout: float
         """
+        return self._receive(timeout)
+
+    def receive_into(self, timeout=30):
+        """
+        Receive data into buffer reused by subsequent calls - no allocation of bytes object per read.
+
+        :param timeout: time-out, default 30 sec
+        :type timeout: float
+        :return: memoryview of received data - valid only till next receive_into() (copy it to keep data)
+        """
+        if self._receive_buffer is None:
+            self._receive_buffer = memoryview(bytearray(self.receive_buffer_size))
+        return self._receive(timeout, into_buffer=True)
+
+    def _receive(self, timeout, into_buffer=False):
         if not self.socket:
             raise RemoteEndpointNotConnected()
         ready = select.select([self.socket], [], [], timeout)
         if ready[0]:
             try:
-                data = self.socket.recv(self.receive_buffer_size)
+                if into_buffer:
+                    data = self._receive_buffer[:self.socket.recv_into(self._receive_buffer)]
+                else:
+                    data = self.socket.recv(self.receive_buffer_size)
                 # TODO: rework logging to have LogRecord with extra=direction
                 # TODO: separate data sent/received from other log records ?
-                self._debug('< {}'.format(data))
+                self._debug('< {}', data)
             except socket.error as serr:
                 if (serr.errno == 10054) or (serr.errno == 10053):
                     self._close_ignoring_exceptions()
@@ -144,27 +165,39 @@ class Tcp(object):
         address = 'tcp://{}:{}'.format(self.host, self.port)
         return address
 
-    def _debug(self, msg):  # TODO: refactor to class decorator or so
-        if self.logger:
-            self.logger.debug(msg)
+    def _debug(self, msg, *args):  # TODO: refactor to class decorator or so
+        if self.logger and self.logger.isEnabledFor(logging.DEBUG):
+            args = [arg.tobytes() if isinstance(arg, memoryview) else arg for arg in args]
+            self.logger.debug(msg.format(*args) if args else msg)  # formatting data only when it is logged
 
 
 class ThreadedTcp(Tcp):
     """
-    TCP connection feeding Moler's connection inside dedicated thread.
+    TCP connection feeding Moler's connection inside background thread.
 
     This is external-IO usable for Moler since it has it's own runner
     (thread) that can work in background and pull data from TCP connection.
+    That is thread of reactor shared with other connections (see moler.io.raw.reactor)
+    or dedicated thread if reactor is not available.
     """
 
     def __init__(self, moler_connection,
                  port, host="localhost", receive_buffer_size=64 * 4096,
-                 logger=None):
-        """Initialization of TCP-threaded connection."""
+                 logger=None, zero_copy_receive=False):
+        """
+        Initialization of TCP-threaded connection.
+
+        zero_copy_receive=True makes received data land in reused buffer that is passed to Moler's connection
+        as memoryview (see receive_into()). Only decoder of Moler's connection sees that memoryview - it must not
+        keep it since buffer content changes with next received chunk; other consumers get copy of data.
+        """
         super(ThreadedTcp, self).__init__(port=port, host=host,
                                           receive_buffer_size=receive_buffer_size,
                                           logger=logger)
+        self.zero_copy_receive = zero_copy_receive
         self.pulling_thread = None
+        self._reactor = None
+        self._registered_socket = None
         # make Moler happy (3 requirements) :-)
         self.moler_connection = moler_connection  # (1)
         self.moler_connection.how2send = self.send  # (2)
@@ -172,6 +205,11 @@ class ThreadedTcp(Tcp):
     def open(self):
         """Open TCP connection & start thread pulling data from it."""
         super(ThreadedTcp, self).open()
+        if is_reactor_available():
+            self._registered_socket = self.socket
+            self._reactor = get_reactor(self.socket)
+            self._reactor.register(self.socket, self._on_readable)
+            return
         done = threading.Event()
         self.pulling_thread = TillDoneThread(target=self.pull_data,
                                              done_event=done,
@@ -180,6 +218,7 @@ class ThreadedTcp(Tcp):
 
     def close(self):
         """Close TCP connection & stop pulling thread."""
+        self._unregister_from_reactor()
         if self.pulling_thread:
             self.pulling_thread.join()
             self.pulling_thread = None
@@ -189,7 +228,7 @@ class ThreadedTcp(Tcp):
         """Pull data from TCP connection."""
         while not pulling_done.is_set():
             try:
-                data = self.receive(timeout=0.1)
+                data = self._receive_chunk(timeout=0.1)
                 if data:
                     # make Moler happy :-)
                     self.moler_connection.data_received(data)  # (3)
@@ -201,3 +240,33 @@ class ThreadedTcp(Tcp):
                 break
         if self.socket is not None:
             self._close_ignoring_exceptions()
+
+    def _on_readable(self):
+        """Called by reactor when socket has data."""
+        try:
+            data = self._receive_chunk(timeout=0)  # don't block reactor if readiness is stale
+            self.moler_connection.data_received(data)  # (3)
+        except ConnectionTimeout:
+            pass
+        except (RemoteEndpointNotConnected, RemoteEndpointDisconnected):
+            self._close_ignoring_exceptions()
+        except socket.error:  # like reset by peer - socket would stay readable, reactor would spin
+            self._close_ignoring_exceptions()
+            raise
+
+    def _receive_chunk(self, timeout):
+        if self.zero_copy_receive:
+            return self.receive_into(timeout=timeout)
+        return self.receive(timeout=timeout)
+
+    def _close_ignoring_exceptions(self):
+        # unregister before close - number of closed fd may be taken by other connection of reactor
+        self._unregister_from_reactor()
+        if self.socket is not None:
+            super(ThreadedTcp, self)._close_ignoring_exceptions()
+
+    def _unregister_from_reactor(self):
+        if self._reactor is not None:
+            self._reactor.unregister(self._registered_socket)
+            self._reactor = None
+            self._registered_socket = None
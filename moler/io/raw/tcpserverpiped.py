@@ -220,7 +220,7 @@ class TcpServerPiped(Process):
             log_msg = 'Sending asynchronous msg: {}'.format(str(async_msg))
             self.history.append(['Sending asynchronous msg:', async_msg])
             self.logger.debug(log_msg + " to cli sock {}".format(self.client_sock))
-            self.client_sock.send(async_msg)
+            self.client_sock.sendall(async_msg)
         else:
             err = 'data for "send async msg" must contain "msg" key - not %s' % kwargs
             self.history.append(err)
@@ -5,33 +5,54 @@ __email__ = 'michal.ernst@nokia.com, marcin.usielski@nokia.com'
 import os
 import re
 import select
+import time
 from threading import Event
 
 from ptyprocess import PtyProcessUnicode
 
 from moler.io.io_connection import IOConnection
 from moler.io.raw import TillDoneThread
+from moler.io.raw.reactor import get_reactor, is_reactor_available
+from moler.io.raw.shell_pool import take_shell
 
 
 class ThreadedTerminal(IOConnection):
     """
     Works on Unix (like Linux) systems only!
 
-    ThreadedTerminal is shell working under Pty
+    ThreadedTerminal is shell working under Pty. Its output is read by reactor thread
+    shared with other connections (see moler.io.raw.reactor) or by dedicated thread if reactor is not available.
+
+    Read size starts at read_buffer_size and grows (up to max_read_buffer_size) while reads fill it
+    - it shrinks back when output calms down. With coalescing_time > 0 reads following each other within
+    that time (float seconds, like 0.001) are glued into one chunk of max coalescing_size characters
+    before being passed to Moler's connection - big outputs (cat of huge file) give less notifications
+    of observers at the cost of that small latency.
+
+    Shell is taken from pool of shells spawned in advance if it is enabled (see moler.io.raw.shell_pool).
     """
 
     def __init__(self, moler_connection, cmd=None, select_timeout=0.002,
-                 read_buffer_size=4096, first_prompt=None, dimensions=(100, 300)):
+                 read_buffer_size=4096, first_prompt=None, dimensions=(100, 300),
+                 max_read_buffer_size=64 * 1024, coalescing_time=0, coalescing_size=64 * 1024):
         super(ThreadedTerminal, self).__init__(moler_connection=moler_connection)
         self._select_timeout = select_timeout
         self._read_buffer_size = read_buffer_size
+        self._min_read_size = read_buffer_size
+        self._max_read_size = max(read_buffer_size, max_read_buffer_size)
+        self._coalescing_time = coalescing_time
+        self._coalescing_size = coalescing_size
         self.dimensions = dimensions
         self._terminal = None
         self.pulling_thread = None
+        self._reactor = None
+        self._registered_fd = None
         self._shell_operable = Event()
+        self._read_buffer = ""  # output of shell before its prompt appears
         if cmd is None:
-            cmd = ['/bin/bash', '--init-file']
-        self._cmd = ThreadedTerminal._build_bash_command(cmd)
+            self._cmd = ThreadedTerminal.default_cmd()
+        else:
+            self._cmd = ThreadedTerminal._build_bash_command(cmd)
 
         if first_prompt:
             self.prompt = first_prompt
@@ -41,16 +62,22 @@ class ThreadedTerminal(IOConnection):
     def open(self):
         """Open ThreadedTerminal connection & start thread pulling data from it."""
         if not self._terminal:
-            self._terminal = PtyProcessUnicode.spawn(self._cmd, dimensions=self.dimensions)
-            done = Event()
-            self.pulling_thread = TillDoneThread(target=self.pull_data,
-                                                 done_event=done,
-                                                 kwargs={'pulling_done': done})
-            self.pulling_thread.start()
+            self._terminal = self._spawn_shell()
+            if is_reactor_available():
+                self._registered_fd = self._terminal.fd
+                self._reactor = get_reactor(self._terminal.fd)
+                self._reactor.register(self._terminal.fd, self._on_readable)
+            else:
+                done = Event()
+                self.pulling_thread = TillDoneThread(target=self.pull_data,
+                                                     done_event=done,
+                                                     kwargs={'pulling_done': done})
+                self.pulling_thread.start()
             self._shell_operable.wait(timeout=2)
 
     def close(self):
         """Close ThreadedTerminal connection & stop pulling thread."""
+        self._unregister_from_reactor()
         if self.pulling_thread:
             self.pulling_thread.join()
             self.pulling_thread = None
@@ -67,26 +94,87 @@ class ThreadedTerminal(IOConnection):
 
     def pull_data(self, pulling_done):
         """Pull data from ThreadedTerminal connection."""
-        read_buffer = ""
-
         while not pulling_done.is_set():
             reads, _, _ = select.select([self._terminal.fd], [], [], self._select_timeout)
             if self._terminal.fd in reads:
                 try:
-                    data = self._terminal.read(self._read_buffer_size)
-                    if self._shell_operable.is_set():
-                        self.data_received(data)
-                    else:
-                        read_buffer = read_buffer + data
-                        if re.search(self.prompt, read_buffer, re.MULTILINE):
-                            self._notify_on_connect()
-                            self._shell_operable.set()
-                            data = re.sub(self.prompt, '', read_buffer, re.MULTILINE)
-                            self.data_received(data)
+                    self._forward_terminal_output()
                 except EOFError:
                     self._notify_on_disconnect()
                     pulling_done.set()
 
+    def _on_readable(self):
+        """Called by reactor when terminal has output."""
+        reads, _, _ = select.select([self._terminal.fd], [], [], 0)  # don't block reactor if readiness is stale
+        if reads:
+            try:
+                self._forward_terminal_output()  # coalescing keeps reactor thread max coalescing_time
+            except EOFError:
+                self._unregister_from_reactor()
+                self._notify_on_disconnect()
+
+    def _unregister_from_reactor(self):
+        if self._reactor is not None:
+            self._reactor.unregister(self._registered_fd)
+            self._reactor = None
+            self._registered_fd = None
+
+    def _spawn_shell(self):
+        shell = take_shell(cmd=self._cmd, dimensions=self.dimensions)
+        if shell is None:  # shell pool disabled or exhausted
+            shell = PtyProcessUnicode.spawn(self._cmd, dimensions=self.dimensions)
+        return shell
+
+    def _forward_terminal_output(self):
+        """Read (and coalesce) output of readable terminal and forward it; raises EOFError when shell is gone."""
+        data = self._read_with_adaptive_size()
+        if self._coalescing_time > 0:
+            chunks = [data]
+            coalesced_size = len(data)
+            deadline = time.time() + self._coalescing_time
+            try:
+                while coalesced_size < self._coalescing_size:
+                    remaining_time = deadline - time.time()
+                    if remaining_time <= 0:
+                        break
+                    reads, _, _ = select.select([self._terminal.fd], [], [], remaining_time)
+                    if not reads:
+                        break
+                    chunks.append(self._read_with_adaptive_size())
+                    coalesced_size += len(chunks[-1])
+            except EOFError:
+                self._terminal_output_received("".join(chunks))  # don't lose last output of shell
+                raise
+            data = "".join(chunks)
+        self._terminal_output_received(data)
+
+    def _read_with_adaptive_size(self):
+        data = self._terminal.read(self._read_buffer_size)
+        # len() counts characters, not bytes - multibyte output grows read size slower
+        if len(data) >= self._read_buffer_size:
+            self._read_buffer_size = min(self._read_buffer_size * 2, self._max_read_size)
+        elif len(data) < self._read_buffer_size // 4:
+            self._read_buffer_size = max(self._read_buffer_size // 2, self._min_read_size)
+        return data
+
+    def _terminal_output_received(self, data):
+        """Forward data read from terminal - after shell prompt appears first time."""
+        if self._shell_operable.is_set():
+            self.data_received(data)
+        else:
+            self._read_buffer = self._read_buffer + data
+            if re.search(self.prompt, self._read_buffer, re.MULTILINE):
+                self._notify_on_connect()
+                self._shell_operable.set()
+                data = re.sub(self.prompt, '', self._read_buffer, re.MULTILINE)
+                self._read_buffer = ""
+                self.data_received(data)
+
+    @staticmethod
+    def default_cmd():
+        """Command of shell spawned when no cmd given to constructor"""
+        return ThreadedTerminal._build_bash_command(['/bin/bash', '--init-file'])
+
     @staticmethod
     def _build_bash_command(bash_cmd):
         abs_path = os.path.dirname(__file__)
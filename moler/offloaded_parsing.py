@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+Offloaded parsing - running parsing of command output inside processes of process pool.
+
+Parsing of big outputs (iptables, tcpdump, top, ...) done inline inside thread
+pulling data from connection holds GIL and stalls other connections.
+Command declaring its parsing as offloadable (see CommandTextualGeneric._offloadable_parsing)
+collects lines of its output and ships them in batches (all lines of received chunk of data,
+at most batch_max_lines) into process pool when offloaded parsing is enabled:
+
+    from moler import offloaded_parsing
+    offloaded_parsing.enable_offloaded_parsing(max_workers=4)
+
+There command is rebuilt from its small parsing state (attributes other than current_ret)
+and from recently used part of current_ret: entries of current_ret dict used by previous batch,
+with lists inside them emptied (only their length is shipped). Its on_new_line() parses lines
+and what parsing did to that part of current_ret (new/replaced entries, items appended to lists)
+comes back as delta merged into current_ret of command. Parser asking for entry that was not shipped
+makes batch parsed again with that entry shipped. Parser iterating over not shipped content
+(or command state not possible to pickle) makes parsing of command inline.
+
+Feeding thread is not blocked - it only queues batch. Batches of one command are parsed one after
+another (parsing state of next batch comes from previous one); merging happens inside single
+merging thread which ships next batch of command.
+So, command's on_new_line() must not use connection (must not send anything).
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import atexit
+import logging
+import pickle
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+import six
+
+from moler.cmd import RegexHelper
+
+batch_max_lines = 1000  # lines of received data are shipped at once unless there is more of them
+
+# attributes not shipped into parsing process - they can't be pickled or don't belong to parsing state
+_not_shipped_attributes = ('connection', 'runner', 'logger', 'device_logger', '_regex_helper', '_future',
+                           '_done_callbacks', '_done_callbacks_lock', '_offloaded_lines', '_offloaded_batches',
+                           'current_ret',
+                           '_is_running', '_is_done', '_is_cancelled', '_result', '_exception')
+
+_parsing_executor = None
+_i_own_parsing_executor = False
+_parsing_executor_lock = threading.Lock()
+_merging_executor = None
+_logger = logging.getLogger('moler.offloaded_parsing')
+
+
+def get_parsing_executor():
+    """
+    Return executor used for offloaded parsing.
+
+    :return: instance of concurrent.futures.Executor or None if offloaded parsing is disabled
+    """
+    return _parsing_executor
+
+
+def set_parsing_executor(executor):
+    """
+    Install executor to be used for offloaded parsing.
+
+    Executor installed that way is not shut down by Moler - it is owned by caller.
+
+    :param executor: instance of concurrent.futures.ProcessPoolExecutor or None to disable offloaded parsing
+    :return: None
+    """
+    global _parsing_executor, _i_own_parsing_executor
+    with _parsing_executor_lock:
+        previous_executor, previous_is_mine = _parsing_executor, _i_own_parsing_executor
+        _parsing_executor, _i_own_parsing_executor = executor, False
+    if previous_is_mine:
+        previous_executor.shutdown(wait=False)
+
+
+def enable_offloaded_parsing(max_workers=None):
+    """
+    Enable offloaded parsing with own process pool.
+
+    :param max_workers: number of parsing processes; None means number of processors
+    :return: None
+    """
+    global _i_own_parsing_executor
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    set_parsing_executor(executor)
+    with _parsing_executor_lock:
+        _i_own_parsing_executor = _parsing_executor is executor
+
+
+def disable_offloaded_parsing():
+    """Disable offloaded parsing - commands parse their output inline again."""
+    set_parsing_executor(None)
+
+
+def is_offloaded_parsing_enabled():
+    return _parsing_executor is not None
+
+
+atexit.register(disable_offloaded_parsing)
+
+
+class ParsingQueue(object):
+    """Batches of lines of one command awaiting offloaded parsing."""
+
+    def __init__(self):
+        self.in_use = False  # once command has queued lines all its lines go via queue (keeps them in order)
+        self.used_keys = None  # keys of current_ret used by previous batch (None - not known yet)
+        self._batches = deque()
+        self._parsing = False
+        self._lock = threading.Lock()
+
+    def put(self, lines):
+        """
+        Queue batch of lines.
+
+        :return: True if caller should start parsing (no batch of that command is being parsed)
+        """
+        with self._lock:
+            self.in_use = True
+            self._batches.append(lines)
+            start_parsing = not self._parsing
+            self._parsing = True
+        return start_parsing
+
+    def get(self, command):
+        """
+        Take next batch of lines.
+
+        :return: list of lines or None when parsing stops (there is no batch or command is already done)
+        """
+        with self._lock:
+            if self._batches and not command.done():
+                return self._batches.popleft()
+            self._batches.clear()
+            self._parsing = False
+        return None
+
+
+def parse_lines(command, lines):
+    """
+    Parse lines by command's on_new_line() running inside process of parsing executor.
+
+    Lines are queued and caller doesn't wait for their parsing. What parsing did to current_ret
+    is merged back into command, then command gets result/exception set by parsing (if any).
+    If command state can't be shipped into other process or back (or offloaded parsing was disabled meanwhile)
+    lines are parsed inline - and further parsing of that command stays inline.
+
+    :param command: command that parses lines
+    :param lines: list of (line, is_full_line) tuples - as passed to on_new_line()
+    :return: None
+    """
+    if command._offloaded_batches.put(lines):
+        _parse_queued_batches(command)
+
+
+def _parse_queued_batches(command):
+    while True:
+        lines = command._offloaded_batches.get(command)
+        if (lines is None) or _offload(command, lines):
+            return  # offloaded batch continues parsing of queue when it is merged
+        _parse_inline(command, lines)
+
+
+def _parse_inline(command, lines):
+    try:
+        for line, is_full_line in lines:
+            command.on_new_line(line, is_full_line)
+    except Exception as exc:
+        _logger.exception("parsing by {} raised {!r}".format(command, exc))
+
+
+def _offload(command, lines):
+    """Ship lines into parsing executor; return False if they must be parsed inline"""
+    executor = _parsing_executor
+    if (executor is None) or not command._offloadable_parsing:
+        return False
+    payload = _pickled_batch(command, lines)
+    if payload is None:
+        command._offloadable_parsing = False
+        return False
+    try:
+        parsing = executor.submit(_parse_pickled_lines, payload)
+    except RuntimeError:  # executor was shut down meanwhile
+        return False
+    parsing.add_done_callback(lambda parsed: _get_merging_executor().submit(_on_batch_parsed, command, lines, parsed))
+    return True
+
+
+def _get_merging_executor():
+    global _merging_executor
+    with _parsing_executor_lock:
+        if _merging_executor is None:
+            _merging_executor = ThreadPoolExecutor(max_workers=1)
+        return _merging_executor
+
+
+def _pickled_batch(command, lines):
+    queue = command._offloaded_batches
+    if queue.used_keys is None:
+        queue.used_keys = set(command.current_ret) if isinstance(command.current_ret, dict) else set()
+    shipped_ret = _shipped_result(command.current_ret, queue.used_keys)
+    try:
+        return pickle.dumps((command.__class__, _parsing_state(command), shipped_ret, lines,
+                             command.logger.name, command.device_logger.name), protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as err:
+        _logger.debug("can't offload parsing of {} - parsing inline: {!r}".format(command, err))
+    return None
+
+
+def _on_batch_parsed(command, lines, parsing):
+    """Runs inside merging thread"""
+    parsed = _parsed_batch(parsing)
+    if isinstance(parsed, _StateNotShipped) and parsed.args:  # parser asked for entry of current_ret
+        command._offloaded_batches.used_keys.add(parsed.args[0])
+        if _offload(command, lines):
+            return  # parsed again with asked entry of current_ret
+    if isinstance(parsed, tuple):
+        _merge_parsed(command, parsed)
+    else:
+        _logger.debug("can't ship parsing state of {} - parsing inline".format(command))
+        command._offloadable_parsing = False
+        _parse_inline(command, lines)
+    _parse_queued_batches(command)
+
+
+def _parsed_batch(parsing):
+    """Return parsed batch (tuple), _StateNotShipped or None if parsed batch can't be shipped back"""
+    try:
+        payload = parsing.result()
+    except Exception as err:  # like broken process pool
+        _logger.debug("offloaded parsing failed: {!r}".format(err))
+        return None
+    return None if payload is None else pickle.loads(payload)
+
+
+def _merge_parsed(command, parsed):
+    changed_state, parsed_ret, is_done, result_is_ret, result, exception_parts, raised_parts = parsed
+    command.__dict__.update(changed_state)
+    if isinstance(parsed_ret, _TrackedDict) and parsed_ret.used_keys:
+        command._offloaded_batches.used_keys = parsed_ret.used_keys
+    command.current_ret = _merged(command.current_ret, parsed_ret)
+    if raised_parts:
+        _logger.error("parsing by {} raised {!r}".format(command, _restore_exception(raised_parts, command)))
+    if exception_parts:
+        command.set_exception(_restore_exception(exception_parts, command))
+    elif is_done and not command.done():
+        command.set_result(command.current_ret if result_is_ret else result)
+
+
+def _parsing_state(command):
+    return dict((name, value) for name, value in command.__dict__.items() if name not in _not_shipped_attributes)
+
+
+def _parse_pickled_lines(payload):
+    """Runs inside parsing process; returns None if parsed state can't be pickled"""
+    command_class, state, shipped_ret, lines, logger_name, device_logger_name = pickle.loads(payload)
+    command = _rebuilt_command(command_class, state, logger_name, device_logger_name)
+    pickled_state = _pickled_attributes(state)
+    command.current_ret = shipped_ret
+    raised_exception_parts = None
+    try:
+        for line, is_full_line in lines:
+            command.on_new_line(line, is_full_line)
+    except _StateNotShipped as not_shipped:
+        return pickle.dumps(not_shipped, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as exc:
+        raised_exception_parts = _exception_parts(exc, command)
+    try:
+        return pickle.dumps(_parsed_parts(command, pickled_state, raised_exception_parts),
+                            protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+
+
+def _rebuilt_command(command_class, state, logger_name, device_logger_name):
+    command = command_class.__new__(command_class)
+    command.__dict__.update(state)
+    command.connection = None
+    command.runner = None
+    command._future = None
+    command._is_running = True
+    command._is_done = False
+    command._is_cancelled = False
+    command._result = None
+    command._exception = None
+    command._done_callbacks = list()
+    command._done_callbacks_lock = threading.Lock()
+    command._regex_helper = RegexHelper()
+    command.logger = logging.getLogger(logger_name)
+    command.device_logger = logging.getLogger(device_logger_name)
+    return command
+
+
+def _pickled_attributes(state):
+    return dict((name, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for name, value in state.items())
+
+
+def _parsed_parts(command, pickled_state, raised_exception_parts):
+    # current_ret goes back as it is - its tracked dicts/lists hold just what parser did with them
+    current_ret = command.current_ret
+    changed_state = dict((name, value) for name, value in _parsing_state(command).items()
+                         if pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) != pickled_state.get(name))
+    exception_parts = _exception_parts(command._exception, command) if command._exception else None
+    result_is_ret = command._result is current_ret
+    result = None if result_is_ret else command._result
+    return (changed_state, current_ret, command._is_done, result_is_ret, result,
+            exception_parts, raised_exception_parts)
+
+
+class _StateNotShipped(BaseException):
+    """
+    Parser asked for entry of current_ret not shipped into parsing process (no args - for all of it).
+
+    It is BaseException - parser catching Exception must not take it as failure of its own parsing.
+    """
+
+
+def _shipped_result(current_ret, used_keys):
+    if isinstance(current_ret, dict):
+        return _TrackedDict(dict((key, _hollow(current_ret[key])) for key in used_keys if key in current_ret),
+                            complete=False, absent_keys=[key for key in used_keys if key not in current_ret],
+                            size=len(current_ret))
+    return _hollow(current_ret)
+
+
+def _hollow(value):
+    if isinstance(value, dict):
+        return _TrackedDict(dict((key, _hollow(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return _TrackedList(len(value))
+    return value
+
+
+def _merged(target, parsed):
+    if isinstance(parsed, _TrackedDict):
+        for key in parsed.removed_keys:
+            target.pop(key, None)
+        for key, item in parsed.own_items():
+            target[key] = _merged(target.get(key), item)
+        return target
+    if isinstance(parsed, _TrackedList):
+        target.extend(parsed.appended_items())
+        return target
+    return parsed  # created by parser - replaces previous value
+
+
+class _TrackedDict(MutableMapping):
+    """
+    Dict inside parsing process remembering what parser does with it.
+
+    Not complete one holds only shipped part of current_ret - asking for other key raises _StateNotShipped.
+    """
+
+    def __init__(self, items, complete=True, absent_keys=(), size=0):
+        self._items = items
+        self.complete = complete
+        self.absent_keys = set(absent_keys)
+        self.size = size  # of whole dict when not complete
+        self.used_keys = set()
+        self.removed_keys = set()
+
+    def own_items(self):
+        return self._items.items()
+
+    def _check_shipped(self, key):
+        self.used_keys.add(key)
+        if not (self.complete or (key in self.absent_keys) or (key in self._items)):
+            raise _StateNotShipped(key)
+
+    def __getitem__(self, key):
+        self._check_shipped(key)
+        return self._items[key]
+
+    def __setitem__(self, key, value):
+        self.used_keys.add(key)
+        self.removed_keys.discard(key)
+        self._items[key] = value
+
+    def __delitem__(self, key):
+        self._check_shipped(key)
+        del self._items[key]
+        self.removed_keys.add(key)
+
+    def __iter__(self):
+        if not self.complete:
+            raise _StateNotShipped()
+        return iter(self._items)
+
+    def __len__(self):
+        if not self.complete:
+            raise _StateNotShipped()
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items) or (self.size > 0)
+
+    __nonzero__ = __bool__
+
+
+class _TrackedList(list):
+    """
+    List inside parsing process holding only items appended by parser.
+
+    Asking for items of parent process (shipped just as length) raises _StateNotShipped.
+    """
+
+    def __init__(self, base_length, appended_items=()):
+        super(_TrackedList, self).__init__(appended_items)
+        self.base_length = base_length
+
+    def __reduce__(self):  # pickling must not iterate over items not shipped
+        return _TrackedList, (self.base_length, self.appended_items())
+
+    def appended_items(self):
+        return list(list.__iter__(self))
+
+    def __len__(self):
+        return self.base_length + list.__len__(self)
+
+    def __getitem__(self, index):
+        if self.base_length and isinstance(index, six.integer_types):
+            if index >= self.base_length:
+                return list.__getitem__(self, index - self.base_length)
+            if -list.__len__(self) <= index < 0:
+                return list.__getitem__(self, index)
+        if self.base_length:
+            raise _StateNotShipped()
+        return list.__getitem__(self, index)
+
+
+def _needs_all_items(method_name):
+    list_method = getattr(list, method_name)
+
+    def method(self, *args, **kwargs):
+        if self.base_length:
+            raise _StateNotShipped()
+        return list_method(self, *args, **kwargs)
+    return method
+
+
+for _method_name in ('__iter__', '__contains__', '__reversed__', '__setitem__', '__delitem__',
+                     'index', 'count', 'insert', 'pop', 'remove', 'reverse', 'sort'):
+    setattr(_TrackedList, _method_name, _needs_all_items(_method_name))
+
+
+def _exception_parts(exception, command):
+    # Moler exceptions have own __init__() parameters and keep reference to command - so, they can't be pickled as is
+    attributes = dict()
+    command_references = list()
+    for name, value in vars(exception).items():
+        if value is command:
+            command_references.append(name)
+        else:
+            attributes[name] = value
+    return exception.__class__, exception.args, attributes, command_references
+
+
+def _restore_exception(exception_parts, command):
+    exception_class, args, attributes, command_references = exception_parts
+    exception = exception_class.__new__(exception_class, *args)
+    exception.args = args
+    exception.__dict__.update(attributes)
+    for name in command_references:
+        setattr(exception, name, command)
+    return exception
@@ -11,17 +11,21 @@ __email__ = 'grzegorz.latuszek@nokia.com, marcin.usielski@nokia.com, michal.erns
 
 import atexit
 import concurrent.futures
+import functools
 import logging
 import threading
 import time
+import weakref
 from abc import abstractmethod, ABCMeta
-from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures import ThreadPoolExecutor
 
 from six import add_metaclass
 
 from moler.exceptions import CommandTimeout
 from moler.exceptions import ConnectionObserverTimeout
 from moler.exceptions import MolerException
+from moler.exceptions import WrongUsage
+from moler.timer_wheel import TimerWheel
 
 # fix for concurrent.futures  v.3.0.3  to have API of v.3.1.1 or above
 try:
@@ -48,6 +52,13 @@ class ConnectionObserverRunner(object):
         """
         pass
 
+    def submit_many(self, connection_observers):
+        """
+        Submit many connection observers to background execution at once.
+        Returns list of Futures (in order of connection_observers).
+        """
+        return [self.submit(connection_observer) for connection_observer in connection_observers]
+
     @abstractmethod
     def wait_for(self, connection_observer, connection_observer_future, timeout=10.0):
         """
@@ -60,6 +71,20 @@ class ConnectionObserverRunner(object):
         """
         pass
 
+    def wait_for_iterator(self, connection_observer, connection_observer_future):
+        """
+        Version of wait_for() intended to be used by Python3 to implement awaitable object.
+
+        Note: we don't have timeout parameter here. If you want to await with timeout please do use timeout machinery
+        of selected parallelism (asyncio.wait_for() for asyncio).
+
+        :param connection_observer: The one we are awaiting for.
+        :param connection_observer_future: Future of connection-observer returned from submit().
+        :return: iterator
+        """
+        err_msg = "{} doesn't support awaiting connection-observers".format(self.__class__.__name__)
+        raise WrongUsage(err_msg)
+
     @abstractmethod
     def feed(self, connection_observer):
         """
@@ -86,8 +111,97 @@ class ConnectionObserverRunner(object):
         return False  # exceptions (if any) should be reraised
 
 
+def time_out_observer(connection_observer, timeout, passed_time, runner_logger, kind="await_done"):
+    """Set connection_observer status to timed-out"""
+    runner_logger.debug("timed out {}".format(connection_observer))
+    # TODO: should call connection_observer_future.cancel() via runner
+    # done-callbacks are not notified here but by set_exception() - they should see timeout exception, not cancel
+    connection_observer._cancel(notify_done=False)
+    connection_observer.on_timeout()
+    connection_observer._log(logging.INFO,
+                             "'{}.{}' has timed out after '{:.2f}' seconds.".format(
+                                 connection_observer.__class__.__module__,
+                                 connection_observer.__class__.__name__, passed_time))
+    # TODO: rethink - on timeout we raise while on other exceptions we expect observers
+    #       just to call  observer.set_exception() - so, no raise before calling observer.result()
+    if hasattr(connection_observer, "command_string"):
+        exception = CommandTimeout(connection_observer, timeout, kind=kind, passed_time=passed_time)
+    else:
+        exception = ConnectionObserverTimeout(connection_observer, timeout, kind=kind, passed_time=passed_time)
+    connection_observer.set_exception(exception)
+
+
+def subscribe_for_data(connection_observer, store_data_receiver=None, queued=False):
+    """
+    Subscribe connection_observer for data of its connection.
+
+    Observer accepting lines (see ConnectionObserver.accepts_lines) is subscribed for lines
+    so, connection splits chunk of data into lines once for all such observers.
+    If connection keeps recently received data, observer gets also data received since its start.
+    Exception raised by observer while handling data becomes its exception.
+
+    :param connection_observer: observer to be fed with data
+    :param store_data_receiver: called with data receiver before it gets subscribed
+    :param queued: ask connection to put data into DeliveryQueue instead of calling data receiver
+    :return: tuple (data receiver subscribed to connection, its DeliveryQueue or None if connection calls it)
+    """
+    moler_conn = connection_observer.connection
+    newline_chars = getattr(moler_conn, 'lines_newline_chars', None)
+    subscribe_lines = (newline_chars is not None) and connection_observer.accepts_lines(newline_chars)
+    secure_data_received = _secure_data_receiver(connection_observer, subscribe_lines)
+    subscription_options = _subscription_options(connection_observer, is_observable_connection=newline_chars is not None,
+                                                 subscribe_lines=subscribe_lines, queued=queued)
+    if store_data_receiver:
+        store_data_receiver(secure_data_received)
+    delivery_queue = moler_conn.subscribe(secure_data_received, **subscription_options)
+    return secure_data_received, (delivery_queue if 'queued' in subscription_options else None)
+
+
+def _secure_data_receiver(connection_observer, subscribe_lines):
+    if subscribe_lines:
+        def secure_data_received(lines):
+            try:
+                connection_observer.lines_received(lines)
+            except Exception as exc:  # TODO: handling stacktrace
+                connection_observer.set_exception(exc)
+    else:
+        def secure_data_received(data):
+            try:
+                connection_observer.data_received(data)
+            except Exception as exc:  # TODO: handling stacktrace
+                connection_observer.set_exception(exc)
+    return secure_data_received
+
+
+def _subscription_options(connection_observer, is_observable_connection, subscribe_lines, queued):
+    subscription_options = dict()
+    if is_observable_connection:
+        observer_class = connection_observer.__class__
+        # statistics are gathered per class of observer - to find slow parsers
+        subscription_options['name'] = "{}.{}".format(observer_class.__module__, observer_class.__name__)
+        if queued:
+            subscription_options['queued'] = True
+    if subscribe_lines:
+        subscription_options['lines'] = True
+    if connection_observer._start_offset is not None:
+        subscription_options['from_offset'] = connection_observer._start_offset
+    return subscription_options
+
+
+def _feed_from_queue(connection_observer, data_receiver, delivery_queue):
+    # awaits data without polling; queue is closed (and loop ends) when observer gets unsubscribed:
+    # on done, on cancel or on runner shutdown
+    chunks = delivery_queue.get_all()
+    while chunks:
+        for data in chunks:
+            if connection_observer.done():
+                break
+            delivery_queue.deliver(data_receiver, data)
+        chunks = delivery_queue.get_all()
+
+
 class CancellableFuture(object):
-    def __init__(self, future, is_started, stop_running, is_done, stop_timeout=0.5):
+    def __init__(self, future, is_started, stop_running, is_done, stop_timeout=0.5, on_stop=None):
         """
         Wrapper to allow cancelling already running concurrent.futures.Future
 
@@ -100,12 +214,15 @@ class CancellableFuture(object):
         :param stop_running: set externally to finish thread execution of function
         :param is_done: set when function finished running in thread
         :param stop_timeout: timeout to await is_done after setting stop_running
+        :param on_stop: callable called by cancel() of running function - to release its resources at once
         """
         self._future = future
         self._is_started = is_started
         self._stop_running = stop_running
         self._stop_timeout = stop_timeout
         self._is_done = is_done
+        self._on_stop = on_stop
+        self._is_cancelled = False
 
     def __getattr__(self, attr):
         """Make it proxy to embedded future"""
@@ -113,15 +230,39 @@ class CancellableFuture(object):
         return attribute
 
     def cancel(self):
-        if self.running():
-            self._stop()
+        """
+        Cancel future without blocking.
+
+        Running function is just requested to exit - its thread finishes asynchronously.
+        """
+        if self._future.cancel() or self._is_cancelled:  # cancel() of concurrent.futures.Future works till running
+            return True
+        if self._future.done():
+            return False
+        self._is_cancelled = True
+        self._stop_running.set()  # force threaded-function to exit
+        if self._on_stop:
+            self._on_stop()
+        return True
+
+    def cancelled(self):
+        return self._is_cancelled or self._future.cancelled()
+
+    def running(self):
+        return (not self._is_cancelled) and self._future.running()
+
+    def done(self):
+        return self._is_cancelled or self._future.done()
 
-            # after exiting threaded-function future.state == FINISHED
-            # we need to change it to PENDING to allow for correct cancel via concurrent.futures.Future
-            with self._condition:
-                self._future._state = concurrent.futures._base.PENDING
+    def result(self, timeout=None):
+        if self._is_cancelled:
+            raise concurrent.futures.CancelledError()
+        return self._future.result(timeout=timeout)
 
-        return self._future.cancel()
+    def exception(self, timeout=None):
+        if self._is_cancelled:
+            raise concurrent.futures.CancelledError()
+        return self._future.exception(timeout=timeout)
 
     def _stop(self):
         self._stop_running.set()  # force threaded-function to exit
@@ -134,16 +275,32 @@ class CancellableFuture(object):
 
 
 class ThreadPoolExecutorRunner(ConnectionObserverRunner):
-    def __init__(self, executor=None):
-        """Create instance of ThreadPoolExecutorRunner class"""
+    def __init__(self, executor=None, max_workers=None):
+        """
+        Create instance of ThreadPoolExecutorRunner class
+
+        :param executor: executor to reuse; if not given runner creates its own one
+        :param max_workers: size of own executor (each running observer occupies one of its threads)
+        """
         self._in_shutdown = False
         self._i_own_executor = False
+        self._stop_feeding_events = set()  # to wake up all feeders on shutdown
+        self._stop_feeding_events_lock = threading.Lock()
+        # observers are timed out by timer wheel - even if nobody awaits them
+        self._timer_wheel = TimerWheel()
+        self._observers_timers = dict()
+        self._observers_timers_lock = threading.Lock()
+        self._timing_out_lock = threading.Lock()  # observer may be timed out by wait_for() and timer wheel
+        self._observers_receivers = dict()  # observer: its data receiver subscribed to connection
+        self._observers_receivers_lock = threading.Lock()
+        self._awaited_observers = dict()  # observer: count of its wait_for() callers
         self.executor = executor
         self.logger = logging.getLogger('moler.runner.thread-pool')
         self.logger.debug("created")
         atexit.register(self.shutdown)
         if executor is None:
-            max_workers = (cpu_count() or 1) * 5  # fix for concurrent.futures  v.3.0.3  to have API of v.3.1.1 or above
+            if max_workers is None:
+                max_workers = (cpu_count() or 1) * 5  # fix for concurrent.futures  v.3.0.3  to have API of v.3.1.1 or above
             self.executor = ThreadPoolExecutor(max_workers=max_workers)
             self.logger.debug("created own executor {!r}".format(self.executor))
             self._i_own_executor = True
@@ -151,8 +308,21 @@ class ThreadPoolExecutorRunner(ConnectionObserverRunner):
             self.logger.debug("reusing provided executor {!r}".format(self.executor))
 
     def shutdown(self):
+        if self._in_shutdown:
+            return
         self.logger.debug("shutting down")
         self._in_shutdown = True  # will exit from feed() without stopping executor (since others may still use that executor)
+        if hasattr(atexit, 'unregister'):  # python 2.7 has no atexit.unregister()
+            atexit.unregister(self.shutdown)  # don't keep dead runners inside atexit registry
+        with self._stop_feeding_events_lock:
+            stop_feeding_events = list(self._stop_feeding_events)
+        for stop_feeding in stop_feeding_events:
+            stop_feeding.set()
+        with self._observers_receivers_lock:
+            subscribed_observers = list(self._observers_receivers)
+        for connection_observer in subscribed_observers:
+            self._unsubscribe(connection_observer)  # closes delivery queues awaited by feeders
+        self._timer_wheel.shutdown()
         if self._i_own_executor:
             self.executor.shutdown()  # also stop executor since only I use it
 
@@ -161,25 +331,43 @@ class ThreadPoolExecutorRunner(ConnectionObserverRunner):
         Submit connection observer to background execution.
         Returns Future that could be used to await for connection_observer done.
         """
-        self.logger.debug("go background: {!r}".format(connection_observer))
-
-        # TODO: check dependency - connection_observer.connection
-
-        feed_started = threading.Event()
-        stop_feeding = threading.Event()
-        feed_done = threading.Event()
-        connection_observer_future = self.executor.submit(self.feed, connection_observer,
-                                                          feed_started, stop_feeding, feed_done)
-        # await feed thread to be really started
-        start_timeout = 0.5
-        if not feed_started.wait(timeout=start_timeout):
-            err_msg = "Failed to start observer feeding thread within {} sec".format(start_timeout)
-            self.logger.error(err_msg)
-            MolerException(err_msg)
-            connection_observer.set_exception(err_msg)
-            return None
-        c_future = CancellableFuture(connection_observer_future, feed_started, stop_feeding, feed_done)
-        return c_future
+        return self.submit_many([connection_observer])[0]
+
+    def submit_many(self, connection_observers):
+        """
+        Submit many connection observers to background execution at once.
+        Returns list of Futures (in order of connection_observers).
+
+        Feeding threads of all observers are started before awaiting any of them to be really started.
+        """
+        feeds = []
+        for connection_observer in connection_observers:
+            self.logger.debug("go background: {!r}".format(connection_observer))
+
+            # TODO: check dependency - connection_observer.connection
+
+            feed_started = threading.Event()
+            stop_feeding = threading.Event()
+            feed_done = threading.Event()
+            connection_observer_future = self.executor.submit(self.feed, connection_observer,
+                                                              feed_started, stop_feeding, feed_done)
+            feeds.append((connection_observer, connection_observer_future, feed_started, stop_feeding, feed_done))
+
+        c_futures = []
+        for connection_observer, connection_observer_future, feed_started, stop_feeding, feed_done in feeds:
+            # await feed thread to be really started
+            start_timeout = 0.5
+            if not feed_started.wait(timeout=start_timeout):
+                err_msg = "Failed to start observer feeding thread within {} sec".format(start_timeout)
+                self.logger.error(err_msg)
+                MolerException(err_msg)
+                connection_observer.set_exception(err_msg)
+                c_futures.append(None)
+                continue
+            unsubscribe = functools.partial(self._unsubscribe, connection_observer)
+            c_futures.append(CancellableFuture(connection_observer_future, feed_started, stop_feeding, feed_done,
+                                               on_stop=unsubscribe))
+        return c_futures
 
     def wait_for(self, connection_observer, connection_observer_future, timeout=None):
         """
@@ -194,39 +382,43 @@ class ThreadPoolExecutorRunner(ConnectionObserverRunner):
         start_time = time.time()
         remain_time = connection_observer.timeout
         check_timeout_from_observer = True
-        wait_tick = 0.1
         if timeout:
             remain_time = timeout
             check_timeout_from_observer = False
-            wait_tick = remain_time
-        while remain_time > 0.0:
-            done, not_done = wait([connection_observer_future], timeout=wait_tick)
-            if connection_observer_future in done:
-                connection_observer_future._stop()
-                result = connection_observer_future.result()
-                self.logger.debug("{} returned {}".format(connection_observer, result))
-                return None
-            if check_timeout_from_observer:
-                timeout = connection_observer.timeout
-            remain_time = timeout - (time.time() - start_time)
+
+        # no polling - we are woken up as soon as observer is done or its feeding is over
+        observer_or_feed_done = threading.Event()
+
+        def wake_up(observer_or_future):
+            observer_or_feed_done.set()
+
+        connection_observer.add_done_callback(wake_up)
+        connection_observer_future.add_done_callback(wake_up)
+        self._mark_awaited(connection_observer, awaited=True)
+        try:
+            while remain_time > 0.0:
+                if observer_or_feed_done.wait(timeout=remain_time):
+                    with self._timing_out_lock:
+                        pass  # timer wheel might be in the middle of timing out observer - let it finish
+                    connection_observer_future._stop()
+                    connection_observer_future.exception()  # await feed to finish; its outcome may be taken in middle
+                    result = connection_observer.result()   # of timing out so, observer is asked directly
+                    self.logger.debug("{} returned {}".format(connection_observer, result))
+                    return None
+                # observer timeout might be extended while we were waiting
+                if check_timeout_from_observer:
+                    timeout = connection_observer.timeout
+                remain_time = timeout - (time.time() - start_time)
+        finally:
+            connection_observer.remove_done_callback(wake_up)
+            self._mark_awaited(connection_observer, awaited=False)
 
         # code below is for timed out observer
         passed = time.time() - start_time
-        self.logger.debug("timed out {}".format(connection_observer))
-        connection_observer_future.cancel()
-        connection_observer.cancel()  # TODO: should call connection_observer_future.cancel() via runner
-        connection_observer.on_timeout()
-        connection_observer._log(logging.INFO,
-                                 "'{}.{}' has timed out after '{:.2f}' seconds.".format(
-                                     connection_observer.__class__.__module__,
-                                     connection_observer.__class__.__name__, time.time() - start_time))
-        # TODO: rethink - on timeout we raise while on other exceptions we expect observers
-        #       just to call  observer.set_exception() - so, no raise before calling observer.result()
-        if hasattr(connection_observer, "command_string"):
-            exception = CommandTimeout(connection_observer, timeout, kind="await_done", passed_time=passed)
-        else:
-            exception = ConnectionObserverTimeout(connection_observer, timeout, kind="await_done", passed_time=passed)
-        connection_observer.set_exception(exception)
+        with self._timing_out_lock:
+            if not connection_observer.done():  # timer wheel might be faster
+                connection_observer_future.cancel()
+                time_out_observer(connection_observer, timeout=timeout, passed_time=passed, runner_logger=self.logger)
         return None
 
     def feed(self, connection_observer, feed_started, stop_feeding, feed_done):
@@ -235,38 +427,174 @@ class ThreadPoolExecutorRunner(ConnectionObserverRunner):
         Should be called from background-processing of connection observer.
         """
         connection_observer._log(logging.INFO, "{} started.".format(connection_observer.get_long_desc()))
-        moler_conn = connection_observer.connection
-
-        def secure_data_received(data):
-            try:
-                connection_observer.data_received(data)
-            except Exception as exc:  # TODO: handling stacktrace
-                connection_observer.set_exception(exc)
 
         # start feeding connection_observer by establishing data-channel from connection to observer
-        self.logger.debug("subscribing for data {!r}".format(connection_observer))
-        moler_conn.subscribe(secure_data_received)
+        data_receiver, delivery_queue = self._subscribe(connection_observer)
+
+        # wake up when observer is done - no need to poll it
+        def stop_on_done(observer):
+            self._unsubscribe(observer)  # at once - don't keep done observer subscribed till feeding thread exits
+            stop_feeding.set()
+
+        connection_observer.add_done_callback(stop_on_done)
+        with self._stop_feeding_events_lock:
+            self._stop_feeding_events.add(stop_feeding)
+        if self._in_shutdown:
+            stop_feeding.set()
+            self._unsubscribe(connection_observer)
+            if delivery_queue is not None:
+                delivery_queue.close()  # shutdown might unsubscribe us before we were subscribed
+        else:
+            self._schedule_timeout(connection_observer, start_time=time.time())
         feed_started.set()
 
-        while True:
-            if stop_feeding.is_set():
-                self.logger.debug("stopped {!r}".format(connection_observer))
-                break
-            if connection_observer.done():
-                self.logger.debug("done {!r}".format(connection_observer))
-                break
-            if self._in_shutdown:
-                self.logger.debug("shutdown so cancelling {!r}".format(connection_observer))
-                connection_observer.cancel()
-            time.sleep(0.01)  # give moler_conn a chance to feed observer
+        if delivery_queue is not None:
+            # connection only queues data - observer is called from this thread
+            _feed_from_queue(connection_observer, data_receiver, delivery_queue)
+        stop_feeding.wait()
+        if connection_observer.done():
+            self.logger.debug("done {!r}".format(connection_observer))
+        elif self._in_shutdown:
+            self.logger.debug("shutdown so cancelling {!r}".format(connection_observer))
+            connection_observer.cancel()
+        else:
+            self.logger.debug("stopped {!r}".format(connection_observer))
 
-        self.logger.debug("unsubscribing {!r}".format(connection_observer))
-        moler_conn.unsubscribe(secure_data_received)
+        connection_observer.remove_done_callback(stop_on_done)
+        self._cancel_timeout(connection_observer)
+        with self._stop_feeding_events_lock:
+            self._stop_feeding_events.discard(stop_feeding)
+        self._unsubscribe(connection_observer)
         feed_done.set()
 
         connection_observer._log(logging.INFO, "{} finished.".format(connection_observer.get_short_desc()))
         self.logger.debug("returning result {}".format(connection_observer))
         return connection_observer.result()
 
+    def _subscribe(self, connection_observer):
+        self.logger.debug("subscribing for data {!r}".format(connection_observer))
+
+        def store_data_receiver(data_receiver):
+            with self._observers_receivers_lock:
+                self._observers_receivers[connection_observer] = data_receiver
+
+        return subscribe_for_data(connection_observer, store_data_receiver,
+                                  queued=connection_observer.queued_delivery)
+
+    def _unsubscribe(self, connection_observer):
+        with self._observers_receivers_lock:
+            data_receiver = self._observers_receivers.pop(connection_observer, None)
+        if data_receiver is not None:  # may be already unsubscribed by cancel
+            self.logger.debug("unsubscribing {!r}".format(connection_observer))
+            connection_observer.connection.unsubscribe(data_receiver)
+
     def timeout_change(self, timedelta):
+        # timer wheel checks observer.timeout when timer fires and reschedules if it was extended
         pass
+
+    def _schedule_timeout(self, connection_observer, start_time):
+        remain_time = start_time + connection_observer.timeout - time.time()
+        with self._observers_timers_lock:
+            if connection_observer.done() or self._in_shutdown:
+                return
+            timer = self._timer_wheel.schedule(remain_time, self._on_timeout, connection_observer, start_time)
+            self._observers_timers[connection_observer] = timer
+
+    def _cancel_timeout(self, connection_observer):
+        with self._observers_timers_lock:
+            timer = self._observers_timers.pop(connection_observer, None)
+        if timer is not None:
+            self._timer_wheel.cancel(timer)
+
+    def _on_timeout(self, connection_observer, start_time):
+        with self._observers_timers_lock:
+            self._observers_timers.pop(connection_observer, None)
+        passed = time.time() - start_time
+        if passed < connection_observer.timeout:  # timeout has been extended
+            self._schedule_timeout(connection_observer, start_time)
+            return
+        with self._timing_out_lock:
+            if not connection_observer.done():  # wait_for() might be faster
+                kind = "await_done" if connection_observer in self._awaited_observers else "background_run"
+                time_out_observer(connection_observer, timeout=connection_observer.timeout, passed_time=passed,
+                                  runner_logger=self.logger, kind=kind)
+
+    def _mark_awaited(self, connection_observer, awaited):
+        with self._timing_out_lock:
+            awaiting_count = self._awaited_observers.pop(connection_observer, 0) + (1 if awaited else -1)
+            if awaiting_count > 0:
+                self._awaited_observers[connection_observer] = awaiting_count
+
+
+# ------------------------------------------------------------------------------------------------
+# Default runner - shared by all connection-observers that are created without explicit runner
+# ------------------------------------------------------------------------------------------------
+
+_default_runner = None
+_default_runner_max_workers = 1000
+_default_runner_lock = threading.RLock()  # weakref callback may fire (GC) while lock is taken by same thread
+_i_own_default_runner = False  # lazily created (not given via set_default_runner)
+_default_runner_users = dict()  # lazily created runner: weak references of connection-observers using it
+_retired_runners = set()  # lazily created runners exchanged by set_default_runner() but still having users
+
+
+def get_default_runner(user=None):
+    """
+    Return runner shared by all connection-observers created without explicit runner.
+
+    Runner is created lazily on first usage and lives till it is exchanged by set_default_runner()
+    and all its users are gone (or till exit of python process).
+    :param user: connection-observer that will use returned runner (keeps lazily created runner alive)
+    :return: instance of ConnectionObserverRunner
+    """
+    global _default_runner, _i_own_default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            # all observers without own runner share this one - so, it can't limit how many of them run concurrently
+            # (executor starts threads on demand, there is no cost of high limit)
+            _default_runner = ThreadPoolExecutorRunner(max_workers=_default_runner_max_workers)
+            _i_own_default_runner = True
+        runner = _default_runner
+        if (user is not None) and _i_own_default_runner:
+            user_ref = weakref.ref(user, functools.partial(_forget_default_runner_user, runner))
+            _default_runner_users.setdefault(runner, set()).add(user_ref)
+        return runner
+
+
+def set_default_runner(runner):
+    """
+    Install runner to be shared by connection-observers created without explicit runner.
+
+    Observers already using previous default runner keep it; if that one was lazily created
+    by Moler it is shut down when last of its users is gone. Runner installed that way
+    is not shut down by Moler - it is owned by caller.
+
+    :param runner: instance of ConnectionObserverRunner or None to return to lazily created default runner
+    :return: None
+    """
+    global _default_runner, _i_own_default_runner
+    with _default_runner_lock:
+        previous_runner, previous_is_mine = _default_runner, _i_own_default_runner
+        _default_runner, _i_own_default_runner = runner, False
+        shutdown_previous = previous_is_mine and not _default_runner_users.get(previous_runner)
+        if shutdown_previous:
+            _default_runner_users.pop(previous_runner, None)
+        elif previous_is_mine:
+            _retired_runners.add(previous_runner)
+    if shutdown_previous:
+        previous_runner.shutdown()
+
+
+def _forget_default_runner_user(runner, user_ref):
+    with _default_runner_lock:
+        users = _default_runner_users.get(runner, set())
+        users.discard(user_ref)
+        is_unused_retired_runner = (runner in _retired_runners) and not users
+        if is_unused_retired_runner:
+            _retired_runners.discard(runner)
+            _default_runner_users.pop(runner, None)
+    if is_unused_retired_runner:
+        # last user may be garbage collected inside thread of that runner - it can't await its own shutdown
+        shutdown_thread = threading.Thread(target=runner.shutdown, name="RetiredRunnerShutdown")
+        shutdown_thread.daemon = True
+        shutdown_thread.start()
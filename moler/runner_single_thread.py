@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 Nokia
+"""
+Runner driving all connection-observers from single scheduler thread.
+
+Observers don't occupy any thread while running:
+- they are fed with data directly by connection they are subscribed to,
+- their completion and timeouts are handled by one scheduler thread.
+So, number of simultaneously running observers is not limited by number of threads.
+"""
+
+__author__ = 'Grzegorz Latuszek, Marcin Usielski, Michal Ernst'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com, marcin.usielski@nokia.com, michal.ernst@nokia.com'
+
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from moler.runner import ConnectionObserverRunner
+from moler.runner import subscribe_for_data
+from moler.runner import time_out_observer
+
+
+class ObserverFuture(Future):
+    """
+    Future of connection-observer running inside RunnerSingleThread.
+
+    It is running since submit() - connection-observer is fed by connection at once.
+    Contrary to concurrent.futures.Future it can be cancelled while running (stops feeding the observer).
+    So, it is never marked as running (concurrent.futures.Future refuses to cancel running one) -
+    it just reports itself as running till it is done.
+    """
+    def running(self):
+        return not self.done()
+
+
+class RunnerSingleThread(ConnectionObserverRunner):
+    def __init__(self):
+        """Create instance of RunnerSingleThread class"""
+        self._in_shutdown = False
+        self._active_observers = dict()  # observer -> (its future, its data-receiver, its start time)
+        self._timeouts = list()  # heap of (deadline, sequence-number, observer)
+        self._sequence = itertools.count()  # keeps heap ordering stable for same deadlines
+        self._done_observers = list()  # observers to be finished by scheduler thread
+        self._condition = threading.Condition()
+        self.logger = logging.getLogger('moler.runner.single-thread')
+        self._scheduler = threading.Thread(target=self._run_scheduler, name="RunnerSingleThread")
+        self._scheduler.daemon = True
+        self._scheduler.start()
+        self.logger.debug("created")
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        if self._in_shutdown:
+            return
+        self.logger.debug("shutting down")
+        if hasattr(atexit, 'unregister'):  # python 2.7 has no atexit.unregister()
+            atexit.unregister(self.shutdown)
+        with self._condition:
+            self._in_shutdown = True
+            self._condition.notify()
+        if threading.current_thread() is not self._scheduler:
+            self._scheduler.join()
+        with self._condition:
+            running_observers = list(self._active_observers)
+        for connection_observer in running_observers:
+            self.logger.debug("shutdown so cancelling {!r}".format(connection_observer))
+            connection_observer.cancel()
+            self._finish(connection_observer)
+
+    def submit(self, connection_observer):
+        """
+        Submit connection observer to background execution.
+        Returns Future that could be used to await for connection_observer done.
+        """
+        self.logger.debug("go background: {!r}".format(connection_observer))
+        connection_observer_future = ObserverFuture()
+        self.feed(connection_observer, connection_observer_future)
+
+        def stop_feeding_on_cancel(future):
+            if future.cancelled():
+                self._on_observer_done(connection_observer)
+
+        connection_observer_future.add_done_callback(stop_feeding_on_cancel)
+        return connection_observer_future
+
+    def wait_for(self, connection_observer, connection_observer_future, timeout=None):
+        """
+        Await for connection_observer running in background or timeout.
+
+        :param connection_observer: The one we are awaiting for.
+        :param connection_observer_future: Future of connection-observer returned from submit().
+        :param timeout: Max time (in float seconds) you want to await before you give up.
+                        If None then observer's own timeout (enforced by scheduler thread) is awaited.
+        :return:
+        """
+        self.logger.debug("go foreground: {!r} - await max. {} [sec]".format(connection_observer, timeout))
+        start_time = time.time()
+        observer_done = threading.Event()
+
+        def wake_up(observer):
+            observer_done.set()
+
+        connection_observer.add_done_callback(wake_up)
+        try:
+            if timeout:
+                is_done = observer_done.wait(timeout=timeout)
+            else:
+                is_done = observer_done.wait()
+        finally:
+            connection_observer.remove_done_callback(wake_up)
+        if is_done:
+            self.logger.debug("{} done".format(connection_observer))
+            return None
+
+        # code below is for timed out observer
+        passed = time.time() - start_time
+        connection_observer_future.cancel()
+        time_out_observer(connection_observer, timeout=timeout, passed_time=passed, runner_logger=self.logger)
+        return None
+
+    def feed(self, connection_observer, connection_observer_future):
+        """
+        Feeds connection_observer by subscribing it to its connection.
+        From that moment connection itself passes data to connection_observer.
+        """
+        connection_observer._log(logging.INFO, "{} started.".format(connection_observer.get_long_desc()))
+
+        start_time = time.time()
+
+        def activate(secure_data_received):
+            with self._condition:
+                self._active_observers[connection_observer] = (connection_observer_future, secure_data_received,
+                                                               start_time)
+                deadline = start_time + connection_observer.timeout
+                heapq.heappush(self._timeouts, (deadline, next(self._sequence), connection_observer))
+                self._condition.notify()  # new deadline may be the nearest one
+
+        self.logger.debug("subscribing for data {!r}".format(connection_observer))
+        subscribe_for_data(connection_observer, activate)
+        connection_observer.add_done_callback(self._on_observer_done)
+
+    def timeout_change(self, timedelta):
+        """
+        Nothing to do here - scheduler rereads connection_observer.timeout when its deadline passes
+        """
+        pass
+
+    def _on_observer_done(self, connection_observer):
+        with self._condition:
+            self._done_observers.append(connection_observer)
+            self._condition.notify()
+
+    def _run_scheduler(self):
+        while True:
+            with self._condition:
+                if not self._done_observers and not self._in_shutdown:
+                    self._condition.wait(timeout=self._time_till_nearest_deadline())
+                if self._in_shutdown:
+                    break
+                done_observers = self._done_observers
+                self._done_observers = list()
+                timed_out_observers = self._pop_timed_out_observers()
+            for connection_observer, timeout, passed in timed_out_observers:
+                # its done-callback will pass it back to us as done observer
+                time_out_observer(connection_observer, timeout=timeout, passed_time=passed,
+                                  runner_logger=self.logger, kind="run")
+            for connection_observer in done_observers:
+                self._finish(connection_observer)
+        self.logger.debug("scheduler stopped")
+
+    def _time_till_nearest_deadline(self):
+        if not self._timeouts:
+            return None
+        nearest_deadline = self._timeouts[0][0]
+        return max(nearest_deadline - time.time(), 0.0)
+
+    def _pop_timed_out_observers(self):
+        timed_out_observers = list()
+        now = time.time()
+        while self._timeouts and (self._timeouts[0][0] <= now):
+            _, _, connection_observer = heapq.heappop(self._timeouts)
+            if (connection_observer not in self._active_observers) or connection_observer.done():
+                continue  # stale heap entry
+            _, _, start_time = self._active_observers[connection_observer]
+            # deadline is recalculated since timeout might be extended after submit()
+            deadline = start_time + connection_observer.timeout
+            if deadline > now:
+                heapq.heappush(self._timeouts, (deadline, next(self._sequence), connection_observer))
+            else:
+                timed_out_observers.append((connection_observer, connection_observer.timeout, now - start_time))
+        return timed_out_observers
+
+    def _finish(self, connection_observer):
+        with self._condition:
+            if connection_observer not in self._active_observers:
+                return
+            connection_observer_future, secure_data_received, _ = self._active_observers.pop(connection_observer)
+        self.logger.debug("unsubscribing {!r}".format(connection_observer))
+        connection_observer.connection.unsubscribe(secure_data_received)
+        connection_observer.remove_done_callback(self._on_observer_done)
+        connection_observer._log(logging.INFO, "{} finished.".format(connection_observer.get_short_desc()))
+        if connection_observer_future.done():
+            return  # cancelled via future
+        if connection_observer._exception:
+            connection_observer_future.set_exception(connection_observer._exception)
+        elif connection_observer.cancelled():
+            connection_observer_future.cancel()
+        else:
+            connection_observer_future.set_result(connection_observer._result)
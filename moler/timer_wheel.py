@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 Nokia
+"""
+Hashed timer wheel - timers with O(1) schedule/cancel served by single thread.
+
+Time is divided into ticks. Timer expiring at given tick is stored inside
+slot (tick modulo number of slots) so, scheduling and cancelling timer
+doesn't depend on number of pending timers. Wheel thread visits slots tick by tick
+and calls callbacks of expired timers.
+Timer never fires before its delay but may fire up to one tick later.
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import logging
+import math
+import threading
+import time
+
+
+class Timer(object):
+    """Handle of timer scheduled inside TimerWheel"""
+    __slots__ = ('expiry_tick', 'callback', 'args')
+
+    def __init__(self, expiry_tick, callback, args):
+        self.expiry_tick = expiry_tick
+        self.callback = callback
+        self.args = args
+
+
+class TimerWheel(object):
+    def __init__(self, tick=0.05, slots_count=512):
+        """
+        Create instance of TimerWheel class
+
+        :param tick: resolution of timers (in float seconds)
+        :param slots_count: number of wheel slots (timers expiring within one wheel turn don't share slot)
+        """
+        self.tick = tick
+        self._slots = [dict() for _ in range(slots_count)]  # dict gives O(1) removal of cancelled timer
+        self._timers_count = 0
+        self._start_time = time.time()
+        self._current_tick = 0  # next tick to be processed
+        self._condition = threading.Condition()
+        self._thread = None
+        self._in_shutdown = False
+        self.logger = logging.getLogger('moler.timer-wheel')
+
+    def __len__(self):
+        return self._timers_count
+
+    def schedule(self, delay, callback, *args):
+        """
+        Schedule callback(*args) to be called from wheel thread after delay.
+
+        :param delay: delay in float seconds
+        :return: Timer that may be passed to cancel()
+        """
+        with self._condition:
+            if self._in_shutdown:  # such timer will never fire
+                return Timer(expiry_tick=-1, callback=callback, args=args)
+            expiry_tick = int(math.ceil((time.time() + delay - self._start_time) / self.tick))
+            if self._timers_count == 0:
+                # nothing pending - wheel may skip idle ticks at once
+                self._current_tick = max(self._current_tick, self._passed_ticks())
+            expiry_tick = max(expiry_tick, self._current_tick)
+            timer = Timer(expiry_tick, callback, args)
+            self._slots[expiry_tick % len(self._slots)][timer] = None
+            self._timers_count += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="TimerWheel")
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel timer (no-op if timer has already fired or was cancelled)
+
+        :return: True if timer was cancelled before firing
+        """
+        with self._condition:
+            slot = self._slots[timer.expiry_tick % len(self._slots)]
+            if timer in slot:
+                del slot[timer]
+                self._timers_count -= 1
+                return True
+        return False
+
+    def shutdown(self):
+        """Stop wheel thread; pending timers are dropped without firing."""
+        with self._condition:
+            if self._in_shutdown:
+                return
+            self._in_shutdown = True
+            for slot in self._slots:
+                slot.clear()
+            self._timers_count = 0
+            self._condition.notify()
+        if (self._thread is not None) and (self._thread is not threading.current_thread()):
+            self._thread.join()
+
+    def _passed_ticks(self):
+        return int((time.time() - self._start_time) / self.tick)
+
+    def _pop_expired_timers(self):
+        now_tick = self._passed_ticks()
+        expired = []
+        # if we are late by whole wheel turn - each slot is visited once
+        ticks_to_process = min(now_tick - self._current_tick + 1, len(self._slots))
+        for tick in range(self._current_tick, self._current_tick + ticks_to_process):
+            slot = self._slots[tick % len(self._slots)]
+            for timer in [timer for timer in slot if timer.expiry_tick <= now_tick]:
+                del slot[timer]
+                expired.append(timer)
+        self._current_tick = max(self._current_tick, now_tick + 1)
+        self._timers_count -= len(expired)
+        return expired
+
+    def _run(self):
+        self.logger.debug("timer wheel started")
+        while True:
+            with self._condition:
+                while (self._timers_count == 0) and not self._in_shutdown:
+                    self._condition.wait()
+                if self._in_shutdown:
+                    break
+                expired = self._pop_expired_timers()
+                if not expired:
+                    next_tick_time = self._start_time + self._current_tick * self.tick
+                    self._condition.wait(timeout=max(next_tick_time - time.time(), 0.0))
+            for timer in expired:  # callbacks run without lock - they may schedule/cancel timers
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    self.logger.exception("timer callback {} raised".format(timer.callback))
+        self.logger.debug("timer wheel finished")
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Testing connection observer runner based on asyncio
+
+- submit
+- wait_for
+- awaiting connection observer
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import sys
+import time
+
+import pytest
+from moler.connection_observer import ConnectionObserver
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio runner requires Python 3.5+")
+
+
+def test_submit_returns_asyncio_future(connection_observer, observer_runner):
+    import asyncio
+
+    connection_observer_future = observer_runner.submit(connection_observer)
+    assert isinstance(connection_observer_future, asyncio.Future)
+    assert not connection_observer_future.done()
+    connection_observer_future.cancel()  # test cleanup
+
+
+def test_can_await_connection_observer(connection_observer, observer_runner, event_loop):
+    awaited_data = 'ping: sendmsg: Network is unreachable'
+    moler_conn = connection_observer.connection
+    event_loop.call_later(0.1, moler_conn.data_received, awaited_data)
+
+    result = event_loop.run_until_complete(_await(connection_observer))
+    assert result == connection_observer.result()
+    assert connection_observer.all_data_received == [awaited_data]
+
+
+def test_can_wait_for_connection_observer_outside_of_event_loop(connection_observer, observer_runner, event_loop):
+    awaited_data = 'ping: sendmsg: Network is unreachable'
+    moler_conn = connection_observer.connection
+    connection_observer.start()
+    event_loop.call_later(0.1, moler_conn.data_received, awaited_data)
+
+    result = connection_observer.await_done(timeout=1.0)
+    assert result == connection_observer.result()
+
+
+def test_connection_observer_timed_out_by_wait_outside_of_event_loop_is_unsubscribed(connection_observer,
+                                                                                     observer_runner, event_loop):
+    from moler.exceptions import ConnectionObserverTimeout
+
+    connection_observer.start()
+    with pytest.raises(ConnectionObserverTimeout):
+        connection_observer.await_done(timeout=0.1)
+    assert connection_observer.done()
+    assert connection_observer.connection._observers == {}  # unsubscribed without running loop again
+
+
+def test_awaited_connection_observer_times_out_by_its_own_timeout(connection_observer, observer_runner, event_loop):
+    from moler.exceptions import ConnectionObserverTimeout
+
+    connection_observer.timeout = 0.2
+    start_time = time.time()
+    with pytest.raises(ConnectionObserverTimeout):
+        event_loop.run_until_complete(_await(connection_observer))
+    assert 0.2 <= (time.time() - start_time) < 0.5
+    assert connection_observer.done()
+    assert connection_observer.connection._observers == {}  # unsubscribed
+
+
+def test_timeout_of_awaited_connection_observer_can_be_extended(connection_observer, observer_runner, event_loop):
+    from moler.exceptions import ConnectionObserverTimeout
+
+    connection_observer.timeout = 0.2
+    event_loop.call_later(0.1, connection_observer.extend_timeout, 0.2)
+    start_time = time.time()
+    with pytest.raises(ConnectionObserverTimeout):
+        event_loop.run_until_complete(_await(connection_observer))
+    assert (time.time() - start_time) >= 0.4
+
+
+def test_can_await_thousands_of_connection_observers_on_one_event_loop(observer_runner, event_loop):
+    import asyncio
+    import threading
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+    observers = [NetworkDownDetector(connection=moler_conn, runner=observer_runner) for _ in range(2000)]
+    threads_count = threading.active_count()
+    event_loop.call_later(0.1, moler_conn.data_received, "ping: sendmsg: Network is unreachable")
+
+    results = event_loop.run_until_complete(asyncio.gather(*observers))
+    assert len(results) == 2000
+    assert all(observer.done() for observer in observers)
+    assert threading.active_count() <= threads_count  # threads of previous tests may be still finishing
+
+
+def test_await_done_inside_running_event_loop_is_wrong_usage(connection_observer, observer_runner, event_loop):
+    from moler.exceptions import WrongUsage, NoResultSinceCancelCalled
+    raised_exceptions = []
+
+    def blocking_await():
+        try:
+            connection_observer.await_done()
+        except WrongUsage as exc:
+            raised_exceptions.append(exc)
+        connection_observer.cancel()
+
+    connection_observer.start()
+    event_loop.call_soon(blocking_await)
+    with pytest.raises(NoResultSinceCancelCalled):
+        event_loop.run_until_complete(_await(connection_observer))
+    assert len(raised_exceptions) == 1
+
+
+# --------------------------- resources ---------------------------
+
+
+def _await(connection_observer):
+    import asyncio
+    return asyncio.ensure_future(connection_observer)
+
+
+@pytest.yield_fixture()
+def event_loop():
+    import asyncio
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@pytest.yield_fixture()
+def observer_runner(event_loop):
+    from moler.asyncio_runner import AsyncioRunner
+    runner = AsyncioRunner(loop=event_loop)
+    yield runner
+    runner.shutdown()
+
+
+class NetworkDownDetector(ConnectionObserver):
+    def __init__(self, connection=None, runner=None):
+        super(NetworkDownDetector, self).__init__(connection=connection, runner=runner)
+        self.all_data_received = []
+
+    def data_received(self, data):
+        """
+        Awaiting change like:
+        64 bytes from 10.0.2.15: icmp_req=3 ttl=64 time=0.045 ms
+        ping: sendmsg: Network is unreachable
+        """
+        self.all_data_received.append(data)
+        if not self.done():
+            if "Network is unreachable" in data:
+                when_detected = time.time()
+                self.set_result(result=when_detected)
+
+
+@pytest.fixture()
+def connection_observer(observer_runner):
+    from moler.connection import ObservableConnection
+    moler_conn = ObservableConnection()
+    observer = NetworkDownDetector(connection=moler_conn, runner=observer_runner)
+    return observer
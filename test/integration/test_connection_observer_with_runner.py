@@ -68,6 +68,24 @@ def test_connection_observer_behaves_like_future(net_down_detector_and_ping_outp
         ext_io.join()
 
 
+def test_connection_observer_gets_data_received_after_its_start_but_before_its_subscription(net_down_detector):
+    from moler.runner import ThreadPoolExecutorRunner
+
+    class LateSubscribingRunner(ThreadPoolExecutorRunner):
+        def feed(self, connection_observer, *args):
+            # fast device answers before runner subscribes observer
+            connection_observer.connection.data_received("ping: sendmsg: Network is unreachable\n")
+            return super(LateSubscribingRunner, self).feed(connection_observer, *args)
+
+    net_down_detector.connection.data_received("ping: sendmsg: Network is unreachable\n")  # before start - not for us
+    with LateSubscribingRunner() as runner:
+        net_down_detector.runner = runner
+        before_start = time.time()
+        net_down_detector.start(timeout=2.0)
+        when_detected = net_down_detector.await_done()
+    assert when_detected >= before_start
+
+
 # TODO: tests for error cases
 
 
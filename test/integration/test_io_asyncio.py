@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Testing external-IO connections driven by asyncio event loop
+
+- open/close
+- send/receive
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import platform
+import sys
+import threading
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio connections require Python 3.5+")
+
+
+def test_can_open_and_close_tcp_connection(integration_tcp_server_and_pipe, event_loop):
+    from moler.io.asyncio.tcp import AsyncioTcp
+    from moler.connection import ObservableConnection
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+
+    connection = AsyncioTcp(moler_connection=ObservableConnection(), port=tcp_server.port, host=tcp_server.host,
+                            loop=event_loop)
+    with connection:
+        pass
+    time.sleep(0.1)  # otherwise we have race between server's pipe and from-client-connection
+    tcp_server_pipe.send(("get history", {}))
+    dialog_with_server = tcp_server_pipe.recv()
+    assert 'Client connected' in dialog_with_server
+    assert 'Client disconnected' in dialog_with_server
+
+
+def test_can_send_and_receive_data_over_tcp_connection_from_event_loop(integration_tcp_server_and_pipe,
+                                                                       event_loop):
+    import asyncio
+    from moler.connection import get_connection
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+
+    connection = get_connection(io_type='tcp', variant='asyncio', port=tcp_server.port, host=tcp_server.host)
+    connection._loop = event_loop
+    moler_conn = connection.moler_connection
+    received_data = []
+
+    def receiver(data):
+        received_data.append(data)
+
+    moler_conn.subscribe(receiver)
+
+    event_loop.run_until_complete(connection.open_async())
+    event_loop.run_until_complete(asyncio.sleep(0.1))  # let server accept our connection
+    moler_conn.send("data to be send")
+    tcp_server_pipe.send(("send async msg", {'msg': b'data to read'}))
+    event_loop.run_until_complete(asyncio.sleep(0.2))
+    event_loop.run_until_complete(connection.close_async())
+
+    tcp_server_pipe.send(("get history", {}))
+    dialog_with_server = tcp_server_pipe.recv()
+    assert ['Received data:', b'data to be send'] in dialog_with_server
+    assert received_data == ['data to read']
+
+
+def test_tcp_connection_can_be_used_from_outside_of_event_loop_thread(integration_tcp_server_and_pipe,
+                                                                      event_loop):
+    from moler.io.asyncio.tcp import AsyncioTcp
+    from moler.connection import ObservableConnection
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+    loop_thread = threading.Thread(target=event_loop.run_forever)
+    loop_thread.start()
+    try:
+        connection = AsyncioTcp(moler_connection=ObservableConnection(), port=tcp_server.port,
+                                host=tcp_server.host, loop=event_loop)
+        with connection:
+            connection.send(b'data to be send')
+            time.sleep(0.1)
+        tcp_server_pipe.send(("get history", {}))
+        dialog_with_server = tcp_server_pipe.recv()
+        assert ['Received data:', b'data to be send'] in dialog_with_server
+    finally:  # test cleanup
+        event_loop.call_soon_threadsafe(event_loop.stop)
+        loop_thread.join()
+
+
+def test_connections_without_given_loop_use_running_loop_or_one_loop_of_thread():
+    import asyncio
+    import warnings
+    from moler.connection import ObservableConnection
+    from moler.io.asyncio.tcp import AsyncioTcp
+
+    def tcp_connection():
+        return AsyncioTcp(moler_connection=ObservableConnection(), port=2345)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)  # no deprecated asyncio.get_event_loop()
+        thread_loop = tcp_connection().loop
+        assert tcp_connection().loop is thread_loop
+        running_loop = asyncio.new_event_loop()
+        loops_inside_running_loop = []
+        running_loop.call_soon(lambda: loops_inside_running_loop.append(tcp_connection().loop))
+        try:
+            running_loop.run_until_complete(asyncio.sleep(0.01))
+        finally:
+            running_loop.close()
+    assert loops_inside_running_loop == [running_loop]
+
+
+@pytest.mark.skipif(platform.system() != 'Linux', reason="terminal works on Linux only")
+def test_terminal_forwards_shell_output_without_pulling_thread(event_loop):
+    import asyncio
+    from moler.connection import ObservableConnection
+    from moler.io.asyncio.terminal import AsyncioTerminal
+
+    moler_conn = ObservableConnection()
+    received_data = []
+
+    def receiver(data):
+        received_data.append(data)
+
+    moler_conn.subscribe(receiver)
+    terminal = AsyncioTerminal(moler_connection=moler_conn, first_prompt=r'moler_bash#', loop=event_loop)
+    threads_count = threading.active_count()
+    terminal.open()
+    try:
+        assert threading.active_count() <= threads_count  # threads of previous tests may be still finishing
+        moler_conn.sendline("echo asyncio_terminal")
+        event_loop.run_until_complete(asyncio.sleep(0.5))
+    finally:  # test cleanup
+        terminal.close()
+    assert "asyncio_terminal" in "".join(received_data)
+
+
+# --------------------------- resources ---------------------------
+
+
+@pytest.yield_fixture()
+def event_loop():
+    import asyncio
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.yield_fixture()
+def integration_tcp_server_and_pipe():
+    from moler.io.raw.tcpserverpiped import tcp_server_piped
+    with tcp_server_piped(use_stderr_logger=True) as server_and_pipe:
+        (server, svr_ctrl_pipe) = server_and_pipe
+        yield (server, svr_ctrl_pipe)
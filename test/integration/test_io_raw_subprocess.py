@@ -11,9 +11,14 @@ __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'grzegorz.latuszek@nokia.com'
 
 import importlib
+import platform
 import sys
+import time
+
 import pytest
 
+pytestmark = pytest.mark.skipif(platform.system() == 'Windows', reason="select() on pipes works on Unix only")
+
 
 def test_can_open_connection(subprocess_connection_class):
     """
@@ -23,13 +28,150 @@ def test_can_open_connection(subprocess_connection_class):
     - full path to python we get from sys.executable
     - not so "atomic" since uses connection's "read" to verify open
     """
-    pass
+    connection = subprocess_connection_class(command=[sys.executable, '-i'])
+    with connection:
+        output = receive_till(connection, b'>>> ')
+    assert output.endswith(b'>>> ')
+
+
+def test_can_send_and_receive_data(subprocess_connection_class):
+    connection = subprocess_connection_class(command=[sys.executable, '-i'])
+    with connection:
+        receive_till(connection, b'>>> ')
+        connection.send(data=b'print(6 * 7)\n')
+        output = receive_till(connection, b'>>> ')
+    assert b'42' in output
+
+
+def test_receiving_from_exited_process_raises_exception(subprocess_connection_class):
+    from moler.io.io_exceptions import RemoteEndpointDisconnected
+
+    connection = subprocess_connection_class(command=[sys.executable, '-c', 'print("bye")'])
+    with connection:
+        with pytest.raises(RemoteEndpointDisconnected):
+            receive_till(connection, b'never printed')
+
+
+def test_close_kills_process_ignoring_termination(subprocess_connection_class):
+    ignoring_sigterm = 'import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print("ready"); time.sleep(60)'
+    connection = subprocess_connection_class(command=[sys.executable, '-u', '-c', ignoring_sigterm],
+                                             terminate_timeout=0.2)
+    connection.open()
+    receive_till(connection, b'ready')
+    process = connection.process
+    start_time = time.time()
+    connection.close()
+    assert process.poll() is not None
+    assert time.time() - start_time < 2
+
+
+def test_threaded_subprocess_feeds_moler_connection():
+    from moler.connection import get_connection
+
+    received_data = []
+
+    def receiver(data):
+        received_data.append(data)
+
+    connection = get_connection(io_type='subprocess', variant='threaded',
+                                command=[sys.executable, '-i'])
+    connection.moler_connection.subscribe(receiver)
+    with connection:
+        connection.moler_connection.send('print(6 * 7)\n')
+        time.sleep(0.5)
+    assert '42' in ''.join(received_data)
+
+
+def test_startup_latency_versus_terminal():
+    import threading
+    from moler.connection import ObservableConnection
+    from moler.io.raw.subprocess import ThreadedSubprocess
+    from moler.io.raw.terminal import ThreadedTerminal
+
+    def subprocess_conn():
+        return ThreadedSubprocess(moler_connection=ObservableConnection(), command=['echo', 'ready'])
+
+    def terminal_conn():
+        return ThreadedTerminal(moler_connection=ObservableConnection(), first_prompt=r'moler_bash#')
+
+    latencies = {}
+    for io_name, io_conn_factory in [('subprocess', subprocess_conn), ('terminal', terminal_conn)]:
+        output_came = threading.Event()
+
+        def on_new_data(data):
+            output_came.set()
+
+        io_conn = io_conn_factory()
+        io_conn.moler_connection.subscribe(on_new_data)
+        start_time = time.time()
+        with io_conn:
+            assert output_came.wait(timeout=5)
+            latencies[io_name] = time.time() - start_time
+
+    print("start-up latency: subprocess {subprocess:.4f} sec, terminal {terminal:.4f} sec".format(**latencies))
+
+
+def test_throughput_of_big_output_versus_terminal(tmpdir):
+    from moler.connection import ObservableConnection
+    from moler.io.raw.subprocess import ThreadedSubprocess
+    from moler.io.raw.terminal import ThreadedTerminal
+
+    lines_count = 100000
+    big_file = tmpdir.join("big_file.txt")
+    big_file.write("".join("line {:08d} of big file\n".format(nb) for nb in range(lines_count)))
+    file_size = big_file.size()
+
+    subprocess_conn = ThreadedSubprocess(moler_connection=ObservableConnection(logger_name=None),
+                                         command=['cat', str(big_file)], read_chunk_size=64 * 1024)
+    subprocess_stats = measure_output(subprocess_conn, start_output=subprocess_conn.open,
+                                      output_size=file_size)
+    terminal_conn = ThreadedTerminal(moler_connection=ObservableConnection(logger_name=None),
+                                     first_prompt=r'moler_bash#')
+    terminal_conn.open()
+    terminal_stats = measure_output(terminal_conn, start_output=lambda: terminal_conn.send("cat {}\n".format(big_file)),
+                                    output_size=file_size + lines_count)  # pty outputs \r\n instead of each \n
+    subprocess_conn.close()
+    terminal_conn.close()
+
+    for io_name, (size, duration) in [('subprocess', subprocess_stats), ('terminal', terminal_stats)]:
+        print("{}: {:.1f} MB/sec".format(io_name, size / duration / 1e6))
+    assert subprocess_stats[0] == file_size
+    assert terminal_stats[0] >= file_size + lines_count
 
 
 # --------------------------- resources ---------------------------
 
 
-@pytest.fixture(params=['Subprocess', 'ThreadedSubprocess'])
+def receive_till(connection, expected_output, timeout=5):
+    from moler.io.io_exceptions import ConnectionTimeout
+
+    output = b''
+    give_up_time = time.time() + timeout
+    while (expected_output not in output) and (time.time() < give_up_time):
+        try:
+            output += connection.receive(timeout=0.1)
+        except ConnectionTimeout:
+            pass
+    return output
+
+
+def measure_output(io_conn, start_output, output_size):
+    received = [0]
+
+    def on_new_data(data):
+        received[0] += len(data)
+
+    io_conn.moler_connection.subscribe(on_new_data)
+    start_time = time.time()
+    start_output()
+    while (received[0] < output_size) and (time.time() - start_time < 10):
+        time.sleep(0.005)
+    duration = max(time.time() - start_time, 1e-6)
+    io_conn.moler_connection.unsubscribe(on_new_data)
+    return received[0], duration
+
+
+@pytest.fixture(params=['Subprocess'])
 def subprocess_connection_class(request):
     class_name = request.param
     module = importlib.import_module('moler.io.raw.subprocess')
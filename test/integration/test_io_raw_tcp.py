@@ -10,6 +10,7 @@ __author__ = 'Grzegorz Latuszek'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'grzegorz.latuszek@nokia.com'
 
+import sys
 import time
 
 import pytest
@@ -79,6 +80,130 @@ def test_can_receive_data_from_connection(tcp_connection_class,
     assert b'data to read' == received_data
 
 
+@pytest.mark.skipif(sys.version_info < (3, 4), reason="reactor requires selectors module of Python 3.4+")
+def test_threaded_connection_is_fed_by_reactor_thread(integration_tcp_server_and_pipe):
+    from moler.connection import ObservableConnection
+    from moler.io.raw.tcp import ThreadedTcp
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+    received_data = []
+
+    def receiver(data):
+        received_data.append(data)
+
+    connection = ThreadedTcp(moler_connection=ObservableConnection(), port=tcp_server.port, host=tcp_server.host)
+    connection.moler_connection.subscribe(receiver)
+    with connection:
+        assert connection.pulling_thread is None
+        time.sleep(0.1)  # otherwise we have race between server's pipe and from-client-connection
+        tcp_server_pipe.send(("send async msg", {'msg': b'data to read'}))
+        time.sleep(0.2)
+    assert received_data == [b'data to read']
+
+
+@pytest.mark.skipif(sys.version_info < (3, 4), reason="reactor requires selectors module of Python 3.4+")
+def test_threaded_connection_closed_by_server_is_unregistered_from_reactor(integration_tcp_server_and_pipe):
+    from moler.connection import ObservableConnection
+    from moler.io.raw.tcp import ThreadedTcp
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+
+    connection = ThreadedTcp(moler_connection=ObservableConnection(), port=tcp_server.port, host=tcp_server.host)
+    with connection:
+        reactor = connection._reactor
+        registered_count = len(reactor)
+        time.sleep(0.1)  # otherwise we have race between server's pipe and from-client-connection
+        tcp_server_pipe.send(("close connection", {}))
+        time.sleep(0.2)
+        assert connection.socket is None
+        assert connection._reactor is None
+        assert len(reactor) == registered_count - 1
+
+
+def test_can_receive_data_into_reused_buffer(integration_tcp_server_and_pipe):
+    from moler.io.raw.tcp import Tcp
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+
+    connection = Tcp(port=tcp_server.port, host=tcp_server.host)
+    connection.open()
+    time.sleep(0.1)  # otherwise we have race between server's pipe and from-client-connection
+    tcp_server_pipe.send(("send async msg", {'msg': b'data to read'}))
+    received_data = connection.receive_into()
+    assert isinstance(received_data, memoryview)
+    assert b'data to read' == received_data.tobytes()
+    tcp_server_pipe.send(("send async msg", {'msg': b'next'}))
+    next_received_data = connection.receive_into()
+    connection.close()
+    assert b'next' == next_received_data.tobytes()
+    assert b'next' == received_data[:4].tobytes()  # same buffer reused
+
+
+@pytest.mark.parametrize("zero_copy_receive", [False, True])
+def test_receive_throughput_of_threaded_connection(integration_tcp_server_and_pipe, zero_copy_receive):
+    from moler.connection import ObservableConnection
+    from moler.io.raw.tcp import ThreadedTcp
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+    received_bytes = [0]
+    msg = b'x' * 32 * 1024
+    msgs_count = 64
+
+    def raw_receiver(data):
+        received_bytes[0] += len(data)
+
+    moler_conn = ObservableConnection(logger_name=None, recent_data_max_size=0)  # measure receiving, not logging
+    moler_conn.subscribe(raw_receiver, raw=True)
+    connection = ThreadedTcp(moler_connection=moler_conn, port=tcp_server.port, host=tcp_server.host,
+                             zero_copy_receive=zero_copy_receive)
+    with connection:
+        time.sleep(0.1)  # otherwise we have race between server's pipe and from-client-connection
+        start_time = time.time()
+        for _ in range(msgs_count):
+            tcp_server_pipe.send(("send async msg", {'msg': msg}))
+        while (received_bytes[0] < msgs_count * len(msg)) and (time.time() - start_time < 10):
+            time.sleep(0.01)
+        duration = max(time.time() - start_time, 1e-6)
+
+    print("zero_copy_receive={}: {:.1f} MB/sec".format(zero_copy_receive, received_bytes[0] / duration / 1e6))
+    assert received_bytes[0] == msgs_count * len(msg)
+
+
+def test_connection_pool_reuses_tcp_connection(integration_tcp_server_and_pipe, tcp_connections_config):
+    from moler.connection_pool import ConnectionPool
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+
+    pool = ConnectionPool()
+    with pool.connection(name="tcp_1") as io_conn:
+        io_conn.send(b'first use')
+    with pool.connection(name="tcp_1") as reused_conn:
+        assert reused_conn is io_conn
+        reused_conn.send(b'second use')
+    time.sleep(0.1)
+    pool.close()
+    tcp_server_pipe.send(("get history", {}))
+    history = tcp_server_pipe.recv()
+    assert history.count('Client connected') == 1
+    received_data = b''.join(entry[1] for entry in history if entry[0] == 'Received data:')
+    assert received_data == b'first usesecond use'
+
+
+def test_connection_pool_replaces_tcp_connection_closed_by_server(integration_tcp_server_and_pipe, tcp_connections_config):
+    from moler.connection_pool import ConnectionPool
+    (tcp_server, tcp_server_pipe) = integration_tcp_server_and_pipe
+
+    pool = ConnectionPool()
+    with pool.connection(name="tcp_1") as io_conn:
+        time.sleep(0.1)  # otherwise we have race between server's pipe and from-client-connection
+        tcp_server_pipe.send(("close connection", {}))
+        time.sleep(0.2)
+    with pool.connection(name="tcp_1") as new_conn:
+        assert new_conn is not io_conn
+        new_conn.send(b'data over new connection')
+    time.sleep(0.1)
+    pool.close()
+    tcp_server_pipe.send(("get history", {}))
+    history = tcp_server_pipe.recv()
+    assert history.count('Client connected') == 2
+    assert ['Received data:', b'data over new connection'] in history
+
+
 # TODO: tests for error cases raising Exceptions
 # --------------------------- resources ---------------------------
 
@@ -95,3 +220,13 @@ def integration_tcp_server_and_pipe():
     with tcp_server_piped(use_stderr_logger=True) as server_and_pipe:
         (server, svr_ctrl_pipe) = server_and_pipe
         yield (server, svr_ctrl_pipe)
+
+
+@pytest.yield_fixture()
+def tcp_connections_config(integration_tcp_server_and_pipe):
+    import moler.config.connections as conn_cfg
+    (tcp_server, _) = integration_tcp_server_and_pipe
+    conn_cfg.define_connection(name="tcp_1", io_type="tcp", port=tcp_server.port, host=tcp_server.host)
+    conn_cfg.set_default_variant(io_type="tcp", variant="threaded")
+    yield conn_cfg
+    conn_cfg.clear()
@@ -8,6 +8,7 @@ __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'marcin.usielski@nokia.com, michal.ernst@nokia.com'
 
 import getpass
+import time
 
 import pytest
 
@@ -54,6 +55,45 @@ def test_terminal_whoami_ls(terminal_connection):
     assert getpass.getuser() == user2
 
 
+@pytest.mark.parametrize("coalescing_time", [0, 0.001])
+def test_terminal_throughput_of_big_output(big_file, coalescing_time):
+    from moler.connection import ObservableConnection
+
+    file_path, file_size, lines_count = big_file
+    output_size = file_size + lines_count  # pty outputs \r\n instead of each \n
+    received = {'chunks': 0, 'size': 0}
+
+    def on_new_data(data):
+        received['chunks'] += 1
+        received['size'] += len(data)
+
+    moler_conn = ObservableConnection(logger_name=None)  # measure reading, not logging
+    moler_conn.subscribe(on_new_data)
+    terminal = ThreadedTerminal(moler_connection=moler_conn, first_prompt=r'moler_bash#',
+                                coalescing_time=coalescing_time)
+    with terminal:
+        received.update(chunks=0, size=0)
+        start_time = time.time()
+        terminal.send("cat {}\n".format(file_path))
+        while (received['size'] < output_size) and (time.time() - start_time < 10):
+            time.sleep(0.005)
+        duration = max(time.time() - start_time, 1e-6)
+
+    print("coalescing_time={}: {} notifications, {:.1f} MB/sec".format(coalescing_time, received['chunks'],
+                                                                       received['size'] / duration / 1e6))
+    assert received['size'] >= output_size  # + echo of command and prompt
+    if coalescing_time:
+        assert received['chunks'] < file_size / 4096
+
+
+@pytest.fixture()
+def big_file(tmpdir):
+    lines_count = 100000
+    big_file = tmpdir.join("big_file.txt")
+    big_file.write("".join("line {:08d} of big file\n".format(nb) for nb in range(lines_count)))
+    return str(big_file), big_file.size(), lines_count
+
+
 @pytest.yield_fixture()
 def terminal_connection():
     from moler.connection import ObservableConnection
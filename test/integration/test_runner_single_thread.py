@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Testing connection observer runner driving all observers from single thread
+
+- submit
+- wait_for
+- timeouts enforced by scheduler thread
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import threading
+import time
+
+import pytest
+from moler.connection_observer import ConnectionObserver
+
+
+def test_can_await_connection_observer_to_complete(observer_and_awaited_data,
+                                                   observer_runner):
+    conn_observer, awaited_data = observer_and_awaited_data
+    connection_observer_future = observer_runner.submit(conn_observer)
+    assert connection_observer_future.running()
+
+    def inject_data():
+        time.sleep(0.3)
+        moler_conn = conn_observer.connection
+        moler_conn.data_received(awaited_data)
+
+    ext_io = threading.Thread(target=inject_data)
+    try:
+        ext_io.start()
+        observer_runner.wait_for(conn_observer, connection_observer_future, timeout=1.0)
+        assert conn_observer.done()
+        assert conn_observer.result() is not None
+        time.sleep(0.1)  # let scheduler thread finish observer
+        assert connection_observer_future.done()
+        assert connection_observer_future.result() == conn_observer.result()
+    finally:  # test cleanup
+        ext_io.join()
+
+
+def test_can_await_connection_observer_to_timeout(connection_observer,
+                                                  observer_runner):
+    from moler.exceptions import ConnectionObserverTimeout
+
+    connection_observer_future = observer_runner.submit(connection_observer)
+    with pytest.raises(ConnectionObserverTimeout):
+        observer_runner.wait_for(connection_observer, connection_observer_future, timeout=0.5)
+        connection_observer.result()
+    assert connection_observer.done()
+    assert connection_observer_future.done()
+
+
+def test_not_awaited_connection_observer_times_out_in_background(connection_observer,
+                                                                 observer_runner):
+    from moler.exceptions import ConnectionObserverTimeout
+
+    connection_observer.timeout = 0.3
+    connection_observer_future = observer_runner.submit(connection_observer)
+    time.sleep(0.5)  # nobody awaits connection_observer
+    assert connection_observer.done()
+    assert connection_observer_future.done()
+    with pytest.raises(ConnectionObserverTimeout):
+        connection_observer.result()
+    assert connection_observer.all_data_received == []
+
+
+def test_timeout_of_connection_observer_can_be_extended_while_it_runs(connection_observer,
+                                                                      observer_runner):
+    connection_observer.timeout = 0.3
+    observer_runner.submit(connection_observer)
+    connection_observer.extend_timeout(0.4)
+    time.sleep(0.5)
+    assert not connection_observer.done()
+    time.sleep(0.4)
+    assert connection_observer.done()
+    ConnectionObserver.get_unraised_exceptions(True)  # test cleanup
+
+
+def test_cancelled_future_stops_feeding_connection_observer(connection_observer,
+                                                            observer_runner):
+    connection_observer_future = observer_runner.submit(connection_observer)
+    assert connection_observer_future.cancel()
+    time.sleep(0.1)  # let scheduler thread unsubscribe observer
+    connection_observer.connection.data_received("64 bytes from 10.0.2.15: icmp_req=1 ttl=64 time=0.080 ms")
+    assert connection_observer.all_data_received == []
+
+
+def test_runs_many_connection_observers_without_thread_per_observer(observer_runner):
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+    threads_count = threading.active_count()
+    observers = [NetworkDownDetector(connection=moler_conn, runner=observer_runner) for _ in range(2000)]
+    for observer in observers:
+        observer.start(timeout=10)
+    assert threading.active_count() <= threads_count  # threads of previous tests may be still finishing
+    assert all(observer.running() for observer in observers)
+
+    moler_conn.data_received("ping: sendmsg: Network is unreachable")
+    for observer in observers:
+        observer.await_done(timeout=1.0)
+    assert all(observer.done() for observer in observers)
+
+
+def test_shutdown_cancels_running_connection_observers(connection_observer):
+    from moler.runner_single_thread import RunnerSingleThread
+
+    runner = RunnerSingleThread()
+    connection_observer_future = runner.submit(connection_observer)
+    runner.shutdown()
+    assert connection_observer.cancelled()
+    assert connection_observer_future.cancelled()
+
+
+# --------------------------- resources ---------------------------
+
+
+@pytest.yield_fixture()
+def observer_runner():
+    from moler.runner_single_thread import RunnerSingleThread
+    runner = RunnerSingleThread()
+    yield runner
+    runner.shutdown()
+
+
+class NetworkDownDetector(ConnectionObserver):
+    def __init__(self, connection=None, runner=None):
+        super(NetworkDownDetector, self).__init__(connection=connection, runner=runner)
+        self.all_data_received = []
+
+    def data_received(self, data):
+        """
+        Awaiting change like:
+        64 bytes from 10.0.2.15: icmp_req=3 ttl=64 time=0.045 ms
+        ping: sendmsg: Network is unreachable
+        """
+        self.all_data_received.append(data)
+        if not self.done():
+            if "Network is unreachable" in data:
+                when_detected = time.time()
+                self.set_result(result=when_detected)
+
+
+@pytest.fixture()
+def connection_observer(observer_runner):
+    from moler.connection import ObservableConnection
+    moler_conn = ObservableConnection()
+    observer = NetworkDownDetector(connection=moler_conn, runner=observer_runner)
+    return observer
+
+
+@pytest.fixture()
+def observer_and_awaited_data(connection_observer):
+    awaited_data = 'ping: sendmsg: Network is unreachable'
+    return connection_observer, awaited_data
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Testing pool of shells spawned in advance for terminal connections
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import platform
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(platform.system() != 'Linux', reason="terminal connection works on Linux only")
+
+
+def test_terminal_takes_shell_spawned_in_advance(shell_pool):
+    from moler.connection import ObservableConnection
+    from moler.io.raw.terminal import ThreadedTerminal
+
+    assert await_condition(lambda: len(shell_pool) == 2)
+    prespawned_pids = idle_shells_pids(shell_pool)
+    with ThreadedTerminal(moler_connection=ObservableConnection(), first_prompt=r'moler_bash#') as terminal:
+        assert terminal._terminal.pid in prespawned_pids
+
+
+def test_pool_spawns_replacement_of_taken_shell(shell_pool):
+    from moler.io.raw.terminal import ThreadedTerminal
+
+    assert await_condition(lambda: len(shell_pool) == 2)
+    shell = shell_pool.take(cmd=ThreadedTerminal.default_cmd(), dimensions=(100, 300))
+    assert len(shell_pool) == 1
+    assert await_condition(lambda: len(shell_pool) == 2)
+    assert shell.pid not in idle_shells_pids(shell_pool)
+    shell.close(force=True)
+
+
+def test_shell_of_closed_terminal_is_not_given_back_to_pool(shell_pool):
+    from moler.connection import ObservableConnection
+    from moler.io.raw.terminal import ThreadedTerminal
+
+    assert await_condition(lambda: len(shell_pool) == 2)
+    with ThreadedTerminal(moler_connection=ObservableConnection(), first_prompt=r'moler_bash#') as terminal:
+        used_shell = terminal._terminal
+    assert await_condition(lambda: len(shell_pool) == 2)
+    assert not used_shell.isalive()
+    assert used_shell.pid not in idle_shells_pids(shell_pool)
+
+
+def test_dead_shell_is_not_taken_from_pool(shell_pool):
+    from moler.io.raw.terminal import ThreadedTerminal
+
+    assert await_condition(lambda: len(shell_pool) == 2)
+    for shells in shell_pool._idle_shells.values():
+        for shell in shells:
+            shell.close(force=True)  # like shell killed by OOM killer
+    assert shell_pool.take(cmd=ThreadedTerminal.default_cmd(), dimensions=(100, 300)) is None
+
+
+def test_terminal_spawns_own_shell_when_pool_is_disabled():
+    from moler.connection import ObservableConnection
+    from moler.io.raw import shell_pool
+    from moler.io.raw.terminal import ThreadedTerminal
+
+    assert not shell_pool.is_shell_pool_enabled()
+    with ThreadedTerminal(moler_connection=ObservableConnection(), first_prompt=r'moler_bash#') as terminal:
+        assert terminal._terminal.isalive()
+
+
+@pytest.mark.parametrize("pool_size", [0, 2])
+def test_device_creation_latency(pool_size):
+    from moler.connection import ObservableConnection
+    from moler.device.unixlocal import UnixLocal
+    from moler.io.raw import shell_pool
+    from moler.io.raw.terminal import ThreadedTerminal
+
+    if pool_size:
+        shell_pool.enable_shell_pool(size=pool_size)
+        assert await_condition(lambda: len(shell_pool.get_shell_pool()) == pool_size)
+    devices_count = 5
+    latencies = []
+    try:
+        for _ in range(devices_count):
+            start_time = time.time()
+            terminal = ThreadedTerminal(moler_connection=ObservableConnection(), first_prompt=r'moler_bash#')
+            device = UnixLocal(io_connection=terminal)
+            latencies.append(time.time() - start_time)
+            assert device.current_state == UnixLocal.unix_local
+            terminal.close()
+            time.sleep(0.1)  # like test doing something with device - pool has time to spawn replacement
+    finally:
+        shell_pool.disable_shell_pool()
+
+    print("pool size {}: device creation {:.4f} sec (average)".format(pool_size, sum(latencies) / devices_count))
+
+
+# --------------------------- resources ---------------------------
+
+
+def await_condition(condition, timeout=5):
+    give_up_time = time.time() + timeout
+    while not condition():
+        if time.time() > give_up_time:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def idle_shells_pids(pool):
+    return [shell.pid for shells in pool._idle_shells.values() for shell in shells]
+
+
+@pytest.yield_fixture()
+def shell_pool():
+    from moler.io.raw import shell_pool
+    shell_pool.enable_shell_pool(size=2)
+    yield shell_pool.get_shell_pool()
+    shell_pool.disable_shell_pool()
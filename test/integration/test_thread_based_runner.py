@@ -10,6 +10,7 @@ __author__ = 'Grzegorz Latuszek'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'grzegorz.latuszek@nokia.com'
 
+import os
 import threading
 import time
 
@@ -75,9 +76,8 @@ def test_CancellableFuture_can_be_cancelled_while_it_is_running(observer_runner)
     try:
         is_started.wait(timeout=0.5)
         assert is_started.is_set()
-        cancelled = c_future.cancel()
-        time.sleep(0.1)  # allow threads switch
-        assert is_done.is_set()
+        cancelled = c_future.cancel()  # doesn't block - thread finishes asynchronously
+        assert is_done.wait(timeout=0.5)
         assert cancelled is True
         assert c_future.cancelled()
         assert c_future.done()
@@ -146,6 +146,151 @@ def test_gets_all_data_of_connection_after_it_is_started(observer_runner):
         assert net_down_detector.all_data_received == ["61 bytes", "62 bytes", "ping: Network is unreachable"]
 
 
+def test_wait_for_returns_as_soon_as_connection_observer_is_done(connection_observer,
+                                                                 observer_runner):
+    connection_observer_future = observer_runner.submit(connection_observer)
+    result_set_time = []
+
+    def set_result():
+        time.sleep(0.2)
+        result_set_time.append(time.time())
+        connection_observer.set_result("done")
+
+    ext_io = threading.Thread(target=set_result)
+    try:
+        ext_io.start()
+        observer_runner.wait_for(connection_observer, connection_observer_future, timeout=2.0)
+        wake_up_latency = time.time() - result_set_time[0]
+        assert connection_observer.result() == "done"
+        assert wake_up_latency < 0.05
+    finally:  # test cleanup
+        ext_io.join()
+        connection_observer_future.cancel()
+
+
+def test_many_running_connection_observers_do_not_consume_cpu_while_idle():
+    from moler.connection import ObservableConnection
+    from moler.runner import ThreadPoolExecutorRunner
+
+    observers_count = 1000
+    runner = ThreadPoolExecutorRunner(max_workers=observers_count)
+    moler_conn = ObservableConnection()
+    observers = [NetworkDownDetector(connection=moler_conn, runner=runner) for _ in range(observers_count)]
+    try:
+        for observer in observers:
+            observer.start(timeout=10)
+
+        cpu_start = sum(os.times()[:2])
+        time.sleep(1.0)  # all observers are running, no data comes from connection
+        idle_cpu_time = sum(os.times()[:2]) - cpu_start
+
+        start_time = time.time()
+        moler_conn.data_received("ping: sendmsg: Network is unreachable")
+        for observer in observers:
+            observer.await_done()
+        completion_time = time.time() - start_time
+
+        assert all(observer.done() for observer in observers)
+        assert idle_cpu_time < 0.5  # 10ms polling of each of 1000 observers burns whole cpu
+        assert completion_time < 3.0  # mostly logging of 1000 observers - not awaiting them
+    finally:  # test cleanup
+        runner.shutdown()
+
+
+def test_not_awaited_connection_observer_times_out_in_background(connection_observer,
+                                                                 observer_runner):
+    from moler.exceptions import ConnectionObserverTimeout
+
+    connection_observer.runner = observer_runner
+    connection_observer.start(timeout=0.3)
+    time.sleep(0.5)  # nobody awaits observer
+    assert connection_observer.done()
+    assert connection_observer.connection._observers == {}  # unsubscribed
+    with pytest.raises(ConnectionObserverTimeout):
+        connection_observer.result()
+
+
+def test_extended_timeout_of_not_awaited_connection_observer_is_respected(connection_observer,
+                                                                          observer_runner):
+    connection_observer.runner = observer_runner
+    connection_observer.start(timeout=0.3)
+    time.sleep(0.2)
+    connection_observer.extend_timeout(0.3)
+    time.sleep(0.3)
+    assert not connection_observer.done()
+    time.sleep(0.2)
+    assert connection_observer.done()
+
+
+def test_many_not_awaited_connection_observers_time_out_independently():
+    from moler.connection import ObservableConnection
+    from moler.runner import ThreadPoolExecutorRunner
+
+    observers_count = 1000
+    runner = ThreadPoolExecutorRunner(max_workers=observers_count)
+    moler_conn = ObservableConnection()
+    observers = [NetworkDownDetector(connection=moler_conn, runner=runner) for _ in range(observers_count)]
+    try:
+        for observer in observers:
+            observer.start(timeout=0.5)
+        time.sleep(1.5)
+        assert all(observer.done() for observer in observers)
+        assert moler_conn._observers == {}
+    finally:  # test cleanup
+        runner.shutdown()
+
+
+def test_can_submit_many_connection_observers_at_once():
+    from moler.connection import ObservableConnection
+    from moler.runner import ThreadPoolExecutorRunner
+
+    observers_count = 100
+    observer_runner = ThreadPoolExecutorRunner(max_workers=observers_count)  # each running observer takes worker
+    moler_conn = ObservableConnection()
+    observers = [NetworkDownDetector(connection=moler_conn, runner=observer_runner) for _ in range(observers_count)]
+    connection_observer_futures = observer_runner.submit_many(observers)
+    try:
+        assert len(connection_observer_futures) == len(observers)
+        assert all(future.running() for future in connection_observer_futures)
+        moler_conn.data_received("ping: sendmsg: Network is unreachable")  # all are already subscribed
+        for observer, future in zip(observers, connection_observer_futures):
+            observer_runner.wait_for(observer, future, timeout=1.0)
+        assert all(observer.done() for observer in observers)
+    finally:  # test cleanup
+        for future in connection_observer_futures:
+            future.cancel()
+        observer_runner.shutdown()
+
+
+def test_cancelled_connection_observer_is_unsubscribed_at_once(connection_observer, observer_runner):
+    connection_observer_future = observer_runner.submit(connection_observer)
+    connection_observer.cancel()
+    assert connection_observer.connection._observers == {}
+    assert connection_observer_future.exception(timeout=0.5) is not None  # feeding thread exits by itself
+
+
+def test_cancelling_many_running_connection_observers_does_not_block():
+    from moler.connection import ObservableConnection
+    from moler.runner import ThreadPoolExecutorRunner
+
+    observers_count = 1000
+    runner = ThreadPoolExecutorRunner(max_workers=observers_count)
+    moler_conn = ObservableConnection()
+    observers = [NetworkDownDetector(connection=moler_conn, runner=runner) for _ in range(observers_count)]
+    try:
+        connection_observer_futures = runner.submit_many(observers)
+        start_time = time.time()
+        for future in connection_observer_futures:
+            future.cancel()
+        cancel_time = time.time() - start_time
+
+        assert all(future.cancelled() for future in connection_observer_futures)
+        assert moler_conn._observers == {}
+        assert cancel_time / observers_count < 0.002  # caller doesn't await feeding threads (it was up to 0.5 sec each)
+    finally:  # test cleanup
+        runner.shutdown()
+
+
 # TODO: tests for error cases
 
 
@@ -5,7 +5,12 @@ __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'grzegorz.latuszek@nokia.com'
 
 import binascii
+import functools
 import gc
+import logging
+import os
+import sys
+import time
 
 import pytest
 
@@ -54,6 +59,63 @@ def test_not_attaching_external_outgoing_io_raises_exception_at_send_trial():
     assert "or later via attribute direct set: connection.how2send = external_io_send" in str(err.value)
 
 
+def test_send_encodes_data_once():
+    from moler.connection import Connection
+
+    sent_data = []
+    encoded_data = []
+
+    def encoder(data):
+        encoded_data.append(data)
+        return data.encode("utf-8")
+
+    moler_conn = Connection(how2send=sent_data.append, encoder=encoder)
+    moler_conn.send(data="outgoing data")
+    assert sent_data == [b"outgoing data"]
+    assert encoded_data == ["outgoing data"]
+
+
+def test_data_sent_inside_batch_is_written_by_single_write():
+    from moler.connection import Connection
+
+    sent_data = []
+    moler_conn = Connection(how2send=sent_data.append)
+    with moler_conn.batch():
+        for nb in range(3):
+            moler_conn.sendline("line {}".format(nb))
+        with moler_conn.batch():  # nested batch is part of outer one
+            moler_conn.sendline("line 3")
+        assert sent_data == []
+    assert sent_data == ["line 0\r\nline 1\r\nline 2\r\nline 3\r\n"]
+
+    moler_conn.send("data")
+    assert sent_data[-1] == "data"  # out of batch data is written at once
+
+
+def test_data_sent_within_coalescing_delay_is_written_together():
+    from moler.connection import Connection
+
+    import threading
+
+    sent_data = []
+    data_written = threading.Event()
+
+    def how2send(data):
+        sent_data.append(data)
+        data_written.set()
+
+    moler_conn = Connection(how2send=how2send, write_coalescing_delay=0.5)
+    moler_conn.send("data 1")
+    moler_conn.send("data 2")
+    assert sent_data == []
+    assert data_written.wait(timeout=5)
+    assert sent_data == ["data 1data 2"]
+
+    moler_conn.send("data 3")
+    moler_conn.flush()  # no need to await delay
+    assert sent_data == ["data 1data 2", "data 3"]
+
+
 def test_can_get_incomming_data_from_external_io():
     """Shows how external-IO should use Moler's connection for incoming data"""
     from moler.connection import Connection
@@ -484,6 +546,821 @@ def test_garbage_collected_subscriber_is_not_notified():
     moler_conn.data_received("data")
     assert len(received_data) == 1
 
+
+def test_observer_subscribed_during_notification_gets_next_data():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+    received_data = []
+
+    def late_observer(data):
+        received_data.append(("late", data))
+
+    def subscribing_observer(data):
+        received_data.append(("subscribing", data))
+        moler_conn.subscribe(late_observer)
+
+    moler_conn.subscribe(subscribing_observer)
+    moler_conn.data_received("data 1")
+    moler_conn.data_received("data 2")
+
+    assert ("late", "data 1") not in received_data  # notification works on subscribers snapshot
+    assert ("late", "data 2") in received_data
+
+
+def test_notification_doesnt_copy_subscribers():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+
+    def observer(data):
+        pass
+
+    moler_conn.subscribe(observer)
+    subscribers_snapshot = moler_conn._observers_snapshot
+    moler_conn.data_received("data")
+    assert moler_conn._observers_snapshot is subscribers_snapshot  # rebuilt only by subscribe/unsubscribe
+    moler_conn.unsubscribe(observer)
+    assert moler_conn._observers_snapshot == tuple()
+
+
+@pytest.mark.parametrize("subscribers_count", [1, 10, 50])
+def test_each_subscriber_gets_every_chunk_of_data(subscribers_count):
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(logger_name=None)
+
+    class Subscriber(object):
+        def __init__(self):
+            self.received_count = 0
+
+        def on_new_data(self, data):
+            self.received_count += 1
+
+    subscribers = [Subscriber() for _ in range(subscribers_count)]
+    for subscriber in subscribers:
+        moler_conn.subscribe(subscriber.on_new_data)
+
+    chunks_count = 2000
+    for _ in range(chunks_count):
+        moler_conn.data_received("chunk of data")
+
+    assert [subscriber.received_count for subscriber in subscribers] == [chunks_count] * subscribers_count
+
+
+@pytest.mark.skipif(not os.environ.get('MOLER_BENCHMARKS'), reason="benchmark - set MOLER_BENCHMARKS=1 to run it")
+@pytest.mark.parametrize("subscribers_count", [1, 10, 50])
+def test_notification_throughput_versus_subscribers_count(subscribers_count):
+    """Benchmark (no assertions on timing): run with MOLER_BENCHMARKS=1 pytest -s to see chunks/sec"""
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(logger_name=None)  # measure dispatching, not logging
+
+    class Subscriber(object):
+        def on_new_data(self, data):
+            pass
+
+    subscribers = [Subscriber() for _ in range(subscribers_count)]
+    for subscriber in subscribers:
+        moler_conn.subscribe(subscriber.on_new_data)
+
+    chunks_count = 20000
+    start_time = time.time()
+    for _ in range(chunks_count):
+        moler_conn.data_received("chunk of data")
+    duration = max(time.time() - start_time, 1e-6)
+
+    print("{} subscribers: {:.0f} chunks/sec".format(subscribers_count, chunks_count / duration))
+
+
+def test_logging_decisions_follow_logger_level_changes():
+    from moler.connection import ObservableConnection
+    from moler.config.loggers import TRACE
+
+    moler_conn = ObservableConnection(name="cached_levels")
+    logged_messages = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            logged_messages.append(record.getMessage())
+
+    handler = ListHandler()
+    moler_conn.logger.addHandler(handler)
+    try:
+        moler_conn.subscribe(lambda_like_observer)
+        moler_conn.logger.setLevel(logging.INFO)
+        moler_conn.data_received("data 1")
+        assert not [msg for msg in logged_messages if "notifying" in msg]
+
+        moler_conn.logger.setLevel(TRACE)
+        moler_conn.data_received("data 2")
+        assert [msg for msg in logged_messages if ("notifying" in msg) and ("data 2" in msg)]
+    finally:  # test cleanup
+        moler_conn.logger.removeHandler(handler)
+        moler_conn.logger.setLevel(logging.NOTSET)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 9), reason="tracemalloc.reset_peak() requires Python 3.9+")
+def test_dispatch_path_doesnt_allocate_when_only_info_logging_is_on():
+    import tracemalloc
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(name="allocation_free")
+    moler_conn.logger.setLevel(logging.INFO)
+    for _ in range(50):
+        moler_conn.subscribe(Observer().on_new_data)
+    big_chunk = "x" * 10000  # formatting TRACE messages would allocate its repr per subscriber
+    moler_conn.notify_observers(big_chunk)  # warm up caches
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        memory_before, _ = tracemalloc.get_traced_memory()
+        for _ in range(100):
+            moler_conn.notify_observers(big_chunk)
+        memory_after, peak_memory = tracemalloc.get_traced_memory()
+    finally:  # test cleanup
+        tracemalloc.stop()
+        moler_conn.logger.setLevel(logging.NOTSET)
+    assert memory_after - memory_before < 1000
+    assert peak_memory - memory_before < 1000  # not even temporary allocations of chunk size
+
+
+def test_cached_logging_decisions_are_dropped_when_logging_configuration_changes():
+    from moler.connection import ObservableConnection
+    from moler.config.loggers import TRACE, logging_config_changed
+
+    moler_conn = ObservableConnection(name="cached_config")
+    parent_logger = logging.getLogger("moler.connection")
+    parent_level = parent_logger.level
+    try:
+        parent_logger.setLevel(logging.INFO)
+        logging_config_changed()
+        assert not moler_conn._logger_levels.is_enabled_for(moler_conn.logger, TRACE)
+
+        parent_logger.setLevel(TRACE)  # level of connection's logger is inherited from parent
+        logging_config_changed()
+        assert moler_conn._logger_levels.is_enabled_for(moler_conn.logger, TRACE)
+
+        logging.disable(logging.CRITICAL)  # followed without logging_config_changed()
+        assert not moler_conn._logger_levels.is_enabled_for(moler_conn.logger, TRACE)
+    finally:  # test cleanup
+        logging.disable(logging.NOTSET)
+        parent_logger.setLevel(parent_level)
+        logging_config_changed()
+
+
+@pytest.mark.skipif(sys.version_info < (3, 9), reason="tracemalloc.reset_peak() requires Python 3.9+")
+def test_receiving_path_doesnt_allocate_when_data_logging_is_off():
+    import tracemalloc
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(name="allocation_free_receiving", recent_data_max_size=0)
+    moler_conn.logger.setLevel(logging.INFO)
+    moler_conn.data_logger.setLevel(logging.WARNING)  # no RAW_DATA nor INFO logs of data
+    for _ in range(50):
+        moler_conn.subscribe(Observer().on_new_data)
+    big_chunk = "x" * 10000
+    moler_conn.data_received(big_chunk)  # warm up caches
+
+    allocations = []
+    tracemalloc.start()
+    try:
+        for _ in range(3):  # threads left by other tests may allocate meanwhile - take least disturbed measurement
+            tracemalloc.reset_peak()
+            memory_before, _ = tracemalloc.get_traced_memory()
+            for _ in range(100):
+                moler_conn.data_received(big_chunk)
+            memory_after, peak_memory = tracemalloc.get_traced_memory()
+            allocations.append((peak_memory - memory_before, memory_after - memory_before))
+    finally:  # test cleanup
+        tracemalloc.stop()
+        moler_conn.logger.setLevel(logging.NOTSET)
+        moler_conn.data_logger.setLevel(logging.NOTSET)
+    peak_allocation, kept_allocation = min(allocations)
+    assert kept_allocation < 1000
+    assert peak_allocation < 1000  # not even temporary allocations of chunk size
+
+
+def lambda_like_observer(data):
+    pass
+
+
+class Observer(object):
+    observers = []  # keep them alive - connection holds weak references
+
+    def __init__(self):
+        Observer.observers.append(self)
+
+    def on_new_data(self, data):
+        pass
+
+
+def test_observer_subscribed_for_lines_gets_data_split_into_lines():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+    received_lines = []
+
+    def lines_observer(lines):
+        received_lines.append(lines)
+
+    moler_conn.subscribe(lines_observer, lines=True)
+    moler_conn.data_received("line 1\nline")
+    moler_conn.data_received(" 2\r\n")
+
+    assert received_lines == [(("line 1", True), ("line", False)),
+                              ((" 2", True),)]  # partial lines are stitched by observer (it knows when it started)
+
+
+def test_data_is_split_into_lines_once_for_all_observers_subscribed_for_lines(monkeypatch):
+    import moler.connection
+    from moler.connection import ObservableConnection
+
+    split_calls = []
+    original_split_into_lines = moler.connection.split_into_lines
+
+    def counting_split_into_lines(data, newline_chars):
+        split_calls.append(data)
+        return original_split_into_lines(data, newline_chars)
+
+    monkeypatch.setattr(moler.connection, "split_into_lines", counting_split_into_lines)
+    moler_conn = ObservableConnection()
+    received_lines = []
+    observers = [functools.partial(received_lines.append) for _ in range(10)]
+    for observer in observers:
+        moler_conn.subscribe(observer, lines=True)
+
+    moler_conn.data_received("line 1\nline 2\n")
+
+    assert split_calls == ["line 1\nline 2\n"]
+    assert len(received_lines) == 10
+    assert all(lines is received_lines[0] for lines in received_lines)
+
+
+def test_observer_subscribed_for_raw_data_gets_not_decoded_data():
+    from moler.connection import ObservableConnection, IncrementalDecoder
+
+    moler_conn = ObservableConnection(decoder=IncrementalDecoder("utf-8"))
+    raw_data = []
+    decoded_data = []
+
+    def raw_observer(data):
+        raw_data.append(data)
+
+    def observer(data):
+        decoded_data.append(data)
+
+    moler_conn.subscribe(raw_observer, raw=True)
+    moler_conn.subscribe(observer)
+    moler_conn.data_received(b"\x01\x02 data")
+
+    assert raw_data == [b"\x01\x02 data"]  # no decoding
+    assert decoded_data == ["\x01\x02 data"]
+
+
+def test_only_decoder_sees_memoryview_of_external_io_buffer():
+    from moler.connection import ObservableConnection
+
+    decoder_input = []
+
+    def identity_decoder(data):
+        decoder_input.append(data)
+        return data
+
+    moler_conn = ObservableConnection(decoder=identity_decoder, delivery_queue_size=10)
+    raw_data = []
+    decoded_data = []
+
+    def raw_observer(data):
+        raw_data.append(data)
+
+    def observer(data):
+        decoded_data.append(data)
+
+    def queued_observer(data):
+        pass
+
+    moler_conn.subscribe(raw_observer, raw=True)
+    moler_conn.subscribe(observer)
+    delivery_queue = moler_conn.subscribe(queued_observer, queued=True)
+    reused_buffer = bytearray(b"data 1")
+    moler_conn.data_received(memoryview(reused_buffer))
+    reused_buffer[:] = b"data 2"  # external-IO receives next chunk into same buffer
+
+    assert isinstance(decoder_input[0], memoryview)
+    assert raw_data == [b"data 1"] and isinstance(raw_data[0], bytes)
+    assert decoded_data == [b"data 1"] and isinstance(decoded_data[0], bytes)
+    assert delivery_queue.get_all() == [b"data 1"]
+    past_data = []
+
+    def late_observer(data):
+        past_data.append(data)
+
+    moler_conn.subscribe(late_observer, from_offset=0)
+    assert past_data == [b"data 1"]  # recently received data keeps copy
+
+
+def test_connection_with_raw_observers_only_doesnt_decode_data():
+    from moler.connection import ObservableConnection
+
+    decoded_chunks = []
+
+    def decoder(data):
+        decoded_chunks.append(data)
+        return data.decode("utf-8")
+
+    moler_conn = ObservableConnection(decoder=decoder, recent_data_max_size=0)
+    raw_data = []
+
+    def raw_observer(data):
+        raw_data.append(data)
+
+    moler_conn.subscribe(raw_observer, raw=True)
+    moler_conn.data_received(b"\xff\xfe not utf-8 data")
+    assert raw_data == [b"\xff\xfe not utf-8 data"]
+    assert decoded_chunks == []
+
+
+def test_raw_observer_gets_data_awaited_by_stream_decoder():
+    from moler.connection import ObservableConnection, IncrementalDecoder
+
+    moler_conn = ObservableConnection(decoder=IncrementalDecoder("utf-8"))
+    raw_data = []
+    decoded_data = []
+
+    def raw_observer(data):
+        raw_data.append(data)
+
+    def observer(data):
+        decoded_data.append(data)
+
+    moler_conn.subscribe(raw_observer, raw=True)
+    moler_conn.subscribe(observer)
+    encoded = u"ż".encode("utf-8")
+    moler_conn.data_received(encoded[:1])
+    moler_conn.data_received(encoded[1:])
+
+    assert raw_data == [encoded[:1], encoded[1:]]
+    assert decoded_data == [u"ż"]
+
+
+def test_observer_cant_subscribe_for_raw_lines():
+    from moler.connection import ObservableConnection
+    from moler.exceptions import WrongUsage
+
+    moler_conn = ObservableConnection()
+    with pytest.raises(WrongUsage):
+        moler_conn.subscribe(Observer().on_new_data, lines=True, raw=True)
+
+
+def test_incremental_decoder_decodes_multibyte_character_split_between_chunks():
+    from moler.connection import IncrementalDecoder
+
+    decoder = IncrementalDecoder("utf-8")
+    encoded = u"zażółć".encode("utf-8")
+    assert decoder(encoded[:3]) == u"za"  # 3rd byte is 1st byte of 'ż'
+    assert decoder(encoded[3:]) == u"żółć"
+
+
+def test_stream_decoding_connection_notifies_observers_about_whole_characters_only():
+    from moler.connection import ObservableConnection, IncrementalDecoder
+
+    moler_conn = ObservableConnection(decoder=IncrementalDecoder("utf-8"))
+    received_data = []
+
+    def observer(data):
+        received_data.append(data)
+
+    moler_conn.subscribe(observer)
+    encoded = u"ż\n".encode("utf-8")
+    moler_conn.data_received(encoded[:1])
+    moler_conn.data_received(encoded[1:])
+    assert received_data == [u"ż\n"]  # no notification with empty data
+
+
+def test_reset_decoder_drops_not_completed_character():
+    from moler.connection import ObservableConnection, IncrementalDecoder
+
+    moler_conn = ObservableConnection(decoder=IncrementalDecoder("utf-8"))
+    encoded = u"ż".encode("utf-8")
+    moler_conn.decode(encoded[:1])
+    moler_conn.reset_decoder()
+    assert moler_conn.decode(b"abc") == u"abc"
+
+
+def test_builtin_utf8_connection_decodes_stream_of_bytes():
+    from moler.connection import get_connection
+
+    io_conn = get_connection(io_type='memory', variant='threaded')
+    received_data = []
+
+    def observer(data):
+        received_data.append(data)
+
+    io_conn.moler_connection.subscribe(observer)
+    encoded = u"zażółć".encode("utf-8")
+    for byte_index in range(len(encoded)):
+        io_conn.moler_connection.data_received(encoded[byte_index:byte_index + 1])
+    assert u"".join(received_data) == u"zażółć"
+
+
+def test_subscriber_from_offset_gets_data_received_since_that_offset():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+    received_data = []
+
+    def observer(data):
+        received_data.append(data)
+
+    moler_conn.data_received("old data")
+    offset = moler_conn.received_offset
+    moler_conn.data_received("data 1")
+    moler_conn.data_received("data 2")
+    moler_conn.subscribe(observer, from_offset=offset + 2)
+    moler_conn.data_received("data 3")
+
+    assert received_data == ["ta 1", "data 2", "data 3"]
+
+
+def test_connection_keeps_limited_size_of_recent_data():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(recent_data_max_size=10)
+    received_data = []
+
+    def observer(data):
+        received_data.append(data)
+
+    for chunk in ["0123", "4567", "89ab", "cdef"]:
+        moler_conn.data_received(chunk)
+    moler_conn.subscribe(observer, from_offset=0)  # data since offset 0 is not kept anymore
+
+    assert moler_conn.received_offset == 16
+    assert "".join(received_data) == "89abcdef"
+
+
+def test_connection_keeps_no_recent_data_when_its_max_size_is_zero():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(recent_data_max_size=0)
+    received_data = []
+
+    def observer(data):
+        pass
+
+    def late_observer(data):
+        received_data.append(data)
+
+    moler_conn.subscribe(observer)
+    for _ in range(1000):
+        moler_conn.data_received("0123")
+    moler_conn.subscribe(late_observer, from_offset=0)  # nothing to replay
+
+    assert moler_conn.received_offset == 4000
+    assert len(moler_conn._recent_data) == 0
+    assert received_data == []
+
+
+def test_replay_doesnt_interleave_with_data_received_meanwhile():
+    import threading
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(recent_data_max_size=100000)
+    received_data = []
+
+    def observer(data):
+        received_data.append(data)
+
+    chunks = ["{}\n".format(nb) for nb in range(2000)]
+
+    def inject_data():
+        for chunk in chunks:
+            moler_conn.data_received(chunk)
+
+    ext_io = threading.Thread(target=inject_data)
+    ext_io.start()
+    time.sleep(0.001)
+    moler_conn.subscribe(observer, from_offset=0)
+    ext_io.join()
+
+    assert "".join(received_data) == "".join(chunks)
+
+
+def test_connection_gathers_statistics_of_passing_data_to_observers():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+
+    def fast_observer(data):
+        pass
+
+    def slow_observer(data):
+        time.sleep(0.05)
+
+    moler_conn.subscribe(fast_observer)
+    moler_conn.subscribe(slow_observer, name="slow one")
+    moler_conn.data_received("data 1")
+    moler_conn.data_received("data 22")
+
+    stats = moler_conn.stats()
+    assert stats["fast_observer"]["calls"] == 2
+    assert stats["fast_observer"]["data_size"] == 13
+    assert stats["slow one"]["calls"] == 2
+    assert stats["slow one"]["max_processing_time"] >= 0.05
+    assert stats["slow one"]["processing_time"] >= 0.1
+    assert stats["slow one"]["processing_time"] > stats["fast_observer"]["processing_time"]
+
+
+def test_observers_of_same_name_share_statistics():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+    observers = [Observer() for _ in range(3)]
+    for observer in observers:
+        moler_conn.subscribe(observer.on_new_data)
+    moler_conn.data_received("data")
+    moler_conn.unsubscribe(observers[0].on_new_data)
+    moler_conn.data_received("data")
+
+    assert moler_conn.stats() == {"Observer.on_new_data": {'calls': 5, 'data_size': 20,
+                                                           'processing_time': pytest.approx(0.0, abs=0.1),
+                                                           'max_processing_time': pytest.approx(0.0, abs=0.1),
+                                                           'max_queue_depth': 0, 'dropped_chunks': 0,
+                                                           'coalesced_chunks': 0, 'queue_depth': 0}}
+
+
+def test_connection_logs_observer_exceeding_processing_time_threshold():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(name="slow_observer_conn", slow_observer_threshold=0.02)
+    logged_messages = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            logged_messages.append(record.getMessage())
+
+    def slow_observer(data):
+        time.sleep(0.05)
+
+    def fast_observer(data):
+        pass
+
+    handler = ListHandler(level=logging.WARNING)
+    moler_conn.logger.addHandler(handler)
+    try:
+        moler_conn.subscribe(slow_observer)
+        moler_conn.subscribe(fast_observer)
+        moler_conn.data_received("data")
+    finally:  # test cleanup
+        moler_conn.logger.removeHandler(handler)
+    assert len(logged_messages) == 1
+    assert "slow observer slow_observer" in logged_messages[0]
+
+
+def test_runner_names_statistics_by_class_of_observer():
+    from moler.connection import ObservableConnection
+    from moler.events.textualevent import TextualEvent
+
+    class LineEvent(TextualEvent):
+        def on_new_line(self, line, is_full_line):
+            if is_full_line:
+                self.set_result(line)
+
+    moler_conn = ObservableConnection()
+    event = LineEvent(connection=moler_conn)
+    event.detect_pattern = "line"
+    event.start()
+    moler_conn.data_received("line 1\n")
+    event.await_done(timeout=1)
+
+    assert moler_conn.stats()["{}.LineEvent".format(__name__)]["calls"] == 1
+
+
+def test_connection_puts_data_into_queue_of_queued_observer():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(delivery_queue_size=10)
+    received_data = []
+
+    def observer(data):
+        received_data.append(data)
+
+    delivery_queue = moler_conn.subscribe(observer, queued=True)
+    moler_conn.data_received("data 1")
+    moler_conn.data_received("data 2")
+
+    assert received_data == []  # connection doesn't call queued observer
+    assert moler_conn.stats()["observer"]["queue_depth"] == 2
+    assert delivery_queue.get_all(timeout=0.1) == ["data 1", "data 2"]
+    assert delivery_queue.get_all(timeout=0.1) == []
+
+
+def test_calls_of_queued_observer_are_accounted_in_connection_statistics():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(delivery_queue_size=10)
+    received_lines = []
+
+    def observer(lines):
+        received_lines.extend(lines)
+
+    delivery_queue = moler_conn.subscribe(observer, lines=True, queued=True)
+    moler_conn.data_received("line 1\nline")
+    moler_conn.data_received(" 2\n")
+    for lines in delivery_queue.get_all():
+        delivery_queue.deliver(observer, lines)
+
+    assert received_lines == [("line 1", True), ("line", False), (" 2", True)]
+    stats = moler_conn.stats()["observer"]
+    assert stats["calls"] == 2
+    assert stats["data_size"] == len("line 1" + "line" + " 2")
+    assert stats["processing_time"] >= stats["max_processing_time"] > 0.0
+
+
+def test_observer_is_called_directly_when_connection_has_no_delivery_queues():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection()
+    received_data = []
+
+    def observer(data):
+        received_data.append(data)
+
+    assert moler_conn.subscribe(observer, queued=True) is None
+    moler_conn.data_received("data 1")
+    assert received_data == ["data 1"]
+
+
+@pytest.mark.parametrize("overflow, expected_chunks, dropped, coalesced", [
+    ("drop_oldest", ["data 2", "data 3"], 1, 0),
+    ("coalesce", ["data 1", "data 2data 3"], 0, 1),
+])
+def test_full_delivery_queue_applies_overflow_policy(overflow, expected_chunks, dropped, coalesced):
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(delivery_queue_size=2, delivery_overflow=overflow)
+
+    def observer(data):
+        pass
+
+    delivery_queue = moler_conn.subscribe(observer, queued=True)
+    for chunk in ["data 1", "data 2", "data 3"]:
+        moler_conn.data_received(chunk)
+
+    assert delivery_queue.get_all() == expected_chunks
+    stats = moler_conn.stats()["observer"]
+    assert stats["max_queue_depth"] == 2
+    assert stats["dropped_chunks"] == dropped
+    assert stats["coalesced_chunks"] == coalesced
+
+
+def test_full_delivery_queue_blocks_connection_till_observer_takes_data():
+    import threading
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(delivery_queue_size=1, delivery_overflow="block")
+
+    def observer(data):
+        pass
+
+    delivery_queue = moler_conn.subscribe(observer, queued=True)
+    moler_conn.data_received("data 1")
+
+    ext_io = threading.Thread(target=moler_conn.data_received, args=("data 2",))
+    ext_io.start()
+    ext_io.join(timeout=0.1)
+    assert ext_io.is_alive()  # blocked by full queue
+
+    assert delivery_queue.get_all() == ["data 1"]
+    ext_io.join(timeout=1)
+    assert not ext_io.is_alive()
+    assert delivery_queue.get_all() == ["data 2"]
+
+
+def test_connection_blocked_by_full_delivery_queue_is_not_locked():
+    import threading
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(delivery_queue_size=1, delivery_overflow="block")
+    late_observer_data = []
+
+    def observer(data):
+        pass
+
+    def late_observer(data):
+        late_observer_data.append(data)
+
+    delivery_queue = moler_conn.subscribe(observer, queued=True)
+    moler_conn.data_received("data 1")
+    ext_io = threading.Thread(target=moler_conn.data_received, args=("data 2",))
+    ext_io.start()
+    ext_io.join(timeout=0.1)
+    assert ext_io.is_alive()  # blocked by full queue
+
+    subscribing = threading.Thread(target=moler_conn.subscribe, args=(late_observer,), kwargs={'from_offset': 0})
+    subscribing.start()
+    subscribing.join(timeout=1)
+    assert not subscribing.is_alive()  # replay of recent data needs lock of received data
+    assert late_observer_data == ["data 1", "data 2"]
+
+    assert delivery_queue.get_all() == ["data 1"]
+    ext_io.join(timeout=1)
+    assert delivery_queue.get_all() == ["data 2"]
+
+
+def test_delivery_queue_keeps_copy_of_memoryview_data():
+    from moler.connection import DeliveryQueue
+
+    delivery_queue = DeliveryQueue(max_size=1, overflow=DeliveryQueue.COALESCE)
+    reused_buffer = bytearray(b"abc")
+    delivery_queue.put(memoryview(reused_buffer))
+    reused_buffer[:] = b"def"
+    delivery_queue.put(memoryview(reused_buffer))  # coalesced
+    reused_buffer[:] = b"xyz"
+
+    assert delivery_queue.get_all() == [b"abcdef"]
+
+
+def test_runner_feeds_observer_via_delivery_queue_only_when_observer_asks_for_it():
+    from moler.connection import ObservableConnection
+    from moler.events.textualevent import TextualEvent
+
+    class LineEvent(TextualEvent):
+        def on_new_line(self, line, is_full_line):
+            if is_full_line:
+                self.set_result(line)
+
+    moler_conn = ObservableConnection(delivery_queue_size=100)
+    direct_event = LineEvent(connection=moler_conn)
+    queued_event = LineEvent(connection=moler_conn)
+    direct_event.detect_pattern = queued_event.detect_pattern = "line"
+    queued_event.queued_delivery = True
+    direct_event.start()
+    queued_event.start()
+
+    delivery_queues = [delivery_queue for _, _, _, _, delivery_queue in moler_conn._observers_snapshot]
+    assert len(delivery_queues) == 2
+    assert len([delivery_queue for delivery_queue in delivery_queues if delivery_queue is not None]) == 1
+
+    moler_conn.data_received("line\n")
+    assert direct_event.await_done(timeout=1) == "line"
+    assert queued_event.await_done(timeout=1) == "line"
+
+
+def test_unsubscribe_closes_delivery_queue():
+    from moler.connection import ObservableConnection
+
+    moler_conn = ObservableConnection(delivery_queue_size=10)
+
+    def observer(data):
+        pass
+
+    delivery_queue = moler_conn.subscribe(observer, queued=True)
+    moler_conn.data_received("data 1")
+    moler_conn.unsubscribe(observer)
+
+    start_time = time.time()
+    assert delivery_queue.get_all(timeout=1) == []
+    assert time.time() - start_time < 0.5  # closed queue doesn't await data
+
+
+def test_slow_queued_observer_doesnt_block_other_observers():
+    import threading
+    from moler.connection import ObservableConnection
+    from moler.events.textualevent import TextualEvent
+
+    slow_event_may_go = threading.Event()
+
+    class SlowEvent(TextualEvent):
+        def on_new_line(self, line, is_full_line):
+            slow_event_may_go.wait(timeout=2)
+            if is_full_line and line == "last line":
+                self.set_result(line)
+
+    moler_conn = ObservableConnection(delivery_queue_size=100)
+    fast_observer_data = []
+
+    def fast_observer(data):
+        fast_observer_data.append(data)
+
+    moler_conn.subscribe(fast_observer)
+    event = SlowEvent(connection=moler_conn)  # default runner - ThreadPoolExecutorRunner
+    event.detect_pattern = "last line"
+    event.queued_delivery = True
+    event.start()
+
+    for nb in range(10):
+        moler_conn.data_received("line {}\n".format(nb))
+    moler_conn.data_received("last line\n")
+    assert len(fast_observer_data) == 11
+    assert not event.done()  # its data awaits in queue - feeding didn't wait for slow event
+
+    slow_event_may_go.set()
+    assert event.await_done(timeout=2) == "last line"
+
+
 # --------------------------- resources ---------------------------
 
 
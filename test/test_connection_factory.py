@@ -7,6 +7,8 @@ __author__ = 'Grzegorz Latuszek'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'grzegorz.latuszek@nokia.com'
 
+import sys
+
 import pytest
 
 
@@ -29,6 +31,16 @@ def test_factory_has_buildin_constructors_active_by_default():
     assert conn.__class__.__name__ == 'ThreadedTcp'
 
 
+@pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio connections require Python 3.5+")
+def test_factory_has_buildin_asyncio_constructors_active_by_default():
+    from moler.connection import get_connection
+
+    conn = get_connection(io_type='tcp', variant='asyncio', host='localhost', port=2345)
+    assert conn.__module__ == 'moler.io.asyncio.tcp'
+    assert conn.__class__.__name__ == 'AsyncioTcp'
+    assert conn.moler_connection.how2send == conn.send
+
+
 def test_returned_connections_have_moler_integrated_connection(builtin_variant,
                                                                builtin_io_type_example):
     from moler.connection import get_connection
@@ -403,6 +403,144 @@ def test_connection_observer_one_exception():
     none_exceptions = ConnectionObserver.get_unraised_exceptions(True)
     assert 0 == len(none_exceptions)
 
+
+def test_done_callback_is_called_when_connection_observer_becomes_done(do_nothing_connection_observer__for_major_base_class):
+    connection_observer = do_nothing_connection_observer__for_major_base_class
+    notified = []
+    connection_observer.add_done_callback(notified.append)
+    assert notified == []
+
+    connection_observer.set_result(14361)
+    assert notified == [connection_observer]
+
+
+def test_done_callback_is_called_on_exception_and_on_cancel(do_nothing_connection_observer_class__for_major_base_class):
+    connection_observer_class = do_nothing_connection_observer_class__for_major_base_class
+    failing_observer = connection_observer_class()
+    cancelled_observer = connection_observer_class()
+    notified = []
+    failing_observer.add_done_callback(notified.append)
+    cancelled_observer.add_done_callback(notified.append)
+
+    failing_observer.set_exception(ValueError("Fail inside observer"))
+    cancelled_observer.cancel()
+    assert notified == [failing_observer, cancelled_observer]
+    ConnectionObserver.get_unraised_exceptions(True)  # test cleanup
+
+
+def test_done_callback_added_to_done_connection_observer_is_called_immediately(do_nothing_connection_observer__for_major_base_class):
+    connection_observer = do_nothing_connection_observer__for_major_base_class
+    connection_observer.set_result(14361)
+    notified = []
+    connection_observer.add_done_callback(notified.append)
+    assert notified == [connection_observer]
+
+
+def test_removed_done_callback_is_not_called(do_nothing_connection_observer__for_major_base_class):
+    connection_observer = do_nothing_connection_observer__for_major_base_class
+    notified = []
+    connection_observer.add_done_callback(notified.append)
+    connection_observer.remove_done_callback(notified.append)
+    connection_observer.set_result(14361)
+    assert notified == []
+
+
+def test_awaiting_connection_observer_requires_runner_supporting_it(do_nothing_connection_observer__for_major_base_class,
+                                                                    connection_to_remote):
+    from moler.exceptions import WrongUsage
+    connection_observer = do_nothing_connection_observer__for_major_base_class
+    connection_observer.connection = connection_to_remote.moler_connection
+    connection_observer.start()
+    try:
+        with pytest.raises(WrongUsage):
+            connection_observer.__await__()
+    finally:  # test cleanup
+        connection_observer.cancel()
+
+
+def test_connection_observers_created_without_runner_share_default_runner(do_nothing_connection_observer_class__for_major_base_class):
+    from moler.runner import get_default_runner
+    connection_observer_class = do_nothing_connection_observer_class__for_major_base_class
+
+    observer1 = connection_observer_class()
+    observer2 = connection_observer_class()
+    assert observer1.runner is observer2.runner
+    assert observer1.runner is get_default_runner()
+
+
+def test_creating_connection_observers_does_not_create_threads(do_nothing_connection_observer_class__for_major_base_class):
+    import threading
+    connection_observer_class = do_nothing_connection_observer_class__for_major_base_class
+    first_observer = connection_observer_class()
+    threads_count = threading.active_count()
+
+    observers = [connection_observer_class() for _ in range(1000)]
+
+    assert threading.active_count() == threads_count
+    assert all(observer.runner is first_observer.runner for observer in observers)
+
+
+def test_default_runner_can_be_exchanged(do_nothing_connection_observer_class__for_major_base_class):
+    from moler.runner import ThreadPoolExecutorRunner, set_default_runner, get_default_runner
+    connection_observer_class = do_nothing_connection_observer_class__for_major_base_class
+    observer_of_previous_runner = connection_observer_class()
+    previous_runner = observer_of_previous_runner.runner
+
+    my_runner = ThreadPoolExecutorRunner()
+    set_default_runner(my_runner)
+    try:
+        assert get_default_runner() is my_runner
+        assert connection_observer_class().runner is my_runner
+        assert observer_of_previous_runner.runner is previous_runner
+    finally:  # test cleanup
+        set_default_runner(None)
+        my_runner.shutdown()
+    assert get_default_runner() is not my_runner
+
+
+def test_lazily_created_default_runner_outlives_its_users(do_nothing_connection_observer_class__for_major_base_class):
+    import gc
+    from moler.runner import ThreadPoolExecutorRunner, set_default_runner
+    connection_observer_class = do_nothing_connection_observer_class__for_major_base_class
+    set_default_runner(None)  # start from fresh, lazily created default runner
+
+    observer = connection_observer_class()
+    shared_runner = observer.runner
+    assert isinstance(shared_runner, ThreadPoolExecutorRunner)
+
+    del observer
+    gc.collect()
+    assert not shared_runner._in_shutdown
+    assert connection_observer_class().runner is shared_runner
+    set_default_runner(None)  # exchanged lazily created runner is shut down
+    assert shared_runner._in_shutdown
+
+
+def test_exchanged_default_runner_serves_its_users_till_they_are_gone(connection_to_remote):
+    import gc
+    from moler.runner import set_default_runner
+
+    class DataObserver(ConnectionObserver):
+        def data_received(self, data):
+            self.set_result(data)
+
+    set_default_runner(None)  # start from fresh, lazily created default runner
+    observer = DataObserver(connection=connection_to_remote.moler_connection)
+    previous_runner = observer.runner
+    set_default_runner(None)
+    assert not previous_runner._in_shutdown  # observer still uses it
+
+    observer.start()
+    connection_to_remote.moler_connection.data_received(b"data")
+    assert observer.await_done(timeout=1) == "data"
+    del observer
+    give_up_time = time.time() + 2
+    while (not previous_runner._in_shutdown) and (time.time() < give_up_time):  # its feeding thread may still run
+        gc.collect()
+        time.sleep(0.01)
+    assert previous_runner._in_shutdown
+
+
 # --------------------------- resources ---------------------------
 
 
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Testing pool of named connections
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import time
+
+import pytest
+
+
+def test_pool_opens_connection_at_first_checkout(connections_config, opened_connections):
+    from moler.connection_pool import ConnectionPool
+
+    pool = ConnectionPool()
+    assert opened_connections == []
+    io_conn = pool.checkout(name="net_1")
+    assert opened_connections == [io_conn]
+    assert io_conn.moler_connection.name == "net_1"
+    pool.checkin(io_conn)
+    pool.close()
+
+
+def test_checked_in_connection_is_reused_without_reopening(connections_config, opened_connections):
+    from moler.connection_pool import ConnectionPool
+
+    pool = ConnectionPool()
+    with pool.connection(name="net_1") as io_conn:
+        pass
+    assert len(pool) == 1
+    with pool.connection(name="net_1") as reused_conn:
+        assert reused_conn is io_conn
+    assert len(opened_connections) == 1
+    pool.close()
+    assert len(pool) == 0
+
+
+def test_pool_keeps_max_size_idle_connections(connections_config, closed_connections):
+    from moler.connection_pool import ConnectionPool
+
+    pool = ConnectionPool(max_size=2)
+    io_conns = [pool.checkout(name="net_1") for _ in range(3)]
+    for io_conn in io_conns:
+        pool.checkin(io_conn)
+    assert len(pool) == 2
+    assert closed_connections == [io_conns[2]]
+    pool.close()
+
+
+def test_idle_connection_is_closed_after_idle_timeout(connections_config, opened_connections, closed_connections):
+    from moler.connection_pool import ConnectionPool
+
+    pool = ConnectionPool(idle_timeout=0.1)
+    with pool.connection(name="net_1") as io_conn:
+        pass
+    time.sleep(0.2)
+    with pool.connection(name="net_1") as new_conn:
+        assert new_conn is not io_conn
+    assert closed_connections == [io_conn]
+    pool.close()
+
+
+def test_lost_connection_is_not_reused(connections_config, opened_connections):
+    from moler.connection_pool import ConnectionPool
+
+    pool = ConnectionPool()
+    with pool.connection(name="net_1") as io_conn:
+        pass
+    io_conn._notify_on_disconnect()  # like remote side closing connection
+    with pool.connection(name="net_1") as new_conn:
+        assert new_conn is not io_conn
+    pool.close()
+
+
+def test_connection_failing_health_check_is_replaced(connections_config, opened_connections, closed_connections):
+    from moler.connection_pool import ConnectionPool
+
+    unhealthy_connections = []
+    pool = ConnectionPool(health_check=lambda io_conn: io_conn not in unhealthy_connections)
+    with pool.connection(name="net_1") as io_conn:
+        pass
+    unhealthy_connections.append(io_conn)
+    with pool.connection(name="net_1") as new_conn:
+        assert new_conn is not io_conn
+    assert closed_connections == [io_conn]
+    pool.close()
+
+
+def test_redefined_named_connection_is_not_taken_from_pool(connections_config, opened_connections):
+    from moler.connection_pool import ConnectionPool
+
+    pool = ConnectionPool()
+    with pool.connection(name="net_1") as io_conn:
+        pass
+    connections_config.define_connection(name="net_1", io_type="memory", echo=False)
+    with pool.connection(name="net_1") as new_conn:
+        assert new_conn is not io_conn
+    assert len(pool) == 2
+    pool.close()
+
+
+def test_checked_in_connection_has_no_observers_nor_data_of_previous_user(connections_config):
+    from moler.connection_pool import ConnectionPool
+
+    received_data = []
+
+    def receiver(data):
+        received_data.append(data)
+
+    pool = ConnectionPool()
+    with pool.connection(name="net_1") as io_conn:
+        io_conn.moler_connection.subscribe(receiver)
+        io_conn.moler_connection.data_received(b"previous user's data")
+    assert received_data == [u"previous user's data"]
+    with pool.connection(name="net_1") as reused_conn:
+        assert reused_conn is io_conn
+        reused_conn.moler_connection.subscribe(receiver, from_offset=0)  # nothing to replay
+        reused_conn.moler_connection.data_received(b"next user's data")
+    assert received_data == [u"previous user's data", u"next user's data"]
+    pool.close()
+
+
+def test_pool_creates_connection_whose_constructor_has_no_name_parameter(connections_config, opened_connections, monkeypatch):
+    from moler.connection import ConnectionFactory, ObservableConnection
+    from moler.connection_pool import ConnectionPool
+    from moler.io.raw.memory import ThreadedFifoBuffer
+
+    def unnamed_mem_conn(echo=True):
+        return ThreadedFifoBuffer(moler_connection=ObservableConnection(), echo=echo)
+
+    monkeypatch.setitem(ConnectionFactory._constructors_registry, ("unnamed_memory", "threaded"), unnamed_mem_conn)
+    connections_config.define_connection(name="unnamed_net", io_type="unnamed_memory")
+    connections_config.set_default_variant(io_type="unnamed_memory", variant="threaded")
+    pool = ConnectionPool()
+    with pool.connection(name="unnamed_net") as io_conn:
+        assert opened_connections == [io_conn]
+    with pool.connection(name="unnamed_net") as reused_conn:
+        assert reused_conn is io_conn
+    pool.close()
+
+
+def test_checkin_of_connection_not_taken_from_pool_raises_exception(connections_config):
+    from moler.connection import get_connection
+    from moler.connection_pool import ConnectionPool
+    from moler.exceptions import WrongUsage
+
+    pool = ConnectionPool()
+    with pytest.raises(WrongUsage):
+        pool.checkin(get_connection(name="net_1"))
+
+
+# --------------------------- resources ---------------------------
+
+
+@pytest.yield_fixture
+def connections_config():
+    import moler.config.connections as conn_cfg
+    conn_cfg.define_connection(name="net_1", io_type="memory")
+    conn_cfg.set_default_variant(io_type="memory", variant="threaded")
+    yield conn_cfg
+    # restore since tests may change configuration
+    conn_cfg.clear()
+
+
+@pytest.yield_fixture
+def opened_connections(monkeypatch):
+    from moler.io.raw.memory import ThreadedFifoBuffer
+    opened = []
+    original_open = ThreadedFifoBuffer.open
+
+    def open(self):
+        opened.append(self)
+        original_open(self)
+
+    monkeypatch.setattr(ThreadedFifoBuffer, "open", open)
+    yield opened
+
+
+@pytest.yield_fixture
+def closed_connections(monkeypatch):
+    from moler.io.raw.memory import ThreadedFifoBuffer
+    closed = []
+    original_close = ThreadedFifoBuffer.close
+
+    def close(self):
+        closed.append(self)
+        original_close(self)
+
+    monkeypatch.setattr(ThreadedFifoBuffer, "close", close)
+    yield closed
@@ -13,6 +13,7 @@ import importlib
 
 import pytest
 from moler.event import Event
+from moler.events.textualevent import TextualEvent
 from moler.connection import ObservableConnection
 from moler.helpers import instance_id
 
@@ -62,6 +63,49 @@ def test_event_is_running(do_nothing_command__for_major_base_class):
     wait4.start()  # start the event-future
 
 
+def test_textual_event_fed_by_lines_parses_same_as_fed_by_data():
+    chunks = ["line 1\npart", "ial line\r\n", "\n", "last"]
+    conn_data = ObservableConnection()
+    event_fed_by_data = LinesCollector(connection=conn_data)
+    conn_data.subscribe(event_fed_by_data.data_received)
+    conn_lines = ObservableConnection()
+    event_fed_by_lines = LinesCollector(connection=conn_lines)
+    conn_lines.subscribe(event_fed_by_lines.lines_received, lines=True)
+
+    for chunk in chunks:
+        conn_data.data_received(chunk)
+        conn_lines.data_received(chunk)
+
+    assert event_fed_by_lines.parsed_lines == event_fed_by_data.parsed_lines
+    assert event_fed_by_lines.parsed_lines == [("line 1", True), ("part", False), ("partial line", True),
+                                               ("", True), ("last", False)]
+
+
+def test_runner_subscribes_textual_event_for_lines():
+    moler_conn = ObservableConnection()
+    event = LinesCollector(connection=moler_conn)
+    event.detect_pattern = "never"
+    event.start()
+    try:
+        assert [observer for observer in moler_conn._observers.values() if observer[2]]  # subscribed for lines
+        moler_conn.data_received("line 1\n")
+    finally:  # test cleanup
+        event.cancel()
+    assert event.parsed_lines == [("line 1", True)]
+
+
+def test_textual_event_accepts_lines_split_by_its_newline_chars_only():
+    event = LinesCollector()
+    assert event.accepts_lines(("\n", "\r"))
+    assert not event.accepts_lines(("\n",))
+
+    class OwnDataHandling(LinesCollector):
+        def data_received(self, data):
+            pass
+
+    assert not OwnDataHandling().accepts_lines(("\n", "\r"))
+
+
 # --------------------------- resources ---------------------------
 
 
@@ -91,3 +135,12 @@ def do_nothing_command_class__for_major_base_class(command_major_base_class):
 def do_nothing_command__for_major_base_class(do_nothing_command_class__for_major_base_class):
     instance = do_nothing_command_class__for_major_base_class()
     return instance
+
+
+class LinesCollector(TextualEvent):
+    def __init__(self, connection=None):
+        super(LinesCollector, self).__init__(connection=connection)
+        self.parsed_lines = list()
+
+    def on_new_line(self, line, is_full_line):
+        self.parsed_lines.append((line, is_full_line))
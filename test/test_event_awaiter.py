@@ -4,7 +4,12 @@ __author__ = 'Marcin Usielski'
 __copyright__ = 'Copyright (C) 2018, Nokia'
 __email__ = 'marcin.usielski@nokia.com'
 
+import time
+
+import pytest
+
 from moler.events.unix.wait4prompt import Wait4prompt
+from moler.exceptions import ConnectionObserverTimeout
 from moler.event_awaiter import EventAwaiter
 from moler.connection import ObservableConnection
 
@@ -86,3 +91,98 @@ def test_events_false_any():
     assert 0 == len(done)
     assert 2 == len(not_done)
     EventAwaiter.cancel_all_events(events)
+
+
+def test_gather_runs_events_concurrently():
+    connection = ObservableConnection()
+    patterns = ("aaa", "bbb", "ccc")
+    events = [Wait4prompt(connection=connection, till_occurs_times=1, prompt=pattern) for pattern in patterns]
+    for event in events:
+        event.timeout = 0.5
+
+    start_time = time.time()
+    results = EventAwaiter.gather(events, return_exceptions=True)
+    assert time.time() - start_time < 1.0  # not sum of events timeouts
+    assert all(isinstance(result, ConnectionObserverTimeout) for result in results)
+
+
+def test_gather_returns_exceptions_of_failed_events_in_place_of_their_results():
+    import moler
+
+    connection = ObservableConnection()
+    events = [Wait4prompt(connection=connection, till_occurs_times=1, prompt=pattern) for pattern in ("aaa", "bbb")]
+    events[0].start()
+    connection.data_received("aaa")
+
+    results = moler.gather(events, timeout=0.3)
+    assert isinstance(results[0], list)  # Wait4prompt returns its occurrences
+    assert isinstance(results[1], ConnectionObserverTimeout)
+    assert events[1].done()
+
+
+def test_gather_may_raise_exception_of_failed_event():
+    connection = ObservableConnection()
+    events = [Wait4prompt(connection=connection, till_occurs_times=1, prompt="aaa")]
+    with pytest.raises(ConnectionObserverTimeout):
+        EventAwaiter.gather(events, timeout=0.2, return_exceptions=False)
+
+
+def test_as_completed_yields_events_in_order_of_their_completion():
+    import threading
+
+    connection = ObservableConnection()
+    patterns = ("aaa", "bbb", "ccc")
+    events = [Wait4prompt(connection=connection, till_occurs_times=1, prompt=pattern) for pattern in patterns]
+
+    def inject_data():
+        for pattern in reversed(patterns):
+            time.sleep(0.05)
+            connection.data_received(pattern)
+
+    ext_io = threading.Thread(target=inject_data)
+    completed = EventAwaiter.as_completed(events, timeout=2.0)  # starts events
+    ext_io.start()
+    try:
+        assert [event.detect_pattern for event in completed] == list(reversed(patterns))
+    finally:  # test cleanup
+        ext_io.join()
+
+
+def test_wait_for_done_events_returns_events_in_order_of_their_completion():
+    import threading
+
+    connection = ObservableConnection()
+    patterns = ("aaa", "bbb", "ccc")
+    events = [Wait4prompt(connection=connection, till_occurs_times=1, prompt=pattern) for pattern in patterns]
+    for event in events:
+        event.start()
+    connection.data_received("bbb")  # already done goes first
+
+    def inject_data():
+        for pattern in ("ccc", "aaa"):
+            time.sleep(0.05)
+            connection.data_received(pattern)
+
+    ext_io = threading.Thread(target=inject_data)
+    ext_io.start()
+    try:
+        done_events = EventAwaiter.wait_for_done_events(timeout=1.0, events=events, count=2)
+        assert [event.detect_pattern for event in done_events] == ["bbb", "ccc"]
+    finally:  # test cleanup
+        ext_io.join()
+        EventAwaiter.cancel_all_events(events)
+
+
+def test_wait_for_any_returns_as_soon_as_first_event_is_done():
+    import threading
+
+    connection = ObservableConnection()
+    events = [Wait4prompt(connection=connection, till_occurs_times=1, prompt=pattern) for pattern in ("aaa", "bbb")]
+    for event in events:
+        event.start()
+    threading.Timer(0.1, connection.data_received, ["bbb"]).start()
+
+    start_time = time.time()
+    assert EventAwaiter.wait_for_any(timeout=2.0, events=events) is True
+    assert time.time() - start_time < 0.2
+    EventAwaiter.cancel_all_events(events)
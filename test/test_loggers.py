@@ -112,6 +112,16 @@ def test_RawDataFormatter_uses_encoder_of_log_record():
     assert raw_msg == binary_msg
 
 
+def test_RawDataFormatter_takes_bytes_of_memoryview_without_encoder():
+    from moler.config.loggers import RAW_DATA, RawDataFormatter
+    raw_formatter = RawDataFormatter()
+    buffer = bytearray(b"\x00\x01binary data\xff")
+    record = logging.LogRecord(name=None, level=RAW_DATA, pathname="", lineno=0,
+                               msg=memoryview(buffer)[2:13], args=(), exc_info=None)
+    raw_msg = raw_formatter.format(record=record)
+    assert raw_msg == b"binary data"
+
+
 def test_RawTraceFormatter_produces_yaml_record():
     from moler.config.loggers import RAW_DATA, RawTraceFormatter, date_format
     import mock
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Testing offloaded parsing - parsing of command output inside process pool
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import os
+import platform
+import threading
+import time
+from concurrent.futures import Executor, Future
+
+import pytest
+
+from moler.cmd.unix.genericunix import GenericUnixCommand
+
+pytestmark = pytest.mark.skipif(platform.system() == 'Windows',
+                                reason="commands defined inside tests are not importable by spawned processes")
+
+
+@pytest.mark.parametrize("cmd_module_name, variant", [("iptables", ""),
+                                                      ("top", "_without_options"),
+                                                      ("ps", ""),
+                                                      ("nmap", "_host_up"),
+                                                      ("tcpdump", "")])
+@pytest.mark.parametrize("batch_max_lines", [1, 1000])
+def test_offloaded_parsing_gives_same_result_as_inline_parsing(buffer_connection, offloaded_parsing, monkeypatch,
+                                                               cmd_module_name, variant, batch_max_lines):
+    import importlib
+    monkeypatch.setattr(offloaded_parsing, "batch_max_lines", batch_max_lines)
+    cmd_module = importlib.import_module("moler.cmd.unix.{}".format(cmd_module_name))
+    cmd_class = [value for value in vars(cmd_module).values()
+                 if isinstance(value, type) and value.__module__ == cmd_module.__name__][0]
+    assert cmd_class._offloadable_parsing is True
+
+    buffer_connection.remote_inject_response([getattr(cmd_module, "COMMAND_OUTPUT{}".format(variant))])
+    cmd_kwargs = getattr(cmd_module, "COMMAND_KWARGS{}".format(variant))
+    cmd = cmd_class(connection=buffer_connection.moler_connection, **cmd_kwargs)
+    result = cmd()
+    assert result == getattr(cmd_module, "COMMAND_RESULT{}".format(variant))
+
+
+def test_offloaded_parsing_runs_in_other_process(buffer_connection, offloaded_parsing):
+    buffer_connection.remote_inject_response([PidReporter.output])
+    cmd = PidReporter(connection=buffer_connection.moler_connection)
+    result = cmd()
+    assert result['lines'] == ['line 1', 'line 2']
+    assert result['parsing pid'] != os.getpid()
+
+
+def test_lines_are_shipped_in_batches(buffer_connection, offloaded_parsing, monkeypatch):
+    monkeypatch.setattr(offloaded_parsing, "batch_max_lines", 1)
+    buffer_connection.remote_inject_response([PidReporter.output])
+    cmd = PidReporter(connection=buffer_connection.moler_connection)
+    result = cmd()
+    assert result['lines'] == ['line 1', 'line 2']  # parsing state travels between batches
+
+
+def test_feeding_thread_does_not_wait_for_offloaded_parsing(buffer_connection, held_executor):
+    moler_connection = buffer_connection.moler_connection
+    cmd = PidReporter(connection=moler_connection)
+    cmd.start()
+    moler_connection.data_received(b"user@host:~$ report_pid\nline 1\n")
+    assert len(held_executor.held) == 1
+    assert not cmd.done()
+    moler_connection.data_received(b"line 2\nuser@host:~$")
+    assert len(held_executor.held) == 1  # next batch needs parsing state of previous one
+
+    held_executor.run_held()
+    assert await_condition(lambda: len(held_executor.held) == 1)
+    shipped_payload = held_executor.held[0][2][0]
+    assert b"line 2" in shipped_payload
+    assert b"line 1" not in shipped_payload  # already parsed part of result is not shipped again
+    held_executor.run_held()
+    result = cmd.await_done(timeout=5)
+    assert result['lines'] == ['line 1', 'line 2']
+
+
+def test_parser_catching_exceptions_gets_entry_not_shipped_with_its_batch(buffer_connection, offloaded_parsing,
+                                                                          monkeypatch):
+    monkeypatch.setattr(offloaded_parsing, "batch_max_lines", 1)
+    buffer_connection.remote_inject_response([GuardedLinesCollector.output])
+    cmd = GuardedLinesCollector(connection=buffer_connection.moler_connection)
+    result = cmd()
+    assert result['lines'] == ['line 1', 'line 2']  # 'lines' not used by previous batch is shipped on demand
+    assert 'failed line' not in result
+
+
+def test_command_not_possible_to_ship_is_parsed_inline(buffer_connection, offloaded_parsing):
+    buffer_connection.remote_inject_response([PidReporter.output])
+    cmd = PidReporter(connection=buffer_connection.moler_connection)
+    cmd.not_picklable = threading.Lock()
+    result = cmd()
+    assert result['lines'] == ['line 1', 'line 2']
+    assert result['parsing pid'] == os.getpid()
+
+
+def test_command_failure_detected_by_offloaded_parsing_is_raised(buffer_connection, offloaded_parsing):
+    from moler.cmd.unix.top import Top
+    from moler.exceptions import CommandFailure
+
+    buffer_connection.remote_inject_response(["xyz@debian:top abc n 1\n"
+                                              "top: unknown option 'a'\n"
+                                              "xyz@debian:"])
+    cmd = Top(connection=buffer_connection.moler_connection, options='abc')
+    with pytest.raises(CommandFailure) as error:
+        cmd()
+    assert error.value.command is cmd
+    assert "unknown option 'a'" in str(error.value)
+
+
+def test_commands_parse_inline_when_offloaded_parsing_is_disabled(buffer_connection):
+    from moler import offloaded_parsing
+    assert not offloaded_parsing.is_offloaded_parsing_enabled()
+
+    buffer_connection.remote_inject_response([PidReporter.output])
+    cmd = PidReporter(connection=buffer_connection.moler_connection)
+    result = cmd()
+    assert result['parsing pid'] == os.getpid()
+
+
+# --------------------------- resources ---------------------------
+
+
+class PidReporter(GenericUnixCommand):
+    _offloadable_parsing = True
+    output = "user@host:~$ report_pid\nline 1\nline 2\nuser@host:~$"
+
+    def __init__(self, connection, prompt=None, newline_chars=None, runner=None):
+        super(PidReporter, self).__init__(connection=connection, prompt=prompt, newline_chars=newline_chars,
+                                          runner=runner)
+        self.current_ret['lines'] = list()
+
+    def build_command_string(self):
+        return "report_pid"
+
+    def on_new_line(self, line, is_full_line):
+        if is_full_line:
+            self.current_ret['lines'].append(line)
+            self.current_ret['parsing pid'] = os.getpid()
+        return super(PidReporter, self).on_new_line(line, is_full_line)
+
+
+class GuardedLinesCollector(GenericUnixCommand):
+    _offloadable_parsing = True
+    output = "user@host:~$ collect_lines\nline 1\nother\nline 2\nuser@host:~$"
+
+    def __init__(self, connection, prompt=None, newline_chars=None, runner=None):
+        super(GuardedLinesCollector, self).__init__(connection=connection, prompt=prompt,
+                                                    newline_chars=newline_chars, runner=runner)
+        self.current_ret['lines'] = list()
+
+    def build_command_string(self):
+        return "collect_lines"
+
+    def on_new_line(self, line, is_full_line):
+        if is_full_line and line.startswith("line"):
+            try:
+                self.current_ret['lines'].append(line)
+            except Exception:  # parser guarding against its own failures
+                self.current_ret['failed line'] = line
+        elif is_full_line and line == "other":
+            self.current_ret['other'] = line
+        return super(GuardedLinesCollector, self).on_new_line(line, is_full_line)
+
+
+class HeldExecutor(Executor):
+    """Executor running submitted work only when test asks for it"""
+
+    def __init__(self):
+        self.held = list()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.held.append((future, fn, args))
+        return future
+
+    def run_held(self):
+        future, fn, args = self.held.pop(0)
+        future.set_result(fn(*args))
+
+
+def await_condition(condition, timeout=5):
+    give_up_time = time.time() + timeout
+    while not condition():
+        if time.time() > give_up_time:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.yield_fixture()
+def held_executor():
+    from moler import offloaded_parsing
+    executor = HeldExecutor()
+    offloaded_parsing.set_parsing_executor(executor)
+    yield executor
+    offloaded_parsing.disable_offloaded_parsing()
+
+
+@pytest.yield_fixture()
+def offloaded_parsing():
+    from moler import offloaded_parsing
+    offloaded_parsing.enable_offloaded_parsing(max_workers=2)
+    yield offloaded_parsing
+    offloaded_parsing.disable_offloaded_parsing()
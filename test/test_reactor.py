@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Testing reactor - single thread watching many file descriptors
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 4), reason="reactor requires selectors module of Python 3.4+")
+
+
+def test_reactor_calls_callback_when_fd_is_readable(reactor, socket_pair):
+    reader, writer = socket_pair
+    received_data = []
+    data_came = threading.Event()
+
+    def on_readable():
+        received_data.append(reader.recv(100))
+        data_came.set()
+
+    reactor.register(reader, on_readable)
+    time.sleep(0.1)
+    assert received_data == []  # no data - no call
+    writer.send(b"data")
+    assert data_came.wait(timeout=1)
+    assert received_data == [b"data"]
+
+
+def test_reactor_doesnt_call_callback_of_unregistered_fd(reactor, socket_pair):
+    reader, writer = socket_pair
+    received_data = []
+
+    def on_readable():
+        received_data.append(reader.recv(100))
+
+    reactor.register(reader, on_readable)
+    reactor.unregister(reader)
+    reactor.unregister(reader)  # repeated unregister does nothing
+    writer.send(b"data")
+    time.sleep(0.1)
+    assert received_data == []
+    assert len(reactor) == 0
+
+
+def test_callback_may_unregister_its_fd(reactor, socket_pair):
+    reader, writer = socket_pair
+    calls = []
+
+    def on_readable():
+        calls.append(reader.recv(100))
+        reactor.unregister(reader)
+
+    reactor.register(reader, on_readable)
+    writer.send(b"data 1")
+    time.sleep(0.1)
+    writer.send(b"data 2")
+    time.sleep(0.1)
+    assert calls == [b"data 1"]
+
+
+def test_registering_doesnt_await_running_callback(reactor, socket_pair):
+    reader, writer = socket_pair
+    callback_running = threading.Event()
+    callback_may_go = threading.Event()
+
+    def slow_callback():
+        reader.recv(100)
+        callback_running.set()
+        callback_may_go.wait(timeout=5)
+
+    reactor.register(reader, slow_callback)
+    writer.send(b"data")
+    assert callback_running.wait(timeout=1)
+    other_reader, other_writer = socket.socketpair()
+    try:
+        start_time = time.time()
+        reactor.register(other_reader, lambda: other_reader.recv(100))
+        reactor.unregister(other_reader)
+        assert time.time() - start_time < 1
+    finally:  # test cleanup
+        callback_may_go.set()
+        other_reader.close()
+        other_writer.close()
+
+
+def test_unregister_awaits_end_of_running_callback(reactor, socket_pair):
+    reader, writer = socket_pair
+    callback_running = threading.Event()
+    calls = []
+
+    def slow_callback():
+        reader.recv(100)
+        callback_running.set()
+        time.sleep(0.2)
+        calls.append("callback finished")
+
+    reactor.register(reader, slow_callback)
+    writer.send(b"data")
+    assert callback_running.wait(timeout=1)
+    reactor.unregister(reader)
+    calls.append("unregistered")
+    assert calls == ["callback finished", "unregistered"]
+
+
+def test_exception_in_callback_doesnt_break_reactor(reactor, socket_pair):
+    reader, writer = socket_pair
+    received_data = []
+
+    def failing_callback():
+        reader.recv(100)
+        raise Exception("callback failure")
+
+    reactor.register(reader, failing_callback)
+    writer.send(b"data 1")
+    time.sleep(0.1)
+    reactor.unregister(reader)
+
+    reactor.register(reader, lambda: received_data.append(reader.recv(100)))
+    writer.send(b"data 2")
+    time.sleep(0.1)
+    assert received_data == [b"data 2"]
+
+
+def test_many_fds_are_watched_by_single_thread(reactor):
+    threads_count = threading.active_count()
+    socket_pairs = [socket.socketpair() for _ in range(50)]
+    received_data = []
+    try:
+        for reader, _ in socket_pairs:
+            reactor.register(reader, lambda reader=reader: received_data.append(reader.recv(100)))
+        assert threading.active_count() == threads_count + 1
+        for nb, (_, writer) in enumerate(socket_pairs):
+            writer.send("data {}".format(nb).encode("utf-8"))
+        time.sleep(0.2)
+        assert len(received_data) == 50
+    finally:  # test cleanup
+        for reader, writer in socket_pairs:
+            reactor.unregister(reader)
+            reader.close()
+            writer.close()
+
+
+# --------------------------- resources ---------------------------
+
+
+@pytest.yield_fixture()
+def reactor():
+    from moler.io.raw.reactor import Reactor
+    reactor = Reactor()
+    yield reactor
+    reactor.shutdown()
+
+
+@pytest.yield_fixture()
+def socket_pair():
+    reader, writer = socket.socketpair()
+    yield reader, writer
+    reader.close()
+    writer.close()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Testing hashed timer wheel
+"""
+
+__author__ = 'Grzegorz Latuszek'
+__copyright__ = 'Copyright (C) 2018, Nokia'
+__email__ = 'grzegorz.latuszek@nokia.com'
+
+import threading
+import time
+
+import pytest
+
+
+def test_timer_fires_not_before_its_delay_and_within_one_tick(timer_wheel):
+    fired = threading.Event()
+    fire_times = []
+
+    def on_timeout(name):
+        fire_times.append((name, time.time()))
+        fired.set()
+
+    start_time = time.time()
+    timer_wheel.schedule(0.2, on_timeout, "timer_1")
+    assert fired.wait(timeout=1.0)
+    assert fire_times[0][0] == "timer_1"
+    assert 0.2 <= fire_times[0][1] - start_time < 0.2 + timer_wheel.tick + 0.05
+
+
+def test_cancelled_timer_doesnt_fire(timer_wheel):
+    fired = []
+    timer = timer_wheel.schedule(0.1, fired.append, "timer_1")
+    assert timer_wheel.cancel(timer) is True
+    assert len(timer_wheel) == 0
+    time.sleep(0.3)
+    assert fired == []
+    assert timer_wheel.cancel(timer) is False
+
+
+def test_timers_fire_in_order_of_their_delays(timer_wheel):
+    fired = []
+    for delay in [0.3, 0.1, 0.2]:
+        timer_wheel.schedule(delay, fired.append, delay)
+    time.sleep(0.5)
+    assert fired == [0.1, 0.2, 0.3]
+
+
+def test_timer_longer_than_wheel_turn_fires_after_its_delay():
+    from moler.timer_wheel import TimerWheel
+    timer_wheel = TimerWheel(tick=0.02, slots_count=4)  # wheel turn takes 0.08 sec
+    fired = []
+    try:
+        timer_wheel.schedule(0.3, fired.append, "long")
+        time.sleep(0.2)
+        assert fired == []
+        time.sleep(0.2)
+        assert fired == ["long"]
+    finally:  # test cleanup
+        timer_wheel.shutdown()
+
+
+def test_callback_raising_exception_doesnt_break_wheel(timer_wheel):
+    fired = []
+
+    def raising_callback():
+        raise ValueError("broken callback")
+
+    timer_wheel.schedule(0.05, raising_callback)
+    timer_wheel.schedule(0.1, fired.append, "next")
+    time.sleep(0.3)
+    assert fired == ["next"]
+
+
+def test_schedule_and_cancel_of_many_timers_is_fast(timer_wheel):
+    start_time = time.time()
+    timers = [timer_wheel.schedule(10.0 + index * 0.001, lambda: None) for index in range(10000)]
+    for timer in timers:
+        timer_wheel.cancel(timer)
+    assert len(timer_wheel) == 0
+    assert time.time() - start_time < 1.0
+
+
+# --------------------------- resources ---------------------------
+
+
+@pytest.yield_fixture()
+def timer_wheel():
+    from moler.timer_wheel import TimerWheel
+    wheel = TimerWheel()
+    yield wheel
+    wheel.shutdown()